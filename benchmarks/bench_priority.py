@@ -0,0 +1,113 @@
+"""Benchmark for priority classes in the Pipe send scheduler.
+
+Runs a mixed workload over one pipe pair: a few bulk missions are queued while
+small request-sized messages are sent at a fixed interval. Reports the
+end-to-end latency of the small messages and the sender's per-class queueing
+latency from `Pipe.scheduler_stats()`.
+
+With --flat every mission is put in the 'normal' class, which reproduces plain
+round-robin scheduling for comparison.
+
+Usage:
+    python benchmarks/bench_priority.py [--bulk 16] [--bulk-size 16777216] [--bulk-buff 262144] [--flat]
+"""
+import argparse
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from netcore import Pipe
+
+
+def make_pair(framing: str = 'lso'):
+    """Create two connected pipes over a socketpair."""
+    a, b = socket.socketpair()
+    pipes = []
+    for sock in (a, b):
+        pipe = Pipe(sock.recv, sock.sendall, framing=framing)
+        # 基准测试结束时不等待管道线程
+        pipe.recv_thread.daemon = True
+        pipe.send_thread.daemon = True
+        pipes.append(pipe)
+    return pipes, (a, b)
+
+
+def bench_mixed(bulk: int, bulk_size: int, bulk_buff: int, small: int, interval: float, warmup: float, flat: bool, framing: str = 'lso') -> dict:
+    """Measure small-message latency while bulk missions are in flight."""
+    (sender, receiver), _ = make_pair(framing)
+    arrived = {}
+    bulk_done = threading.Event()
+    lock = threading.Lock()
+
+    def received(data, info):
+        with lock:
+            if info.get('kind') == 'small':
+                arrived[info['seq']] = time.perf_counter()
+            else:
+                arrived[info['extension']] = time.perf_counter()
+                if sum(1 for key in arrived if isinstance(key, str)) == bulk:
+                    bulk_done.set()
+
+    receiver.recv_handler = received
+    sender.start()
+    receiver.start()
+
+    payload = os.urandom(bulk_size)
+    priority = 'normal' if flat else 'low'
+    start = time.perf_counter()
+    for _ in range(bulk):
+        sender.create_mission(payload, {'kind': 'bulk'}, buff=bulk_buff, priority=priority)
+    # 等待接收端为批量任务分配完缓冲区
+    time.sleep(warmup)
+
+    sent = {}
+    for seq in range(small):
+        sent[seq] = time.perf_counter()
+        sender.send(b'x' * 256, {'kind': 'small', 'seq': seq}, priority='normal' if flat else None)
+        time.sleep(interval)
+
+    bulk_done.wait(timeout=120)
+    elapsed = time.perf_counter() - start
+    deadline = time.perf_counter() + 5
+    while len([key for key in arrived if isinstance(key, int)]) < small and time.perf_counter() < deadline:
+        time.sleep(0.01)
+
+    latencies = sorted((arrived[seq] - sent[seq]) * 1000 for seq in sent if seq in arrived)
+    return {
+        'mode': 'flat' if flat else 'priority',
+        'bulk': f'{bulk} x {bulk_size} / {bulk_buff}',
+        'bulk_elapsed_s': round(elapsed, 3),
+        'small_received': len(latencies),
+        'small_p50_ms': round(statistics.median(latencies), 3) if latencies else None,
+        'small_p99_ms': round(latencies[int(len(latencies) * 0.99) - 1], 3) if latencies else None,
+        'small_max_ms': round(latencies[-1], 3) if latencies else None,
+        'scheduler': sender.scheduler_stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pipe priority scheduling benchmark')
+    parser.add_argument('--bulk', type=int, default=16, help='Number of concurrent bulk missions')
+    parser.add_argument('--bulk-size', type=int, default=16 * 1024 * 1024, help='Bulk mission size in bytes')
+    parser.add_argument('--bulk-buff', type=int, default=256 * 1024, help='Chunk size of the bulk missions')
+    parser.add_argument('--small', type=int, default=200, help='Number of small messages')
+    parser.add_argument('--interval', type=float, default=0.002, help='Delay between small messages (seconds)')
+    parser.add_argument('--warmup', type=float, default=0.2, help='Delay between queueing bulk and small traffic (seconds)')
+    parser.add_argument('--flat', action='store_true', help='Put every mission in the same class')
+    parser.add_argument('--framing', choices=['lso', 'binary'], default='binary', help='Requested pipe framing')
+    args = parser.parse_args()
+
+    result = bench_mixed(args.bulk, args.bulk_size, args.bulk_buff, args.small, args.interval, args.warmup, args.flat, args.framing)
+    scheduler = result.pop('scheduler')
+    print('mixed     ', result)
+    for name, stats in scheduler.items():
+        print(f'  {name:<8}', {key: round(value, 6) if isinstance(value, float) else value for key, value in stats.items()})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark for the Pipe send scheduler.
+
+Measures two things:
+
+1. Idle cost: CPU time consumed by N started but idle pipe pairs.
+2. Loaded throughput: time to push a batch of missions through one pipe pair.
+
+Usage:
+    python benchmarks/bench_send_scheduler.py [--pipes 50] [--idle 2.0] [--framing binary]
+"""
+import argparse
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from netcore import Pipe
+
+
+def make_pair(framing: str = 'lso'):
+    """Create two connected pipes over a socketpair."""
+    a, b = socket.socketpair()
+    pipes = []
+    for sock in (a, b):
+        pipe = Pipe(sock.recv, sock.send, framing=framing)
+        # 基准测试结束时不等待管道线程
+        pipe.recv_thread.daemon = True
+        pipe.send_thread.daemon = True
+        pipe.start()
+        pipes.append(pipe)
+    return pipes, (a, b)
+
+
+def bench_idle(count: int, duration: float, framing: str = 'lso') -> dict:
+    """Measure process CPU usage of idle pipes."""
+    pairs = [make_pair(framing) for _ in range(count)]
+    time.sleep(0.2)
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    time.sleep(duration)
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    return {
+        'pipes': count * 2,
+        'wall_s': round(wall, 3),
+        'cpu_s': round(cpu, 3),
+        'cpu_ratio': round(cpu / wall, 3),
+        '_pairs': pairs,
+    }
+
+
+def bench_throughput(missions: int, size: int, framing: str = 'lso') -> dict:
+    """Measure throughput of a loaded pipe pair."""
+    (sender, receiver), _ = make_pair(framing)
+    payload = os.urandom(size)
+    start = time.perf_counter()
+    for _ in range(missions):
+        sender.send(payload, {'route': 'bench'})
+    received = 0
+    while received < missions:
+        data, info = receiver.recv()
+        if data is None:
+            time.sleep(0.0005)
+            continue
+        received += 1
+    elapsed = time.perf_counter() - start
+    total = missions * size
+    return {
+        'framing': sender.send_framing,
+        'missions': missions,
+        'size': size,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_MBps': round(total / elapsed / 1024 / 1024, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pipe send scheduler benchmark')
+    parser.add_argument('--pipes', type=int, default=50, help='Number of idle pipe pairs')
+    parser.add_argument('--idle', type=float, default=2.0, help='Idle measurement window (seconds)')
+    parser.add_argument('--missions', type=int, default=20, help='Missions for the throughput run')
+    parser.add_argument('--size', type=int, default=1024 * 1024, help='Mission size in bytes')
+    parser.add_argument('--framing', choices=['lso', 'binary'], default='lso', help='Requested pipe framing')
+    args = parser.parse_args()
+
+    idle = bench_idle(args.pipes, args.idle, args.framing)
+    idle.pop('_pairs')
+    print('idle      ', idle)
+    print('throughput', bench_throughput(args.missions, args.size, args.framing))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Benchmark for sending file-backed missions with and without sendfile.
+
+A temporary file is sent as a stream mission over loopback TCP between two
+pipes created with Pipe.from_socket. With sendfile the sender hands file ranges
+to the kernel; without it the same missions are read into Python in chunks of
+`chunk_size` bytes. Besides the throughput, the send thread's busy time shows
+how much sender CPU the transfer took.
+
+Usage:
+    python benchmarks/bench_sendfile.py [--size 256] [--count 4] [--chunk 65536] [--lso]
+"""
+import argparse
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from netcore import LsoProtocol, Pipe
+
+
+def make_pair() -> tuple[Pipe, Pipe]:
+    """Create two connected pipes over loopback TCP."""
+    listener = socket.create_server(('127.0.0.1', 0))
+    client = socket.create_connection(listener.getsockname())
+    server, _ = listener.accept()
+    listener.close()
+    pipes = []
+    for sock in (client, server):
+        pipe = Pipe.from_socket(sock, framing='binary')
+        # 基准测试结束时不等待管道线程
+        pipe.recv_thread.daemon = True
+        pipe.send_thread.daemon = True
+        pipes.append(pipe)
+    return pipes[0], pipes[1]
+
+
+def bench(path: str, size: int, count: int, chunk: int, sendfile: bool, lso: bool) -> dict:
+    """Send the file `count` times and time the deliveries."""
+    sender, receiver = make_pair()
+    sender.chunk_size = chunk
+    if not sendfile:
+        sender.send_file_function = None
+    received = []
+    done = threading.Semaphore(0)
+
+    def on_mission(data, info):
+        received.append(len(data))
+        done.release()
+
+    receiver.recv_handler = on_mission
+    sender.start()
+    receiver.start()
+    time.sleep(0.2)
+
+    start = time.perf_counter()
+    for _ in range(count):
+        if lso:
+            source = LsoProtocol(path)
+            sender.create_stream_mission(source)
+        else:
+            with open(path, 'rb') as f:
+                sender.create_stream_mission(f)
+                done.acquire()
+            continue
+        done.acquire()
+    elapsed = time.perf_counter() - start
+    stats = sender.stats()
+    return {
+        'sendfile': sendfile,
+        'ok': received == [size] * count,
+        'mb_per_s': round(size * count / elapsed / 1e6, 1),
+        'send_busy_s': round(stats['send_busy'], 3),
+        'sendfile_calls': sender.transport.stats()['sendfile_calls'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='sendfile benchmark for file-backed missions')
+    parser.add_argument('--size', type=int, default=256, help='File size in MiB')
+    parser.add_argument('--count', type=int, default=4, help='Number of missions')
+    parser.add_argument('--chunk', type=int, default=65536, help='chunk_size of the read path')
+    parser.add_argument('--lso', action='store_true', help='Send an LsoProtocol file instead of a plain file')
+    args = parser.parse_args()
+
+    size = args.size << 20
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'payload.bin')
+        if args.lso:
+            lso = LsoProtocol(path)
+            lso.load_generator((os.urandom(1 << 20) for _ in range(args.size)), extention='bench')
+            lso.close()
+        else:
+            with open(path, 'wb') as f:
+                for _ in range(args.size):
+                    f.write(os.urandom(1 << 20))
+        for sendfile in (False, True):
+            print(bench(path, size, args.count, args.chunk, sendfile, args.lso))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""Benchmark for the shared memory transport against loopback TCP.
+
+A separate server process echoes every mission back over either transport.
+For each payload size the client measures sequential round trips (latency)
+and round trips with --inflight missions outstanding (throughput).
+
+With --layer raw the server echoes bytes straight through the transport
+without a Pipe, isolating the cost of the transport itself.
+
+Usage:
+    python benchmarks/bench_shm.py [--sizes 64 4096 65536 1048576] [--count 2000] [--inflight 8] [--layer pipe|raw]
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from netcore import Pipe, ShmTransport
+
+
+def serve(kind: str, address: str, layer: str) -> None:
+    """Server process: echo missions until the client disconnects."""
+    if kind == 'shm':
+        transport = ShmTransport.attach(address)
+        pipe = transport.pipe(framing='binary')
+    else:
+        transport = socket.create_connection(('127.0.0.1', int(address)))
+        transport.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        pipe = Pipe(transport.recv, transport.sendall, framing='binary')
+    if layer == 'raw':
+        buffer = memoryview(bytearray(1 << 20))
+        while n := transport.recv_into(buffer):
+            transport.sendall(buffer[:n])
+        os._exit(0)
+    pipe.recv_handler = lambda data, info: pipe.send(data, info)
+    pipe.start()
+    pipe.recv_thread.join()
+    os._exit(0)
+
+
+def connect(kind: str, layer: str = 'pipe') -> tuple[Pipe, subprocess.Popen, object]:
+    """Start a server process and return the client pipe (not started)."""
+    if kind == 'shm':
+        transport = ShmTransport.create(capacity=4 << 20)
+        server = subprocess.Popen([sys.executable, __file__, '--serve', 'shm', transport.name, layer])
+        return transport.pipe(framing='binary'), server, transport
+    listener = socket.create_server(('127.0.0.1', 0))
+    server = subprocess.Popen([sys.executable, __file__, '--serve', 'tcp', str(listener.getsockname()[1]), layer])
+    sock, _ = listener.accept()
+    listener.close()
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return Pipe(sock.recv, sock.sendall, framing='binary'), server, sock
+
+
+def close(kind: str, server: subprocess.Popen, handle) -> None:
+    """Disconnect from the server process and wait for it to exit."""
+    if kind == 'shm':
+        handle.close()
+    else:
+        handle.shutdown(socket.SHUT_RDWR)
+        handle.close()
+    server.wait(timeout=10)
+
+
+def bench_raw(kind: str, size: int, count: int) -> dict:
+    """Time `count` sequential echo round trips of `size` bytes through the bare transport."""
+    _, server, handle = connect(kind, 'raw')
+    payload = os.urandom(size)
+    buffer = memoryview(bytearray(size))
+    latencies = []
+    for i in range(count + 20):
+        start = time.perf_counter()
+        handle.sendall(payload)
+        got = 0
+        while got < size:
+            got += handle.recv_into(buffer[got:])
+        # 前 20 次为预热
+        if i >= 20:
+            latencies.append(time.perf_counter() - start)
+    close(kind, server, handle)
+    ordered = sorted(latencies)
+    return {
+        'transport': kind,
+        'size': size,
+        'p50_us': round(ordered[len(ordered) // 2] * 1e6, 1),
+        'p99_us': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1e6, 1),
+        'seq_mb_per_s': round(2 * size * count / sum(latencies) / 1e6, 1),
+    }
+
+
+def bench(kind: str, size: int, count: int, inflight: int) -> dict:
+    """Time `count` echo round trips of `size` bytes, sequential and pipelined."""
+    pipe, server, handle = connect(kind)
+    pipe.recv_thread.daemon = True
+    pipe.send_thread.daemon = True
+    slots = threading.Semaphore(1)
+    sent_at = {}
+    latencies = []
+
+    def on_echo(data, info):
+        latencies.append(time.perf_counter() - sent_at.pop(info['seq']))
+        slots.release()
+
+    pipe.recv_handler = on_echo
+    pipe.start()
+    payload = os.urandom(size)
+    # 预热并等待帧格式协商完成
+    for seq in range(-20, 0):
+        slots.acquire()
+        sent_at[seq] = time.perf_counter()
+        pipe.send(payload, {'seq': seq})
+    slots.acquire()
+    slots.release()
+    latencies.clear()
+
+    def run(window: int, base: int) -> float:
+        nonlocal slots
+        slots = threading.Semaphore(window)
+        start = time.perf_counter()
+        for seq in range(base, base + count):
+            slots.acquire()
+            sent_at[seq] = time.perf_counter()
+            pipe.send(payload, {'seq': seq})
+        for _ in range(window):
+            slots.acquire()
+        return time.perf_counter() - start
+
+    sequential = run(1, 0)
+    ordered = sorted(latencies)
+    pipelined = run(inflight, count)
+
+    close(kind, server, handle)
+    return {
+        'transport': kind,
+        'size': size,
+        'p50_us': round(ordered[len(ordered) // 2] * 1e6, 1),
+        'p99_us': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1e6, 1),
+        'seq_mb_per_s': round(2 * size * count / sequential / 1e6, 1),
+        'pipelined_mb_per_s': round(2 * size * count / pipelined / 1e6, 1),
+    }
+
+
+def main():
+    if len(sys.argv) == 5 and sys.argv[1] == '--serve':
+        serve(sys.argv[2], sys.argv[3], sys.argv[4])
+        return
+    parser = argparse.ArgumentParser(description='Shared memory vs loopback TCP benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[64, 4096, 65536, 1048576], help='Payload sizes in bytes')
+    parser.add_argument('--count', type=int, default=2000, help='Round trips per size and mode')
+    parser.add_argument('--inflight', type=int, default=8, help='Outstanding missions in the pipelined run')
+    parser.add_argument('--layer', choices=['pipe', 'raw'], default='pipe', help='Echo through Pipes or the bare transports')
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        count = max(20, min(args.count, (256 << 20) // size))
+        for kind in ('tcp', 'shm'):
+            if args.layer == 'raw':
+                print(bench_raw(kind, size, count))
+            else:
+                print(bench(kind, size, count, args.inflight))
+
+
+if __name__ == '__main__':
+    main()
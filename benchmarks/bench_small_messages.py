@@ -0,0 +1,118 @@
+"""Benchmark for small messages over one pipe pair.
+
+Measures two things:
+
+1. Round trip: latency of a request/response ping-pong, one message in flight.
+2. Burst: wall and CPU time to push a batch of small messages one way.
+
+With --no-inline both pipes send every message as a mission head plus a data
+frame, for comparison with the single-frame message path.
+
+Usage:
+    python benchmarks/bench_small_messages.py [--size 200] [--rounds 5000] [--burst 50000] [--no-inline]
+"""
+import argparse
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from netcore import Pipe
+
+
+def make_pair(framing: str = 'lso', inline: bool = True):
+    """Create two connected pipes over a socketpair."""
+    a, b = socket.socketpair()
+    pipes = []
+    for sock in (a, b):
+        pipe = Pipe(sock.recv, sock.sendall, framing=framing)
+        if inline:
+            pipe.inline_threshold = 4096
+        # 基准测试结束时不等待管道线程
+        pipe.recv_thread.daemon = True
+        pipe.send_thread.daemon = True
+        pipes.append(pipe)
+    return pipes, (a, b)
+
+
+def bench_round_trip(rounds: int, size: int, framing: str, inline: bool) -> dict:
+    """Measure request/response latency with one message in flight."""
+    (client, server), _ = make_pair(framing, inline)
+    reply = threading.Event()
+    server.recv_handler = lambda data, info: server.send(data, {'seq': info['seq']})
+    client.recv_handler = lambda data, info: reply.set()
+    client.start()
+    server.start()
+    # 等待握手完成
+    time.sleep(0.1)
+
+    payload = os.urandom(size)
+    latencies = []
+    cpu_start = time.process_time()
+    for seq in range(rounds):
+        reply.clear()
+        start = time.perf_counter()
+        client.send(payload, {'seq': seq})
+        reply.wait()
+        latencies.append((time.perf_counter() - start) * 1e6)
+    cpu = time.process_time() - cpu_start
+    latencies.sort()
+    return {
+        'rounds': rounds,
+        'p50_us': round(statistics.median(latencies), 1),
+        'p99_us': round(latencies[int(len(latencies) * 0.99) - 1], 1),
+        'cpu_us_per_round': round(cpu / rounds * 1e6, 1),
+    }
+
+
+def bench_burst(count: int, size: int, framing: str, inline: bool) -> dict:
+    """Measure one-way throughput of a batch of small messages."""
+    (sender, receiver), _ = make_pair(framing, inline)
+    received = [0]
+    done = threading.Event()
+
+    def on_message(data, info):
+        received[0] += 1
+        if received[0] == count:
+            done.set()
+
+    receiver.recv_handler = on_message
+    sender.start()
+    receiver.start()
+    time.sleep(0.1)
+
+    payload = os.urandom(size)
+    cpu_start, start = time.process_time(), time.perf_counter()
+    for seq in range(count):
+        sender.send(payload, {'seq': seq})
+    done.wait(timeout=120)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    return {
+        'messages': received[0],
+        'elapsed_s': round(elapsed, 3),
+        'msg_per_s': round(received[0] / elapsed),
+        'cpu_us_per_msg': round(cpu / count * 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pipe small message benchmark')
+    parser.add_argument('--size', type=int, default=200, help='Message payload size in bytes')
+    parser.add_argument('--rounds', type=int, default=5000, help='Number of request/response round trips')
+    parser.add_argument('--burst', type=int, default=50000, help='Number of messages sent one way')
+    parser.add_argument('--no-inline', action='store_true', help='Disable single-frame messages')
+    parser.add_argument('--framing', choices=['lso', 'binary'], default='binary', help='Requested pipe framing')
+    args = parser.parse_args()
+
+    inline = not args.no_inline
+    print('round trip', bench_round_trip(args.rounds, args.size, args.framing, inline))
+    print('burst     ', bench_burst(args.burst, args.size, args.framing, inline))
+
+
+if __name__ == '__main__':
+    main()
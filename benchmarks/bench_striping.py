@@ -0,0 +1,131 @@
+"""Benchmark for striped sends over a simulated high-latency link.
+
+Every connection runs through a relay that delays each direction by --delay
+seconds and keeps at most --window bytes in flight, like a TCP connection whose
+window is smaller than the bandwidth-delay product. One connection then tops
+out at about window / delay, so the aggregate throughput of a striped send
+should grow with the number of pipes.
+
+Usage:
+    python benchmarks/bench_striping.py [--size 32] [--pipes 1 2 4 8] [--delay 0.02] [--window 262144]
+"""
+import argparse
+import collections
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from netcore import MultiPipe, Pipe
+
+
+def relay(source: socket.socket, target: socket.socket, delay: float, window: int) -> None:
+    """Forward one direction with a fixed delay and a bounded amount in flight."""
+    queue = collections.deque()
+    state = {'inflight': 0, 'closed': False}
+    cond = threading.Condition()
+
+    def reader():
+        while True:
+            chunk = source.recv(65536)
+            with cond:
+                if not chunk:
+                    state['closed'] = True
+                    cond.notify_all()
+                    return
+                # 在途数据达到窗口时停止读取，发送端随之被阻塞
+                while state['inflight'] and state['inflight'] + len(chunk) > window:
+                    cond.wait()
+                state['inflight'] += len(chunk)
+                queue.append((time.perf_counter() + delay, chunk))
+                cond.notify_all()
+
+    def writer():
+        while True:
+            with cond:
+                while not queue and not state['closed']:
+                    cond.wait()
+                if not queue:
+                    target.shutdown(socket.SHUT_WR)
+                    return
+                due, chunk = queue.popleft()
+            wait = due - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            target.sendall(chunk)
+            with cond:
+                state['inflight'] -= len(chunk)
+                cond.notify_all()
+
+    for target_function in (reader, writer):
+        threading.Thread(target=target_function, daemon=True).start()
+
+
+def make_link(delay: float, window: int) -> tuple[Pipe, Pipe]:
+    """Create two pipes connected through a delaying relay."""
+    left, relay_left = socket.socketpair()
+    relay_right, right = socket.socketpair()
+    relay(relay_left, relay_right, delay, window)
+    relay(relay_right, relay_left, delay, window)
+    pipes = []
+    for sock in (left, right):
+        pipe = Pipe(sock.recv, sock.sendall)
+        # 基准测试结束时不等待管道线程
+        pipe.recv_thread.daemon = True
+        pipe.send_thread.daemon = True
+        pipes.append(pipe)
+    return pipes[0], pipes[1]
+
+
+def bench(count: int, size: int, delay: float, window: int) -> dict:
+    """Send one payload striped over `count` pipes and time its delivery."""
+    sender, receiver = MultiPipe(), MultiPipe()
+    for _ in range(count):
+        left, right = make_link(delay, window)
+        sender.add_pipe(left)
+        receiver.add_pipe(right)
+    done = threading.Event()
+    result = {}
+
+    def on_mission(data, info):
+        result['data'] = data
+        done.set()
+
+    receiver.recv_handler = on_mission
+    sender.start()
+    receiver.start()
+    # 等待握手完成
+    time.sleep(delay * 4 + 0.1)
+
+    payload = os.urandom(size)
+    start = time.perf_counter()
+    sender.send_striped(payload, {})
+    done.wait(timeout=300)
+    elapsed = time.perf_counter() - start
+    return {
+        'pipes': count,
+        'ok': result.get('data') == payload,
+        'elapsed_s': round(elapsed, 3),
+        'mb_per_s': round(size / elapsed / 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MultiPipe striping benchmark')
+    parser.add_argument('--size', type=int, default=32, help='Payload size in MiB')
+    parser.add_argument('--pipes', type=int, nargs='+', default=[1, 2, 4, 8], help='Pipe counts to compare')
+    parser.add_argument('--delay', type=float, default=0.02, help='One-way delay of the link in seconds')
+    parser.add_argument('--window', type=int, default=262144, help='Bytes in flight per connection and direction')
+    args = parser.parse_args()
+
+    print(f'link: {args.delay * 2000:.0f} ms RTT, {args.window // 1024} KiB window, '
+          f'~{args.window / args.delay / 1e6:.1f} MB/s per connection')
+    for count in args.pipes:
+        print(bench(count, args.size << 20, args.delay, args.window))
+
+
+if __name__ == '__main__':
+    main()
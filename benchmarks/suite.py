@@ -0,0 +1,369 @@
+"""Reproducible microbenchmark suite with JSON results and baseline comparison.
+
+Cases:
+
+- lso.memory.full_data / lso.memory.load_stream: LsoProtocol in memory mode
+- lso.file.full_data / lso.file.load_stream: LsoProtocol backed by a file
+- utils.split_chunks: Utils.split_bytes_into_chunks into 4 KiB chunks
+- pipe.oneway: missions over one Pipe pair on a socketpair, `concurrency`
+  missions in flight
+- multipipe.oneway: missions spread over `concurrency` pipe pairs (at least 2)
+  in a MultiPipe
+- endpoint.roundtrip: Endpoint echo requests from `concurrency` client threads
+
+Each case runs for every payload size and concurrency level (the LSO and
+Utils cases ignore concurrency). A case repeats its operation until about
+--volume bytes were moved, runs --repeat times, and reports the median
+throughput and its latencies.
+
+Usage:
+    python benchmarks/suite.py [--sizes 64 4K 64K 1M 16M] [--concurrency 1 4 16]
+                               [--cases pipe endpoint] [--output results.json]
+                               [--baseline old.json] [--threshold 0.1]
+
+Pass --sizes up to 1G for the large payload runs. Combinations whose payloads
+in flight exceed --max-inflight are skipped. With --baseline, the results are
+compared with an earlier run. The exit status is 1 when any throughput dropped
+or p99 latency grew by more than --threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import netcore
+from netcore import Endpoint, LsoProtocol, MultiPipe, Pipe, Response, Utils, request
+
+UNITS = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+
+_block = os.urandom(1 << 20)
+
+
+def parse_size(text: str) -> int:
+    """Parse a size such as 64, 4K, 16M or 1G."""
+    text = text.strip().upper()
+    if text and text[-1] in UNITS:
+        return int(float(text[:-1]) * UNITS[text[-1]])
+    return int(text)
+
+
+def make_payload(size: int) -> bytes:
+    """Build an incompressible payload without calling os.urandom for every byte."""
+    if size <= len(_block):
+        return _block[:size]
+    return (_block * (size // len(_block) + 1))[:size]
+
+
+def operations(size: int, volume: int, limit: int = 20000) -> int:
+    """Number of operations moving about `volume` bytes."""
+    return max(1, min(limit, volume // max(size, 1)))
+
+
+def percentile(samples: list, share: float) -> float:
+    """Nearest-rank percentile of sorted samples."""
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(len(samples) * share))]
+
+
+def make_pipes(count: int) -> tuple[list, list, list]:
+    """Create `count` pipe pairs over socketpairs, not yet started."""
+    senders, receivers, sockets = [], [], []
+    for _ in range(count):
+        a, b = socket.socketpair()
+        sockets += (a, b)
+        pair = []
+        for sock in (a, b):
+            pipe = Pipe(sock.recv, sock.sendall)
+            # 基准测试结束时不等待管道线程
+            pipe.recv_thread.daemon = True
+            pipe.send_thread.daemon = True
+            pair.append(pipe)
+        senders.append(pair[0])
+        receivers.append(pair[1])
+    return senders, receivers, sockets
+
+
+def close_all(pipes: list, sockets: list) -> None:
+    """Stop pipes and close their sockets."""
+    for pipe in pipes:
+        pipe.stop()
+    for sock in sockets:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        sock.close()
+
+
+def bench_lso_full_data(size: int, concurrency: int, volume: int, file_mode: bool) -> dict:
+    """Serialize a payload with LsoProtocol.full_data."""
+    payload = make_payload(size)
+    ops = operations(size, volume, 2000)
+    with tempfile.TemporaryDirectory() as folder:
+        lso = LsoProtocol(os.path.join(folder, 'bench.lso') if file_mode else None, buff=65536)
+        lso.extension = 'bench'
+        lso.set_meta(payload)
+        start = time.perf_counter()
+        for _ in range(ops):
+            for _ in lso.full_data():
+                pass
+        elapsed = time.perf_counter() - start
+    return {'ops': ops, 'bytes': ops * size, 'seconds': elapsed}
+
+
+def bench_lso_load_stream(size: int, concurrency: int, volume: int, file_mode: bool) -> dict:
+    """Parse a serialized payload with LsoProtocol.load_stream."""
+    source = LsoProtocol(buff=65536)
+    source.extension = 'bench'
+    source.set_meta(make_payload(size))
+    wire = b''.join(source.full_data())
+    ops = operations(size, volume, 2000)
+    with tempfile.TemporaryDirectory() as folder:
+        local = os.path.join(folder, 'bench.lso') if file_mode else None
+        start = time.perf_counter()
+        for _ in range(ops):
+            stream = BytesIO(wire)
+            LsoProtocol(local, buff=65536).load_stream(stream.read)
+        elapsed = time.perf_counter() - start
+    return {'ops': ops, 'bytes': ops * size, 'seconds': elapsed}
+
+
+def bench_split_chunks(size: int, concurrency: int, volume: int) -> dict:
+    """Split a payload with Utils.split_bytes_into_chunks."""
+    payload = make_payload(size)
+    ops = operations(size, volume, 2000)
+    start = time.perf_counter()
+    for _ in range(ops):
+        Utils.split_bytes_into_chunks(payload, 4096)
+    return {'ops': ops, 'bytes': ops * size, 'seconds': time.perf_counter() - start}
+
+
+def bench_oneway(size: int, concurrency: int, volume: int, pipes: int) -> dict:
+    """Send missions one way with `concurrency` in flight over `pipes` pipe pairs.
+
+    With more than one pipe the pairs are managed by a MultiPipe on each side.
+    """
+    senders, receivers, sockets = make_pipes(pipes)
+    ops = operations(size, volume)
+    slots = threading.Semaphore(concurrency)
+    done = threading.Event()
+    sent_at = {}
+    latencies = []
+    lock = threading.Lock()
+
+    def on_mission(data, info):
+        now = time.perf_counter()
+        with lock:
+            latencies.append(now - sent_at.pop(info['seq']))
+            finished = len(latencies) == ops
+        slots.release()
+        if finished:
+            done.set()
+
+    if pipes > 1:
+        sender, receiver = MultiPipe(), MultiPipe()
+        for pipe in senders:
+            sender.add_pipe(pipe)
+        for pipe in receivers:
+            receiver.add_pipe(pipe)
+        receiver.recv_handler = on_mission
+        sender.start()
+        receiver.start()
+        codes = list(sender.pipe_pool)
+        send = lambda data, info, seq: sender.send(data, info, codes[seq % len(codes)])
+    else:
+        receivers[0].recv_handler = on_mission
+        senders[0].start()
+        receivers[0].start()
+        send = lambda data, info, seq: senders[0].send(data, info)
+    time.sleep(0.1)
+
+    payload = make_payload(size)
+    start = time.perf_counter()
+    for seq in range(ops):
+        slots.acquire()
+        with lock:
+            sent_at[seq] = time.perf_counter()
+        send(payload, {'seq': seq}, seq)
+    done.wait(timeout=600)
+    elapsed = time.perf_counter() - start
+    close_all(senders + receivers, sockets)
+    return {'ops': len(latencies), 'bytes': len(latencies) * size, 'seconds': elapsed, 'latencies': latencies}
+
+
+def bench_endpoint(size: int, concurrency: int, volume: int) -> dict:
+    """Echo requests through an Endpoint pair from `concurrency` client threads."""
+    senders, receivers, sockets = make_pipes(1)
+    server = Endpoint(receivers[0], max_workers=concurrency)
+    client = Endpoint(senders[0], max_workers=concurrency)
+
+    @server.request('echo')
+    def echo():
+        return Response('echo', request.meta)
+
+    server.start(block=False)
+    client.start(block=False)
+    time.sleep(0.1)
+
+    payload = make_payload(size)
+    ops = operations(size, volume // 2, 5000)
+    per_thread = max(1, ops // concurrency)
+    latencies = []
+    lock = threading.Lock()
+
+    def worker():
+        done = threading.Event()
+        own = []
+        for _ in range(per_thread):
+            done.clear()
+            start = time.perf_counter()
+            client.send('echo', payload, callback=lambda response: done.set())
+            if not done.wait(timeout=120):
+                break
+            own.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    close_all(senders + receivers, sockets)
+    return {'ops': len(latencies), 'bytes': len(latencies) * size * 2, 'seconds': elapsed, 'latencies': latencies}
+
+
+# 用例名 -> (函数, 是否区分并发度, 最大负载)
+CASES = {
+    'lso.memory.full_data': (lambda s, c, v: bench_lso_full_data(s, c, v, False), False, None),
+    'lso.memory.load_stream': (lambda s, c, v: bench_lso_load_stream(s, c, v, False), False, None),
+    'lso.file.full_data': (lambda s, c, v: bench_lso_full_data(s, c, v, True), False, None),
+    'lso.file.load_stream': (lambda s, c, v: bench_lso_load_stream(s, c, v, True), False, None),
+    'utils.split_chunks': (bench_split_chunks, False, None),
+    'pipe.oneway': (lambda s, c, v: bench_oneway(s, c, v, 1), True, None),
+    'multipipe.oneway': (lambda s, c, v: bench_oneway(s, c, v, max(2, c)), True, None),
+    'endpoint.roundtrip': (bench_endpoint, True, 64 << 20),
+}
+
+
+def summarize(runs: list) -> dict:
+    """Median throughput of repeated runs with the latencies of the median run."""
+    runs = sorted(runs, key=lambda run: run['bytes'] / run['seconds'] if run['seconds'] else 0.0)
+    run = runs[len(runs) // 2]
+    result = {
+        'ops': run['ops'],
+        'seconds': round(run['seconds'], 6),
+        'ops_per_s': round(run['ops'] / run['seconds'], 1) if run['seconds'] else 0.0,
+        'mb_per_s': round(run['bytes'] / run['seconds'] / 1e6, 2) if run['seconds'] else 0.0,
+    }
+    latencies = sorted(run.get('latencies') or [])
+    if latencies:
+        result['p50_us'] = round(percentile(latencies, 0.5) * 1e6, 1)
+        result['p99_us'] = round(percentile(latencies, 0.99) * 1e6, 1)
+    return result
+
+
+def run_suite(cases: list, sizes: list, levels: list, volume: int, repeat: int, max_inflight: int) -> list:
+    """Run every selected case, size and concurrency level."""
+    results = []
+    for name in cases:
+        function, concurrent, max_size = CASES[name]
+        for size in sizes:
+            if max_size is not None and size > max_size:
+                continue
+            for level in (levels if concurrent else [1]):
+                if size * level > max_inflight:
+                    print(f'skip {name} size={size} concurrency={level}: exceeds --max-inflight', file=sys.stderr)
+                    continue
+                runs = [function(size, level, volume) for _ in range(repeat)]
+                result = dict(case=name, size=size, concurrency=level, **summarize(runs))
+                print(json.dumps(result), file=sys.stderr)
+                results.append(result)
+    return results
+
+
+def compare(results: list, baseline: list, threshold: float) -> list:
+    """Compare results with a baseline run.
+
+    Returns:
+        list: Rows with the relative change of throughput and p99 latency;
+        'regressed' marks a drop in throughput or a rise in p99 beyond threshold
+    """
+    index = {(row['case'], row['size'], row['concurrency']): row for row in baseline}
+    rows = []
+    for row in results:
+        old = index.get((row['case'], row['size'], row['concurrency']))
+        if old is None:
+            continue
+        change = {'case': row['case'], 'size': row['size'], 'concurrency': row['concurrency']}
+        change['throughput'] = row['mb_per_s'] / old['mb_per_s'] - 1 if old['mb_per_s'] else 0.0
+        regressed = change['throughput'] < -threshold
+        if 'p99_us' in row and old.get('p99_us'):
+            change['p99'] = row['p99_us'] / old['p99_us'] - 1
+            regressed = regressed or change['p99'] > threshold
+        change['regressed'] = regressed
+        rows.append(change)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Netcore microbenchmark suite')
+    parser.add_argument('--cases', nargs='+', default=list(CASES), help='Case names or prefixes, e.g. lso pipe')
+    parser.add_argument('--sizes', nargs='+', default=['64', '4K', '64K', '1M', '16M'], help='Payload sizes, up to 1G')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16], help='Concurrency levels')
+    parser.add_argument('--volume', default='64M', help='Bytes to move per run')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per combination, the median is reported')
+    parser.add_argument('--max-inflight', default='1G', help='Skip combinations with more payload bytes in flight')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--baseline', help='Compare with the JSON results of an earlier run')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Relative change counted as a regression')
+    args = parser.parse_args()
+
+    cases = [name for name in CASES if any(name == case or name.startswith(case + '.') for case in args.cases)]
+    if not cases:
+        parser.error(f'no case matches {args.cases}, choose from {list(CASES)}')
+    sizes = [parse_size(size) for size in args.sizes]
+    report = {
+        'meta': {
+            'netcore': netcore.__version__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'args': vars(args),
+        },
+        'results': run_suite(cases, sizes, args.concurrency, parse_size(args.volume), args.repeat, parse_size(args.max_inflight)),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        rows = compare(report['results'], baseline, args.threshold)
+        for row in rows:
+            p99 = f"{row['p99']:+.1%}" if 'p99' in row else '-'
+            mark = 'REGRESSED' if row['regressed'] else 'ok'
+            print(f"{row['case']:<24} {row['size']:>12} x{row['concurrency']:<3} throughput {row['throughput']:+.1%}  p99 {p99}  {mark}", file=sys.stderr)
+        if any(row['regressed'] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,7 +6,7 @@ client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 client.connect(('localhost', 8080))
 
 # Create pipe and endpoint
-pipe = Pipe(client.recv, client.send)
+pipe = Pipe.from_socket(client)
 endpoint = Endpoint(pipe)
 
 # Start client (non-blocking)
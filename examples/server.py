@@ -32,7 +32,7 @@ server.listen(5)
 conn, addr = server.accept()
 
 # MultiPipe test
-pipe = Pipe(conn.recv, conn.send)
+pipe = Pipe.from_socket(conn)
 multi_pipe = MultiPipe()
 multi_pipe.add_pipe(pipe)
 
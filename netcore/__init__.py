@@ -4,6 +4,10 @@ from .cache     import Cache
 from .event     import EventEmitter
 from .scheduler import Scheduler
 from .lso       import Pipe, LsoProtocol, Utils
+from .aio       import AsyncPipe, AsyncMultiPipe, AsyncEndpoint
+from .trace     import Tracer, JsonlExporter
+from .shm       import ShmTransport
+from .transport import SocketTransport
 
 __version__ = '0.1.3'
 
@@ -20,5 +24,12 @@ __all__ = [
     'Pipe',
     'LsoProtocol',
     'Utils',
+    'AsyncPipe',
+    'AsyncMultiPipe',
+    'AsyncEndpoint',
+    'Tracer',
+    'JsonlExporter',
+    'ShmTransport',
+    'SocketTransport',
     '__version__'
 ]
\ No newline at end of file
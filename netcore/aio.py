@@ -0,0 +1,721 @@
+from typing    import Any, Callable, Dict, Optional, Union
+from .lso      import Pipe, ChunkStream
+from .endpoint import Endpoint, MultiPipe, Request, Response, get_request, set_request, STRIPE_KEY
+from .error    import EndpointMiddlewareError
+from .trace    import Tracer
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import logging
+from concurrent.futures import Executor
+
+logger = logging.getLogger("netcore.aio")
+
+
+async def _maybe_await(value):
+    """Await `value` if it is awaitable, otherwise return it unchanged."""
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
+async def _call(func: Callable, *args, executor: Optional[Executor] = None):
+    """Call a user callback and await its result.
+
+    Coroutine functions run on the event loop. Plain functions may block, so
+    they run in a worker thread of `executor` (the loop's default executor if
+    None) with the current context, which carries the current request over;
+    an awaitable they return is awaited on the loop.
+    """
+    if inspect.iscoroutinefunction(func):
+        return await func(*args)
+    call = functools.partial(contextvars.copy_context().run, func, *args)
+    result = await asyncio.get_running_loop().run_in_executor(executor, call)
+    return await _maybe_await(result)
+
+
+class AsyncChunkStream(ChunkStream):
+    """ChunkStream that coroutines consume with `async for`.
+
+    Waiting for a chunk that has not arrived yet happens in a worker thread, so
+    the event loop keeps receiving while a streaming handler waits. Plain
+    iteration still works from threads, as for ChunkStream.
+    """
+
+    async def get_async(self, timeout: Optional[float] = None) -> Optional[bytearray]:
+        """Wait for the next chunk without blocking the event loop.
+
+        Args:
+            timeout: Maximum seconds to wait, None to wait indefinitely
+
+        Returns:
+            Optional[bytearray]: The next chunk, None at the end of the mission
+        """
+        with self._condition:
+            ready = self._chunks or self._finished or self._error is not None
+        if ready:
+            # 已有数据时直接取出，不切换线程
+            return self.get()
+        return await asyncio.to_thread(self.get, timeout)
+
+    async def __aiter__(self):
+        """Iterate over chunks until the mission has been fully received."""
+        while True:
+            chunk = await self.get_async()
+            if chunk is None:
+                return
+            yield chunk
+
+    async def read_async(self) -> bytearray:
+        """Wait for the rest of the mission and return it as one buffer.
+
+        Returns:
+            bytearray: All remaining data
+        """
+        data = bytearray()
+        async for chunk in self:
+            data += chunk
+        return data
+
+
+class AsyncPipe(Pipe):
+    """Pipe driven by asyncio streams instead of a recv/send thread pair.
+
+    Shares the mission bookkeeping, scheduling and wire format of Pipe, so an
+    AsyncPipe can talk to a threaded Pipe on the other end. Receiving feeds the
+    frame reader from the StreamReader and applies a frame only once it is fully
+    buffered; sending writes scheduling rounds into the StreamWriter and awaits
+    drain for backpressure.
+
+    `create_mission`, `send` and `cancel_mission` stay synchronous and may be
+    called from the event loop or from other threads.
+    """
+
+    def __init__(
+            self,
+            reader: asyncio.StreamReader,
+            writer: asyncio.StreamWriter,
+            framing: str = 'lso',
+            recv_buff: int = 65536
+        ):
+        """Initialize an AsyncPipe instance.
+
+        Args:
+            reader: Stream reader of the connection
+            writer: Stream writer of the connection
+            framing: Requested frame format, 'lso' or 'binary' (see Pipe)
+            recv_buff: Maximum number of bytes read from the stream at once
+        """
+        super().__init__(self._recv_unavailable, writer.write, framing=framing, recv_buff=0)
+        self.stream_reader = reader
+        self.stream_writer = writer
+        self.recv_buff = recv_buff
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._send_event: Optional[asyncio.Event] = None
+        self._recv_event: Optional[asyncio.Event] = None
+        self._tasks: list[asyncio.Task] = []
+        self._paused_sink: Optional[ChunkStream] = None
+
+    @classmethod
+    async def open_connection(cls, host: str, port: int, framing: str = 'lso', **kwargs) -> 'AsyncPipe':
+        """Connect to a TCP server and wrap the connection.
+
+        Args:
+            host: Server host
+            port: Server port
+            framing: Requested frame format
+            **kwargs: Extra arguments for asyncio.open_connection
+
+        Returns:
+            AsyncPipe: Pipe over the new connection (not started)
+        """
+        reader, writer = await asyncio.open_connection(host, port, **kwargs)
+        return cls(reader, writer, framing=framing)
+
+    @staticmethod
+    def _recv_unavailable(length: int = None) -> bytes:
+        """Guard: frames are only applied once fully buffered."""
+        raise RuntimeError("AsyncPipe frame reader ran out of buffered data")
+
+    def _notify_sender(self) -> None:
+        """Wake the send task; safe to call from any thread."""
+        if self._send_event is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._send_event.set()
+        else:
+            self._loop.call_soon_threadsafe(self._send_event.set)
+
+    def _budget_timeout(self) -> Optional[float]:
+        """Do not wait for send budget on the pipe's own event loop.
+
+        The send task that frees the budget runs on that loop, so a mission
+        created there while the budget is exhausted fails with TimeoutError
+        at once; other threads wait up to send_timeout as with Pipe.
+        """
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is not None and running is self._loop:
+            return 0
+        return self.send_timeout
+
+    def start(self):
+        """Start the pipe's send and receive tasks on the running event loop."""
+        self._loop = asyncio.get_running_loop()
+        self._send_event = asyncio.Event()
+        self._recv_event = asyncio.Event()
+        self._tasks = [
+            self._loop.create_task(self._recv_loop()),
+            self._loop.create_task(self._send_loop()),
+        ]
+
+    async def _wait_sender(self, ready: Callable[[], bool]) -> None:
+        """Wait until `ready()` holds or the pipe is failing."""
+        while True:
+            with self.send_lock:
+                if self.recv_exception or ready():
+                    return
+                self._send_event.clear()
+            await self._send_event.wait()
+
+    async def _send_loop(self):
+        """Main coroutine of the sender, the asyncio counterpart of _send_thread."""
+        try:
+            if self._offers_hello:
+                # 发起帧格式与压缩协商，二进制帧在收到对端握手前不发送其他帧
+                self._send_hello()
+                await self.stream_writer.drain()
+                try:
+                    await asyncio.wait_for(self._wait_sender(lambda: self._handshake_done), self.handshake_timeout)
+                except asyncio.TimeoutError:
+                    # 对端超时未应答时退回 LSO 格式
+                    self._handshake_expired()
+            while True:
+                await self._wait_sender(self._has_pending)
+
+                # 接收任务错误时，停止发送任务
+                if self.recv_exception:
+                    self.recv_exception = False
+                    self._send_error_handler('with_exception')
+                    break
+
+                self._run_send_round()
+                await self.stream_writer.drain()
+        except asyncio.CancelledError:
+            self._send_error_handler('close')
+        except Exception as e:
+            self._send_error_handler('error', e)
+
+    async def _recv_loop(self):
+        """Main coroutine of the receiver, the asyncio counterpart of _recv_thread."""
+        try:
+            while True:
+                size = self._buffered_frame_size()
+                if size is None or self.reader.buffered < size:
+                    data = await self.stream_reader.read(self.recv_buff)
+                    if not data:
+                        raise ConnectionError("Unexpected EOF during frame read")
+                    self.reader.feed(data)
+                    continue
+                self._recv_frame()
+                if self._paused_sink is not None:
+                    await self._wait_drained()
+        except asyncio.CancelledError:
+            self._recv_error_handler('close')
+        except Exception as e:
+            self.recv_exception = True
+            self._wake_sender()
+            self._recv_error_handler('error', e)
+
+    def _peer_lost(self) -> None:
+        """Stop the pipe on its event loop after the peer went silent."""
+        self._loop.call_soon_threadsafe(self.stop)
+
+    def _stream_full(self, sink: ChunkStream) -> None:
+        """Defer backpressure to the receive task instead of blocking the loop."""
+        self._paused_sink = sink
+
+    async def _wait_drained(self) -> None:
+        """Stop reading until the paused chunk stream's consumer catches up."""
+        sink, self._paused_sink = self._paused_sink, None
+        drained = asyncio.Event()
+        sink.on_drain = lambda: self._loop.call_soon_threadsafe(drained.set)
+        while not sink.writable:
+            await drained.wait()
+            drained.clear()
+
+    def _mission_received(self, extension: str) -> None:
+        """Deliver a completed mission and wake `recv_async` waiters."""
+        super()._mission_received(extension)
+        if self._recv_event is not None:
+            self._recv_event.set()
+
+    async def recv_async(self) -> tuple[bytes, dict]:
+        """Wait for and receive data and related information.
+
+        Returns:
+            tuple: (data bytes, info dictionary)
+        """
+        while True:
+            data, info = self.recv()
+            if info is not None:
+                return data, info
+            self._recv_event.clear()
+            await self._recv_event.wait()
+
+    def stop(self):
+        """Stop the pipe's tasks and close the connection."""
+        self.recv_exception = True
+        self._wake_sender()
+        for task in self._tasks:
+            task.cancel()
+        try:
+            self.stream_writer.close()
+        except Exception:
+            pass
+
+
+class AsyncMultiPipe(MultiPipe):
+    """MultiPipe for AsyncPipe instances without per-pipe receive threads.
+
+    Completed missions are pushed straight onto an asyncio queue by each pipe's
+    recv_handler. Pipes added while running are started immediately, and a pipe
+    whose connection fails is removed instead of stopping the whole endpoint.
+    """
+
+    def __init__(self, spill_threshold: int = None, send_budget: int = None, compression: str = None, heartbeat_interval: float = None, resume_dir: str = None):
+        """Create an AsyncMultiPipe.
+
+        Args:
+            spill_threshold: Inbound mission size above which the managed pipes
+                receive into temporary files (see Pipe.spill_threshold)
+            send_budget: Queued outbound bytes per pipe above which sending
+                fails on the event loop and blocks elsewhere (see AsyncPipe)
+            compression: Codec the managed pipes compress outbound missions
+                with when the peer supports it (see Pipe.compression)
+            heartbeat_interval: Seconds between pings on the managed pipes;
+                silent peers are disconnected (see Pipe.heartbeat_interval)
+            resume_dir: Directory where large missions of the managed pipes
+                are kept to continue after a reconnect (see Pipe.resume_dir)
+        """
+        super().__init__(spill_threshold=spill_threshold, send_budget=send_budget, compression=compression, heartbeat_interval=heartbeat_interval, resume_dir=resume_dir)
+        self.recv_queue: Optional[asyncio.Queue] = None
+
+    def add_pipe(self, pipe: AsyncPipe, safe_code: str = None) -> str:
+        """Add a pipe to the pipe pool, starting it if the MultiPipe is running.
+
+        Args:
+            pipe: The AsyncPipe to add
+            safe_code: Optional safe code, auto-generated if not provided
+
+        Returns:
+            str: Safe code for the pipe
+        """
+        safe_code = super().add_pipe(pipe, safe_code)
+        pipe.final_error_handler = functools.partial(self.remove_pipe, safe_code)
+        return safe_code
+
+    def _pipe_received(self, safe_code: str, data, info: dict) -> None:
+        """recv_handler of the managed pipes."""
+        info['pipe_safe_code'] = safe_code
+        joined = STRIPE_KEY in info
+        if joined:
+            data, info = self._join_stripe(safe_code, data, info)
+            if info is None:
+                return
+        self.recv_queue.put_nowait((data, info))
+        if joined and self.release_on_delivery:
+            self.release(info['extension'])
+
+    def start(self):
+        """Start all pipes in the pool on the running event loop."""
+        self.running = True
+        if self.recv_queue is None:
+            self.recv_queue = asyncio.Queue()
+        with self.pipe_lock:
+            for safe_code, pipe in self.pipe_pool.items():
+                pipe.cancel_handler = self._pipe_canceled
+                pipe.mission_complete_handler = self.mission_complete_handler
+                # 与运行中加入的管道一样应用多管道的设置
+                self._start_pipe(safe_code, pipe)
+
+    def stop(self):
+        """Stop all pipes in the pool."""
+        self.running = False
+        with self.pipe_lock:
+            for pipe in self.pipe_pool.values():
+                try:
+                    pipe.stop()
+                except Exception:
+                    pass
+
+    async def recv_async(self) -> tuple[bytes, dict]:
+        """Wait for data from any pipe.
+
+        Returns:
+            Tuple[bytes, dict]: Received data and info
+        """
+        return await self.recv_queue.get()
+
+    def recv(self):
+        """Receive data from the queue without waiting.
+
+        Returns:
+            Tuple[bytes, dict]: Received data and info
+        """
+        if self.recv_queue is None or self.recv_queue.empty():
+            return None, None
+        return self.recv_queue.get_nowait()
+
+    @property
+    def is_data(self):
+        """Check if data is available.
+
+        Returns:
+            bool: Whether data is available
+        """
+        return self.recv_queue is not None and not self.recv_queue.empty()
+
+    @property
+    def recv_exception(self):
+        """Failing pipes are removed, so the MultiPipe itself never fails."""
+        return None
+
+
+class AsyncEndpoint(Endpoint):
+    """Endpoint running on asyncio.
+
+    Route handlers, hooks, middleware-wrapped handlers, error handlers and
+    response callbacks may be `async def` or plain functions; plain functions
+    run in the event loop's default executor so a blocking one does not stall
+    the other connections. Blueprints,
+    EventEmitter, Scheduler and Cache behave as in Endpoint; the current
+    request is tracked per asyncio task, so `request` works inside coroutines.
+
+    Use it over an AsyncPipe or an AsyncMultiPipe. The wire format is the same
+    as Endpoint's, so async and threaded peers can talk to each other.
+
+    Streaming routes get an AsyncChunkStream as `request.stream`: coroutine
+    handlers read it with `async for`, plain functions run in a worker thread
+    of the stream pool and iterate it as with Endpoint.
+    """
+
+    def __init__(self, pipe: Union[AsyncPipe, AsyncMultiPipe], max_workers: int = 100, spill_threshold: int = None, send_budget: int = None, compression: str = None, heartbeat_interval: float = None, resume_dir: str = None, tracer: Tracer = None, max_streams: int = 16):
+        """Create an async endpoint.
+
+        Args:
+            pipe: AsyncPipe or AsyncMultiPipe instance
+            max_workers: Maximum number of requests handled concurrently
+            spill_threshold: Request size in bytes above which request bodies are
+                received into temporary LSO files instead of memory
+            send_budget: Queued outbound bytes per pipe above which sending
+                from the event loop raises TimeoutError (see AsyncPipe), None
+                for no limit
+            compression: Codec used for outbound messages when the peer supports
+                it (see Pipe.compression), None to send raw
+            heartbeat_interval: Seconds between pings; silent peers are
+                disconnected (see Pipe.heartbeat_interval)
+            resume_dir: Directory where large messages are kept so they
+                continue after a reconnect (see Pipe.resume_dir)
+            tracer: Tracer sampling requests and recording the latency of
+                each stage (see netcore.trace.Tracer), None to disable
+            max_streams: Number of streaming route handlers running at once;
+                further streaming missions are handled once fully received
+        """
+        super().__init__(pipe, max_workers=1, spill_threshold=spill_threshold, send_budget=send_budget, compression=compression, heartbeat_interval=heartbeat_interval, resume_dir=resume_dir, tracer=tracer, max_streams=max_streams)
+        self.max_workers = max_workers
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: set[asyncio.Task] = set()
+        self._handler_task: Optional[asyncio.Task] = None
+        self._stopped: Optional[asyncio.Event] = None
+        if isinstance(pipe, AsyncPipe):
+            pipe.recv_handler = self._pipe_received
+
+    def _pipe_received(self, data, info: dict) -> None:
+        """recv_handler of a single AsyncPipe."""
+        if self.tracer is not None:
+            self._trace_stage(info, 'dispatch', ('received',), 'queued')
+        self.request_queue.put_nowait((data, info))
+
+    def _wrap_handler(self, func: Callable) -> Callable:
+        """Wrap a route handler with hooks, middleware and error handling.
+
+        Every step may return an awaitable, which is awaited. Plain functions
+        run in a worker thread; those of streaming routes in the stream pool,
+        as they block while waiting for chunks.
+
+        Args:
+            func: The route handler function
+
+        Returns:
+            Callable: Coroutine function running the whole chain
+        """
+        @functools.wraps(func)
+        async def wrapper():
+            executor = self.stream_pool if get_request().stream is not None else None
+            try:
+                # 执行请求前钩子
+                for before_func in self.before_request_funcs:
+                    before_result = await _call(before_func, executor=executor)
+                    if before_result is not None:
+                        return before_result
+
+                # 执行中间件链
+                handler = func
+                for middleware in self.middlewares:
+                    handler = middleware(handler)
+
+                # 执行实际处理函数
+                result = await _call(handler, executor=executor)
+
+                # 执行请求后钩子
+                for after_func in self.after_request_funcs:
+                    after_result = await _call(after_func, result, executor=executor)
+                    if after_result is not None:
+                        result = after_result
+                return result
+            except Exception as e:
+                # 执行错误处理
+                if self.error_handler:
+                    return await _call(self.error_handler, e)
+                raise EndpointMiddlewareError('Endpoint middleware error', e)
+        return wrapper
+
+    def _stream_requested(self, extension: str, info: dict, length: int) -> ChunkStream:
+        """stream_handler of the pipe: start streaming routes at the mission head.
+
+        Args:
+            extension: Mission extension
+            info: Mission info
+            length: Announced mission length, None if unknown
+
+        Returns:
+            ChunkStream: Stream the pipe delivers the chunks into, None for other routes
+        """
+        if info.get('is_response'):
+            return None
+        route = self.stream_routes.get(info.get('route'))
+        if route is None or not self._acquire_stream(extension):
+            return None
+        sink = AsyncChunkStream(route['buffer'], length)
+        # 流式处理不占用并发信号量，以免与背压互相等待
+        task = self._loop.create_task(self._process_stream(sink, info, route['handler']))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return sink
+
+    async def _process_stream(self, sink: ChunkStream, info: dict, handler: Callable) -> None:
+        """Run a streaming route handler in its own task.
+
+        Args:
+            sink: Chunk stream of the mission
+            info: Mission info
+            handler: Wrapped streaming route handler
+        """
+        req = Request(b'', info)
+        req.stream = sink
+        set_request(req)
+        try:
+            result = await self._run_route(handler, req)
+        finally:
+            # 处理函数未读完的数据直接丢弃，避免阻塞管道
+            sink.discard()
+            set_request(None)
+            self._release_stream()
+
+        # 触发请求事件
+        self.event.emit('request', req)
+        if isinstance(result, Response):
+            self.event.emit('response', result)
+
+    async def _run_route(self, handler: Callable, req: Request):
+        """Run a wrapped route handler and send its Response, if any.
+
+        Args:
+            handler: Wrapped route handler
+            req: The current request
+
+        Returns:
+            The handler's (or error handler's) result
+        """
+        result = None
+        try:
+            result = await handler()
+            if isinstance(result, Response):
+                self._send_response_with_pipe(result, req)
+        except Exception as e:
+            if self.error_handler:
+                try:
+                    result = await _call(self.error_handler, e)
+                    if isinstance(result, Response):
+                        self._send_response_with_pipe(result, req)
+                except Exception as e2:
+                    logger.error(f"Error handler encountered an error: {e2}")
+            else:
+                logger.error(f"Error processing route '{req.route}': {e}")
+        return result
+
+    async def _process_request(self, data, info: dict) -> None:
+        """Process one received message in its own task.
+
+        Args:
+            data: Received message data
+            info: Received message info
+        """
+        traced = self.tracer is not None and self._trace_stage(info, 'request.queue', ('queued', 'received'), 'started')
+        try:
+            await self._handle_request(data, info)
+        finally:
+            if traced:
+                self._trace_stage(info, 'handler', ('started',), 'handled')
+            self._release(info)
+
+    async def _handle_request(self, data, info: dict) -> None:
+        """Run the response handler or route of one received message.
+
+        Args:
+            data: Received message data
+            info: Received message info
+        """
+        async with self._semaphore:
+            req = Request(data, info)
+            set_request(req)  # 设置当前任务的请求对象
+
+            # 处理消息ID的响应
+            message_id = req.message_id
+            if self.tracer is not None and message_id in self._traces:
+                self._trace_response(message_id)
+            with self.lock:
+                handler = self.response_handlers.pop(message_id, None) if message_id else None
+                if handler is not None:
+                    self.message_to_pipe.pop(message_id, None)
+            if handler is not None:
+                try:
+                    await _call(handler, req)
+                except Exception as e:
+                    logger.error(f"Error processing response ID '{message_id}': {e}")
+                return
+
+            route = req.route
+            result = None
+
+            # 有路由的情况，调用对应的处理函数
+            if route and route in self.routes:
+                result = await self._run_route(self.routes[route], req)
+            # 超出流式处理上限的流式任务已完整接收，直接处理
+            elif route and route in self.stream_routes:
+                req.stream = AsyncChunkStream.from_data(data)
+                result = await self._run_route(self.stream_routes[route]['handler'], req)
+            # 没有路由或路由未注册，使用默认处理器
+            elif self.default_handler:
+                try:
+                    await _call(self.default_handler)
+                except Exception as e:
+                    if self.error_handler:
+                        try:
+                            await _call(self.error_handler, e)
+                        except Exception as e2:
+                            logger.error(f"Error processing route '{route}': {e}")
+                    else:
+                        logger.error(f"Default handler encountered an error processing message: {e}")
+
+            # 触发请求事件
+            self.event.emit('request', req)
+
+            # 处理响应后触发响应事件
+            if isinstance(result, Response):
+                self.event.emit('response', result)
+
+    async def _handle_requests(self):
+        """Dispatch received messages to concurrent handler tasks."""
+        while self.running:
+            if isinstance(self.pipe, AsyncMultiPipe):
+                data, info = await self.pipe.recv_async()
+            else:
+                data, info = await self.request_queue.get()
+            task = self._loop.create_task(self._process_request(data, info))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def send(self, route: str, data: Any, callback: Callable = None, blocking_recv: bool = False, pipe_safe_code: str = None) -> Union[str, Request, Dict[str, str]]:
+        """Send a request to the remote endpoint.
+
+        Args:
+            route: The route to send the request to
+            data: The request data
+            callback: Optional response callback, may be a coroutine function
+            blocking_recv: If True, await and return the response
+            pipe_safe_code: Optional pipe safe code for AsyncMultiPipe
+
+        Returns:
+            str: Message ID if not blocking
+            Request: Response request object if blocking
+            Dict[str, str]: Dictionary containing both message_id and mission_extension
+        """
+        if not blocking_recv:
+            return Endpoint.send(self, route, data, callback=callback, pipe_safe_code=pipe_safe_code)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def set_result(response: Request):
+            if not future.done():
+                future.set_result(response)
+
+        def resolve(response: Request):
+            # 同步回调在工作线程中执行，结果交回事件循环设置
+            loop.call_soon_threadsafe(set_result, response)
+
+        Endpoint.send(self, route, data, callback=resolve, pipe_safe_code=pipe_safe_code)
+        response = await future
+        if response.is_cancel:
+            logger.info(f"Blocking receive for {response.message_id} was cancelled")
+        return response
+
+    def start(self, block: bool = True):
+        """Start the endpoint on the running event loop.
+
+        Args:
+            block: Ignored, use `serve()` to wait until the endpoint stops
+        """
+        self._loop = asyncio.get_running_loop()
+        self._semaphore = asyncio.Semaphore(self.max_workers)
+        self._stopped = asyncio.Event()
+        self.request_queue = asyncio.Queue()
+        self.pipe.stream_handler = self._stream_requested
+        self.pipe.start()
+        self.running = True
+        self.scheduler.start()
+        # 触发启动事件
+        self.event.emit('start')
+        self._handler_task = self._loop.create_task(self._handle_requests())
+
+    async def serve(self):
+        """Start the endpoint and wait until it stops."""
+        self.start()
+        await self._stopped.wait()
+
+    def stop(self):
+        """Stop the endpoint and release resources."""
+        with self.lock:
+            if not self.running:  # 如果已经停止，直接返回
+                return
+            self.running = False
+            self.scheduler.stop()  # 停止调度器
+            if self._handler_task:
+                self._handler_task.cancel()
+            self.pipe.stop()
+            if self._stopped:
+                self._stopped.set()
+
+            # 触发停止事件
+            self.event.emit('stop')
+            logger.info("Endpoint stopped")
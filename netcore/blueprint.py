@@ -25,6 +25,7 @@ class Blueprint:
         self.name = name
         self.prefix = prefix
         self.routes: Dict[str, Callable] = {}
+        self.stream_routes: Dict[str, dict] = {}  # 流式路由
         self.middlewares: List[Callable] = []  # 蓝图中间件列表
         self.error_handler = None  # 蓝图错误处理器
         self.before_request_funcs: List[Callable] = []  # 请求前钩子
@@ -50,6 +51,26 @@ class Blueprint:
             return func
         return decorator
 
+    def stream(self, route: str, buffer: int = 1048576):
+        """Streaming route decorator, see Endpoint.stream.
+        
+        Args:
+            route: Route path without prefix
+            buffer: Maximum number of bytes queued for the handler
+            
+        Returns:
+            Decorator function
+        """
+        def decorator(func):
+            full_route = f"{self.prefix}{route}"
+            self.stream_routes[full_route] = {
+                'handler': func,
+                'buffer': buffer,
+            }
+            logger.debug(f"Blueprint '{self.name}' registered stream route '{full_route}'")
+            return func
+        return decorator
+
     def middleware(self, func):
         """Middleware decorator.
         
@@ -3,13 +3,18 @@ from typing     import Any, Dict, Callable, List, Union
 from .event     import EventEmitter
 from .scheduler import Scheduler
 from .cache     import Cache
+from .reactor   import Reactor
 from .error     import *
+from .trace     import Tracer
+from time       import perf_counter
 
 import json
 import threading
 import logging
 import functools
+import itertools
 import queue
+import contextvars
 from concurrent.futures import ThreadPoolExecutor
 
 # 配置日志记录器
@@ -18,6 +23,12 @@ logger = logging.getLogger("netcore")
 # 线程本地存储
 _thread_local = threading.local()
 
+# 上下文变量，同时隔离线程与 asyncio 任务中的请求对象
+_request_context: contextvars.ContextVar = contextvars.ContextVar('netcore_request', default=None)
+
+# 条带任务分片的元信息键，接收端 MultiPipe 据此按偏移重组
+STRIPE_KEY = '_stripe'
+
 # 请求类
 class Request:
     """Request object class for accessing request information.
@@ -27,49 +38,80 @@ class Request:
     header information, and pipe source tracking for MultiPipe environments.
     
     Attributes:
-        meta (bytes): Raw binary data of the request
+        meta (bytes|bytearray): Raw binary data of the request, the pipe's reassembly
+            buffer itself (not a copy) for received missions
         route (str): The request route or path
         message_id (str): Unique identifier for the request/response
         is_response (bool): Whether this request is a response to another request
         is_cancel (bool): Whether this request is a cancellation notification
         json (dict): Request data parsed as JSON (empty dict if invalid)
         string (str): Request data decoded as UTF-8 string (empty string if invalid)
+        stream (ChunkStream): Chunks of the mission as they arrive, for streaming
+            routes only (meta is empty then), None otherwise
+        local (str): Path of the temporary LSO file holding a spilled body (meta
+            is then an mmap-backed memoryview), None for in-memory bodies
     """
     
     def __init__(self, meta: bytes = None, info: dict = None):
         """Initialize a Request object.
         
+        Bytes-like data is kept as-is without copying; JSON and string views
+        are parsed lazily on first access.
+        
         Args:
             meta: Raw binary data of the request
             info: Dictionary with request metadata/headers
         """
         info = info or {}
-        self.meta = meta if isinstance(meta, bytes) else bytes(meta or b'')
-        self.json = None
-        self.string = None
+        self.meta = meta if isinstance(meta, (bytes, bytearray, memoryview)) else bytes(meta or b'')
+        self._json = None
+        self._string = None
         self.route = info.get('route', '')
         self.message_id = info.get('message_id', '')
         self._pipe_safe_code = info.get('pipe_safe_code', None)
         self.is_response = info.get('is_response', False)
         self.is_cancel = info.get('is_cancel', False)
+        self.stream: ChunkStream = None
+        self.local = info.get('local', None)
         self._headers = {k: v for k, v in info.items() 
                         if k not in ['route', 'message_id', 'pipe_safe_code', 
-                                    'is_response', 'is_cancel']}
-        self._parse()
+                                    'is_response', 'is_cancel', 'local']}
     
-    def _parse(self):
-        """Parse the raw data into different formats."""
-        # 解析JSON
-        try:
-            self.json = json.loads(self.meta)
-        except (json.JSONDecodeError, TypeError, ValueError):
-            self.json = {}
-            
-        # 解析字符串
-        try:
-            self.string = self.meta.decode('utf-8')
-        except (UnicodeDecodeError, AttributeError):
-            self.string = ''
+    @property
+    def json(self):
+        """Get the request data parsed as JSON, parsed on first access.
+        
+        Returns:
+            dict: Parsed JSON data (empty dict if invalid)
+        """
+        if self._json is None:
+            try:
+                self._json = json.loads(self.string if isinstance(self.meta, memoryview) else self.meta)
+            except (json.JSONDecodeError, TypeError, ValueError):
+                self._json = {}
+        return self._json
+    
+    @json.setter
+    def json(self, value):
+        self._json = value
+    
+    @property
+    def string(self):
+        """Get the request data decoded as UTF-8, decoded on first access.
+        
+        Returns:
+            str: Decoded string (empty string if invalid)
+        """
+        if self._string is None:
+            try:
+                self._string = str(self.meta, 'utf-8')
+            except (UnicodeDecodeError, TypeError):
+                self._string = ''
+        return self._string
+    
+    @string.setter
+    def string(self, value):
+        self._string = value
     
     @property
     def pipe_safe_code(self):
@@ -169,23 +211,34 @@ class RequestProxy:
     """
     
     def __getattr__(self, name) -> Request:
-        if not hasattr(_thread_local, 'request'):
-            _thread_local.request = Request(b'')
-        return getattr(_thread_local.request, name)
+        return getattr(get_request(), name)
     
     def __setattr__(self, name, value):
-        if not hasattr(_thread_local, 'request'):
-            _thread_local.request = Request(b'')
-        setattr(_thread_local.request, name, value)
+        setattr(get_request(), name, value)
+
+# 获取当前上下文的请求对象
+def get_request() -> Request:
+    """Get the request object of the current thread or asyncio task.
+    
+    Returns:
+        Request: The current request, an empty Request if none was set
+    """
+    req = _request_context.get()
+    if req is not None:
+        return req
+    if not hasattr(_thread_local, 'request'):
+        _thread_local.request = Request(b'')
+    return _thread_local.request
 
 # 设置当前线程的请求对象
 def set_request(req):
-    """Set the request object for the current thread.
+    """Set the request object for the current thread or asyncio task.
     
     Args:
-        req: The Request object to set as the current thread's request
+        req: The Request object to set as the current request
     """
     _thread_local.request = req
+    _request_context.set(req)
 
 # 全局请求对象 - 现在是一个代理
 request: Request = RequestProxy()
@@ -210,6 +263,9 @@ class Response:
     def to_bytes(self) -> bytes:
         """Convert response data to bytes format.
         
+        Stream sources (iterators, file objects, LsoProtocol) are returned
+        unchanged so the pipe can stream them.
+        
         Returns:
             bytes: The response data in bytes format
         """
@@ -221,6 +277,9 @@ class Response:
             return self.data
         elif isinstance(self.data, bytearray):
             return self.data
+        elif Utils.is_stream_source(self.data):
+            # 流式数据源原样交给管道，由发送调度按需读取
+            return self.data
         else:
             return str(self.data).encode('utf-8')
 
@@ -230,8 +289,31 @@ class MultiPipe:
     
     Allows an endpoint to communicate through multiple pipes simultaneously,
     providing pipe pooling and management capabilities.
+    
+    By default every pipe runs its own send and receive threads. With
+    `reactors` set, socket-backed pipes are instead driven by that many shared
+    selector loops (see Reactor), so the number of threads no longer grows with
+    the number of connections. Completed missions of all pipes are handed to
+    `recv_handler` if set (Endpoint sets it to its work queue), or queued for
+    `recv` otherwise.
     """
-    def __init__(self):
+    def __init__(self, reactors: int = 0, spill_threshold: int = None, send_budget: int = None, compression: str = None, heartbeat_interval: float = None, resume_dir: str = None):
+        """Create a MultiPipe.
+        
+        Args:
+            reactors: Number of shared selector loops driving socket-backed
+                pipes; 0 (default) starts threads per pipe
+            spill_threshold: Inbound mission size above which the managed pipes
+                receive into temporary files (see Pipe.spill_threshold)
+            send_budget: Queued outbound bytes per pipe above which sending
+                blocks (see Pipe.send_budget)
+            compression: Codec the managed pipes compress outbound missions
+                with when the peer supports it (see Pipe.compression)
+            heartbeat_interval: Seconds between pings on the managed pipes;
+                silent peers are disconnected (see Pipe.heartbeat_interval)
+            resume_dir: Directory where large missions of the managed pipes
+                are kept to continue after a reconnect (see Pipe.resume_dir)
+        """
         self.pipe_pool: Dict[str, Pipe] = {}
         self.pipe_info: Dict[str, dict] = {}
         self.pipe_lock = threading.RLock()
@@ -240,18 +322,43 @@ class MultiPipe:
         self.final_error_handler: Callable = None
         self.cancel_handler: Callable[[str], None] = self._cancel_handler
         self.mission_complete_handler: Callable[[str], None] = self._mission_complete_handler
+        # 设置后，所有管道完成的任务直接交给该处理器而不进入 recv_queue
+        self.recv_handler: Callable[[Any, dict], None] = None
+        # 设置后，所有管道的任务头都先交给该处理器，见 Pipe.stream_handler
+        self.stream_handler: Callable[[str, dict, int], ChunkStream] = None
         
         # 添加接收队列，用于存储来自所有管道的数据
         self.recv_queue = queue.Queue()
-        self.recv_threads = {}
         self.running = False
         self._recv_exception = None
+        
+        self.spill_threshold = spill_threshold
+        self.send_budget = send_budget
+        self.compression = compression
+        self.heartbeat_interval = heartbeat_interval
+        self.resume_dir = resume_dir
+        # 应用到所有管道，见 Pipe.metrics 与 Pipe.tracer
+        self.metrics = True
+        self.tracer: Tracer = None
+        # 应用到所有管道，见 Pipe.release_on_delivery
+        self.release_on_delivery = True
+        
+        # 接收中的条带任务：条带标识 -> 重组状态，见 _open_stripes
+        self._stripes: Dict[str, dict] = {}
+        # 已交付未释放的条带任务：条带标识 -> 占用接收窗口的管道安全码
+        self._joined: Dict[str, set] = {}
+        self._stripe_lock = threading.Lock()
+        
+        # 共享的 I/O 循环，按轮询方式分配管道
+        self.reactor_count = reactors
+        self.reactors: List[Reactor] = []
+        self._reactor_turn = itertools.count()
     
     def __call__(self, safe_code: str) -> Pipe:
         return self.get_pipe(safe_code)[0]
 
     def add_pipe(self, pipe: Pipe, safe_code: str = None):
-        """Add a pipe to the pipe pool.
+        """Add a pipe to the pipe pool, starting it if the MultiPipe is running.
         
         Args:
             pipe: The pipe object to add
@@ -273,9 +380,13 @@ class MultiPipe:
         
         # 设置管道的处理器
         pipe.final_error_handler = self.final_error_handler
-        pipe.cancel_handler = self.cancel_handler
+        pipe.cancel_handler = self._pipe_canceled
         pipe.mission_complete_handler = self.mission_complete_handler
+        pipe.recv_handler = functools.partial(self._pipe_received, safe_code)
+        pipe.stream_handler = functools.partial(self._pipe_stream_requested, safe_code)
         
+        if self.running:
+            self._start_pipe(safe_code, pipe)
         return safe_code
     
     def get_pipe(self, safe_code: str) -> Tuple[Pipe, dict]:
@@ -316,10 +427,6 @@ class MultiPipe:
                 del self.pipe_info[safe_code]
                 return True
         
-        # 停止接收线程
-        if safe_code in self.recv_threads:
-            self.recv_threads.pop(safe_code)
-        
         return False
     
     def clear(self):
@@ -335,30 +442,27 @@ class MultiPipe:
         
         with self.info_lock:
             self.pipe_info.clear()
-        
-        # 清空接收线程
-        self.recv_threads.clear()
     
     def start(self):
         """Start all pipes in the pool."""
+        if self.reactor_count and not self.reactors:
+            for index in range(self.reactor_count):
+                reactor = Reactor(name=f'netcore-reactor-{index}')
+                reactor.start()
+                self.reactors.append(reactor)
         self.running = True
         
         with self.pipe_lock:
-            with self.info_lock:
-                for safe_code, pipe in self.pipe_pool.items():
-                    pipe.final_error_handler = self.final_error_handler
-                    pipe.cancel_handler = self.cancel_handler
-                    pipe.mission_complete_handler = self.mission_complete_handler
-                    
-                    # 启动管道
-                    pipe.start()
-                    self.pipe_info[safe_code]['running'] = True
-                    
-                    # 为每个管道创建接收线程
-                    self._start_recv_thread(safe_code, pipe)
+            for safe_code, pipe in self.pipe_pool.items():
+                pipe.final_error_handler = self.final_error_handler
+                pipe.cancel_handler = self._pipe_canceled
+                pipe.mission_complete_handler = self.mission_complete_handler
+                
+                # 启动管道
+                self._start_pipe(safe_code, pipe)
     
     def stop(self):
-        """Stop all pipes in the pool."""
+        """Stop all pipes in the pool and the shared I/O loops."""
         self.running = False
         
         # 停止所有管道
@@ -368,57 +472,218 @@ class MultiPipe:
                     pipe.stop()
                 except:
                     pass
-                
-        # 等待所有接收线程结束
-        for thread in self.recv_threads.values():
-            if thread and thread.is_alive():
-                thread.join(timeout=1.0)
+        
+        # 停止共享的 I/O 循环
+        for reactor in self.reactors:
+            reactor.stop()
+        self.reactors.clear()
     
-    def _start_recv_thread(self, safe_code, pipe):
-        """Start a receive thread for the specified pipe.
+    def _start_pipe(self, safe_code: str, pipe: Pipe) -> None:
+        """Start a pipe, on a shared reactor if possible.
         
         Args:
             safe_code: Safe code of the pipe
             pipe: Pipe object
         """
-        thread = threading.Thread(
-            target=self._pipe_recv_thread,
-            args=(safe_code, pipe),
-            daemon=True
-        )
-        thread.start()
-        self.recv_threads[safe_code] = thread
+        if self.spill_threshold is not None:
+            pipe.spill_threshold = self.spill_threshold
+        if self.send_budget is not None:
+            pipe.send_budget = self.send_budget
+        if self.compression is not None:
+            pipe.compression = self.compression
+        if self.heartbeat_interval is not None:
+            pipe.heartbeat_interval = self.heartbeat_interval
+        if self.resume_dir is not None:
+            pipe.resume_dir = self.resume_dir
+        pipe.release_on_delivery = self.release_on_delivery
+        pipe.metrics = self.metrics
+        if self.tracer is not None:
+            pipe.tracer = self.tracer
+        if self.reactors and pipe.socket is not None:
+            reactor = self.reactors[next(self._reactor_turn) % len(self.reactors)]
+            reactor.add_pipe(pipe)
+        else:
+            pipe.start()
+        with self.info_lock:
+            if safe_code in self.pipe_info:
+                self.pipe_info[safe_code]['running'] = True
     
-    def _pipe_recv_thread(self, safe_code, pipe):
-        """Pipe receive thread function.
+    def _pipe_received(self, safe_code: str, data, info: dict) -> None:
+        """recv_handler of the managed pipes.
         
-        Receives data from the specified pipe and puts it into the receive queue.
+        Tags the info with the pipe's safe code and hands the mission on.
         
         Args:
             safe_code: Safe code of the pipe
-            pipe: Pipe object
+            data: Received data
+            info: Received info
         """
+        # 将管道安全码添加到info中
+        info['pipe_safe_code'] = safe_code
+        joined = STRIPE_KEY in info
+        if joined:
+            data, info = self._join_stripe(safe_code, data, info)
+            if info is None:
+                return
+        handler = self.recv_handler
         try:
-            while self.running:
-                if not pipe.is_data:
-                    if pipe.recv_exception:
-                        logger.error(f"Pipe {safe_code} receive exception: {pipe.recv_exception}")
-                        self._recv_exception = pipe.recv_exception
-                        continue
-                    continue
-                
-                data, info = pipe.recv()
-                if not data or not info:
-                    continue
-                
-                # 将管道安全码添加到info中
-                info['pipe_safe_code'] = safe_code
-                
-                # 放入接收队列
+            if handler is not None:
+                handler(data, info)
+            else:
                 self.recv_queue.put((data, info))
-        except Exception as e:
-            logger.error(f"Pipe {safe_code} thread error: {e}")
-            self._recv_exception = e
+        finally:
+            if joined and self.release_on_delivery:
+                # 管道只释放条带本身，重组后的任务在此释放
+                self.release(info['extension'])
+    
+    def _pipe_stream_requested(self, safe_code: str, extension: str, info: dict, length: int) -> ChunkStream:
+        """stream_handler of the managed pipes.
+        
+        Args:
+            safe_code: Safe code of the pipe
+            extension: Mission extension
+            info: Mission info
+            length: Announced mission length, None if unknown
+            
+        Returns:
+            ChunkStream: Stream to deliver the mission into, None to reassemble it
+        """
+        handler = self.stream_handler
+        if handler is None or STRIPE_KEY in info:
+            # 条带任务的分片先重组再交付
+            return None
+        info['pipe_safe_code'] = safe_code
+        return handler(extension, info, length)
+    
+    def _join_stripe(self, safe_code: str, data, info: dict) -> tuple:
+        """Copy a received stripe into its mission's buffer.
+        
+        A stripe delivered twice, e.g. again after a resume, is dropped. While
+        the mission is kept in memory, each stripe's bytes stay in its pipe's
+        receive window until the reassembled mission is released; stripes of
+        a spilled mission are released once copied.
+        
+        Args:
+            safe_code: Safe code of the pipe the stripe arrived on
+            data: Stripe data
+            info: Stripe info, carrying STRIPE_KEY
+            
+        Returns:
+            tuple: The reassembled data and info once every stripe arrived,
+                (None, None) before that
+            
+        Raises:
+            ValueError: If the stripe disagrees with the mission's other
+                stripes or lies outside the announced mission length
+        """
+        stripe = info.pop(STRIPE_KEY)
+        extension, size = info['extension'], len(data)
+        pipe = self.get_pipe(safe_code)[0]
+        with self._stripe_lock:
+            entry = self._stripes.get(stripe['id'])
+            self._check_stripe(stripe, size, entry or stripe)
+            if entry is None:
+                entry = self._stripes[stripe['id']] = self._open_stripes(pipe, stripe, info)
+            duplicate = stripe['index'] in entry['received']
+            entry['received'].add(stripe['index'])
+        if duplicate:
+            logger.debug(f"Dropped duplicate stripe {stripe['index']} of {stripe['id']}")
+            self.release(extension, safe_code)
+            return None, None
+        # 各管道的接收线程并行拷贝，互不重叠
+        entry['data'][stripe['offset']:stripe['offset'] + size] = data
+        in_memory = isinstance(entry['data'], bytearray)
+        if not in_memory:
+            self.release(extension, safe_code)
+        with self._stripe_lock:
+            if in_memory:
+                # 条带占用的接收窗口转到整个任务名下，交付并释放后才归还
+                entry['moved'] += pipe._move_hold(extension, stripe['id'])
+                entry['pipes'].add(safe_code)
+            if self._stripes.get(stripe['id']) is not entry:
+                # 任务已被取消
+                pipe.release(stripe['id'])
+                return None, None
+            entry['left'] -= 1
+            done = not entry['left']
+            if done:
+                self._stripes.pop(stripe['id'])
+                self._joined[stripe['id']] = entry['pipes']
+        if not done:
+            return None, None
+        owner = entry['pipe']
+        owner._unreserve(entry['reserved'])
+        if in_memory and entry['length'] > entry['moved']:
+            # 落盘或未计入窗口的条带，由分配缓冲区的管道补足
+            owner._hold(stripe['id'], entry['length'] - entry['moved'])
+            entry['pipes'].add(entry['safe_code'])
+        return entry['data'], entry['info']
+    
+    @staticmethod
+    def _check_stripe(stripe: dict, size: int, head: dict) -> None:
+        """Check a stripe against the head of its mission.
+        
+        Args:
+            stripe: Stripe head
+            size: Length of the stripe data
+            head: Head of the mission's first stripe, or `stripe` itself
+            
+        Raises:
+            ValueError: If the stripe disagrees with the head
+        """
+        if (stripe['length'] != head['length'] or stripe['count'] != head['count']
+                or not 0 <= stripe['index'] < head['count']
+                or not 0 <= stripe['offset'] <= stripe['offset'] + size <= head['length']):
+            raise ValueError(f"{stripe['id']} stripe {stripe['index']} disagrees with the mission head.")
+    
+    def _open_stripes(self, pipe: Pipe, stripe: dict, info: dict) -> dict:
+        """Allocate the reassembly state of a striped mission.
+        
+        The buffer comes from the pipe the first stripe arrived on, the same
+        way as for a single mission (see Pipe._allocate): it counts against
+        that pipe's recv_budget and is a temporary file above spill_threshold.
+        Missions that do not fit the pipe's receive window are spilled too.
+        
+        Args:
+            pipe: Pipe the first stripe arrived on
+            stripe: Stripe head
+            info: Stripe info
+            
+        Returns:
+            dict: Buffer, info and progress of the mission
+        """
+        info = dict(info, extension=stripe['id'])
+        info.pop('local', None)
+        # 条带在任务交付前一直占用接收窗口，窗口容不下整个任务时只能落盘
+        spill = pipe.recv_window is not None and stripe['length'] >= pipe.recv_window
+        buffer = pipe._allocate({'extension': stripe['id'], 'length': stripe['length'], 'info': info}, spill)
+        return {
+            'data': buffer,
+            'info': info,
+            'length': stripe['length'],
+            'count': stripe['count'],
+            'left': stripe['count'],
+            'received': set(),
+            'pipe': pipe,
+            'safe_code': info['pipe_safe_code'],
+            'reserved': len(buffer) if isinstance(buffer, bytearray) else 0,
+            'pipes': set(),
+            'moved': 0,
+        }
+    
+    def _pipe_canceled(self, extension: str) -> None:
+        """cancel_handler of the managed pipes: drop a partly received striped mission.
+        
+        Args:
+            extension: Task identifier
+        """
+        stripe_id = extension.rpartition('-')[0]
+        with self._stripe_lock:
+            entry = self._stripes.pop(stripe_id, None)
+        if entry is not None:
+            entry['pipe']._unreserve(entry['reserved'])
+            self._release_joined(stripe_id, entry['pipes'])
+        self.cancel_handler(extension)
     
     def _mission_complete_handler(self, extension: str) -> None:
         """Mission complete handler.
@@ -447,13 +712,14 @@ class MultiPipe:
         except queue.Empty:
             return None, None
     
-    def send(self, data, info, safe_code=None):
+    def send(self, data, info, safe_code=None, **kwargs):
         """Send data through a specified pipe.
         
         Args:
             data: Data to send
             info: Associated info
             safe_code: Optional safe code for the pipe, uses first available if not provided
+            **kwargs: Mission options passed to Pipe.send (length, priority, weight)
             
         Returns:
             str: Task identifier
@@ -462,7 +728,7 @@ class MultiPipe:
             with self.pipe_lock:
                 pipe = self.pipe_pool.get(safe_code)
                 if pipe:
-                    return pipe.send(data, info)
+                    return pipe.send(data, info, **kwargs)
                 else:
                     logger.error(f"Pipe with safe_code {safe_code} not found")
                     return None
@@ -476,7 +742,75 @@ class MultiPipe:
                 # 获取第一个管道
                 first_safe_code = next(iter(self.pipe_pool))
                 pipe = self.pipe_pool[first_safe_code]
-                return pipe.send(data, info)
+                return pipe.send(data, info, **kwargs)
+    
+    def send_striped(self, data, info, safe_codes=None, stripes=None, extension=None, **kwargs):
+        """Send one payload split into ranges over several pipes at once.
+        
+        The ranges come from Utils.calc_divisional_range and are sent as
+        missions '<extension>-<index>' on the pipes in turn, so on a link where
+        one connection cannot fill the bandwidth-delay product the pipes add up.
+        The peer's MultiPipe reassembles them by offset and delivers a single
+        mission under `extension`. All pipes used must lead to the same peer.
+        
+        Args:
+            data: Bytes-like payload
+            info: Associated info
+            safe_codes: Safe codes of the pipes to use, all pipes if not provided
+            stripes: Number of ranges, defaults to the number of pipes
+            extension: Optional mission identifier, auto-generated if not provided
+            **kwargs: Mission options passed to Pipe.create_mission (buff, priority, weight)
+            
+        Returns:
+            str: Task identifier, None if no pipe is available
+        """
+        with self.pipe_lock:
+            if safe_codes is None:
+                safe_codes = list(self.pipe_pool)
+            pipes = [self.pipe_pool[code] for code in safe_codes if code in self.pipe_pool]
+        if not pipes:
+            logger.error("No pipes available")
+            return None
+        view = memoryview(data).cast('B')
+        extension = extension or Utils.safe_code(6)
+        ranges = Utils.calc_divisional_range(view.nbytes, stripes or len(pipes)) or [[0, -1]]
+        for index, (start, end) in enumerate(ranges):
+            stripe = {'id': extension, 'index': index, 'count': len(ranges), 'offset': start, 'length': view.nbytes}
+            pipe = pipes[index % len(pipes)]
+            pipe.create_mission(view[start:end + 1], dict(info, **{STRIPE_KEY: stripe}), f'{extension}-{index}', **kwargs)
+        return extension
+    
+    def release(self, extension, safe_code=None):
+        """Return a delivered mission's bytes to its pipe's receive window.
+        
+        A striped mission is released on every pipe its stripes arrived on.
+        
+        Args:
+            extension: Mission identifier
+            safe_code: Safe code of the pipe the mission arrived on
+        """
+        with self._stripe_lock:
+            safe_codes = self._joined.pop(extension, None)
+        if safe_codes is not None:
+            self._release_joined(extension, safe_codes)
+            return
+        with self.pipe_lock:
+            pipe = self.pipe_pool.get(safe_code)
+        if pipe is not None:
+            pipe.release(extension)
+    
+    def _release_joined(self, extension: str, safe_codes: set) -> None:
+        """Release a striped mission on the pipes holding its stripes.
+        
+        Args:
+            extension: Mission identifier
+            safe_codes: Safe codes of the pipes
+        """
+        with self.pipe_lock:
+            pipes = [self.pipe_pool.get(code) for code in safe_codes]
+        for pipe in pipes:
+            if pipe is not None:
+                pipe.release(extension)
     
     def cancel_mission(self, extension, safe_code=None):
         """Cancel a specific task.
@@ -502,7 +836,37 @@ class MultiPipe:
                 for pipe in self.pipe_pool.values():
                     if pipe.cancel_mission(extension):
                         return True
-                return False
+                # 条带任务的分片分布在多个管道上
+                canceled = False
+                for pipe in self.pipe_pool.values():
+                    for key in list(pipe.send_pool):
+                        if key.rpartition('-')[0] == extension:
+                            canceled = pipe.cancel_mission(key) or canceled
+                return canceled
+    
+    def stats(self) -> dict:
+        """Return the traffic counters and queue depths of all pipes.
+        
+        Returns:
+            dict: The fields of Pipe.stats summed over the pipes ('uptime',
+            'busy_ratio' and 'transfer_max' are the largest, 'transfer_avg' is
+            weighted by 'transfers'), plus 'pipes' mapping each safe code to
+            its pipe's own stats
+        """
+        with self.pipe_lock:
+            pipes = list(self.pipe_pool.items())
+        per_pipe = {safe_code: pipe.stats() for safe_code, pipe in pipes}
+        total = {}
+        for stats in per_pipe.values():
+            for key, value in stats.items():
+                if key in ('uptime', 'busy_ratio', 'transfer_max'):
+                    total[key] = max(total.get(key, 0), value)
+                else:
+                    total[key] = total.get(key, 0) + value
+        transfers = total.get('transfers', 0)
+        total['transfer_avg'] = sum(stats['transfer_avg'] * stats['transfers'] for stats in per_pipe.values()) / transfers if transfers else 0.0
+        total['pipes'] = per_pipe
+        return total
     
     @property
     def is_data(self):
@@ -530,19 +894,52 @@ class Endpoint:
     Supports multithreaded request handling for increased performance.
     """
     
-    def __init__(self, pipe: Pipe|MultiPipe, max_workers: int = 1):
+    def __init__(self, pipe: Pipe|MultiPipe, max_workers: int = 1, spill_threshold: int = None, send_budget: int = None, compression: str = None, heartbeat_interval: float = None, resume_dir: str = None, tracer: Tracer = None, max_streams: int = 16):
         """Create an endpoint.
         
         Args:
             pipe: Communication pipe or MultiPipe instance
             max_workers: Number of worker threads, defaults to 1
+            spill_threshold: Request size in bytes above which request bodies are
+                received into temporary LSO files instead of memory
+            send_budget: Queued outbound bytes per pipe above which `send` blocks
+                (see Pipe.send_budget), None for no limit
+            compression: Codec used for outbound messages when the peer supports
+                it, e.g. 'zlib' (see Pipe.compression), None to send raw
+            heartbeat_interval: Seconds between pings measuring RTT; a peer
+                silent for Pipe.heartbeat_misses intervals is disconnected
+            resume_dir: Directory where large messages are kept so they
+                continue after a reconnect (see Pipe.resume_dir)
+            tracer: Tracer sampling requests and recording the latency of
+                each stage (see netcore.trace.Tracer), None to disable
+            max_streams: Number of streaming route handlers running at once;
+                further streaming missions are handled once fully received
         """
         self.pipe = pipe
-        self.pipe.final_error_handler = self.stop
+        if spill_threshold is not None:
+            self.pipe.spill_threshold = spill_threshold
+        if send_budget is not None:
+            self.pipe.send_budget = send_budget
+        if compression is not None:
+            self.pipe.compression = compression
+        if heartbeat_interval is not None:
+            self.pipe.heartbeat_interval = heartbeat_interval
+        if resume_dir is not None:
+            self.pipe.resume_dir = resume_dir
+        self.tracer = tracer
+        if tracer is not None:
+            self.pipe.tracer = tracer
+        # 被采样且等待响应的请求：message_id -> (追踪编号, 发送时间)
+        self._traces: Dict[str, tuple] = {}
+        # 消息在处理完成后才释放接收窗口，使对端按处理速度发送
+        self.pipe.release_on_delivery = False
+        self.pipe.final_error_handler = self._pipe_closed
         self.pipe.cancel_handler = self._cancel_handler
         self.routes: Dict[str, Callable] = {}
+        self.stream_routes: Dict[str, dict] = {}  # 流式路由
         self.running = False
         self.handler_thread = None
+        self._stopped = threading.Event()
         self.default_handler = None  # 默认消息处理器
         self.response_handlers: Dict[str, Callable] = {}  # 响应处理器
         
@@ -560,6 +957,10 @@ class Endpoint:
         # 多线程支持
         self.max_workers = max_workers
         self.thread_pool = ThreadPoolExecutor(max_workers=max_workers)
+        # 流式处理函数在传输期间一直占用线程，使用独立的线程池以免与背压互相等待
+        self.max_streams = max_streams
+        self.stream_pool = ThreadPoolExecutor(max_workers=max_streams)
+        self._active_streams = 0
         self.request_queue = queue.Queue()
         self.lock = threading.RLock()  # 可重入锁
         
@@ -582,44 +983,79 @@ class Endpoint:
             A decorator function
         """
         def decorator(func):
-            @functools.wraps(func)
-            def wrapper():
-                try:
-                    # 请求对象已经通过线程本地存储设置好了
-                    # 不需要显式获取
-                    
-                    # 执行请求前钩子
-                    for before_func in self.before_request_funcs:
-                        before_result = before_func()
-                        if before_result is not None:
-                            return before_result
-                    
-                    print(self.middlewares)
-                    # 执行中间件链
-                    handler = func
-                    for middleware in self.middlewares:
-                        print('Middleware:', middleware)
-                        handler = middleware(handler)
-                    
-                    # 执行实际处理函数
-                    result = handler()
-
-                    # 执行请求后钩子
-                    for after_func in self.after_request_funcs:
-                        after_result = after_func(result)
-                        if after_result is not None:
-                            result = after_result
-                    return result
-                except Exception as e:
-                    # 执行错误处理
-                    if self.error_handler:
-                        return self.error_handler(e)
-                    raise EndpointMiddlewareError('Endpoint middleware error', e)
+            self.routes[route] = self._wrap_handler(func)
+            return func
+        return decorator
+    
+    def stream(self, route: str, buffer: int = 1048576):
+        """Streaming route decorator.
+        
+        The handler is invoked as soon as the mission head arrives, on a thread
+        of the stream pool, with `request.stream` yielding chunks as they land.
+        While more than `buffer` bytes are waiting the pipe stops reading from
+        its transport, so a slow handler throttles the sender. Chunks the handler
+        leaves unread are discarded when it returns. While `max_streams`
+        handlers are running, further missions are received in full first and
+        handed to a worker thread with a finished `request.stream`.
+        
+        Args:
+            route: The route path to handle
+            buffer: Maximum number of bytes queued for the handler
             
-            self.routes[route] = wrapper
+        Returns:
+            A decorator function
+        """
+        def decorator(func):
+            self.stream_routes[route] = {
+                'handler': self._wrap_handler(func),
+                'buffer': buffer,
+            }
             return func
         return decorator
     
+    def _wrap_handler(self, func: Callable) -> Callable:
+        """Wrap a route handler with hooks, middleware and error handling.
+        
+        Args:
+            func: The route handler function
+            
+        Returns:
+            Callable: Wrapper that runs before hooks, the middleware chain,
+            the handler and after hooks
+        """
+        @functools.wraps(func)
+        def wrapper():
+            try:
+                # 请求对象已经通过线程本地存储设置好了
+                # 不需要显式获取
+                
+                # 执行请求前钩子
+                for before_func in self.before_request_funcs:
+                    before_result = before_func()
+                    if before_result is not None:
+                        return before_result
+                
+                # 执行中间件链
+                handler = func
+                for middleware in self.middlewares:
+                    handler = middleware(handler)
+                
+                # 执行实际处理函数
+                result = handler()
+
+                # 执行请求后钩子
+                for after_func in self.after_request_funcs:
+                    after_result = after_func(result)
+                    if after_result is not None:
+                        result = after_result
+                return result
+            except Exception as e:
+                # 执行错误处理
+                if self.error_handler:
+                    return self.error_handler(e)
+                raise EndpointMiddlewareError('Endpoint middleware error', e)
+        return wrapper
+    
     def default(self, func):
         """Register a default message handler for messages without a specific route.
         
@@ -685,9 +1121,11 @@ class Endpoint:
         return func
     
     def _handle_requests(self):
-        """Handle incoming requests by distributing them to worker threads."""
-        global request
+        """Run the worker threads until the endpoint stops.
         
+        Received messages are put on the request queue by the pipe's
+        recv_handler, so this thread only waits.
+        """
         worker_threads = []
         # 启动工作线程
         for _ in range(self.max_workers):
@@ -695,22 +1133,8 @@ class Endpoint:
             thread.daemon = True
             thread.start()
             worker_threads.append(thread)
-            
-        while self.running:
-            if not self.pipe.is_data:
-                if self.pipe.recv_exception:
-                    logger.error(f"Pipe receive exception: {self.pipe.recv_exception}")
-                    logger.info("Endpoint stopped")
-                    self.event.emit('recv_exception')
-                    self.stop()
-                continue
-                
-            data, info = self.pipe.recv()
-            if not data or not info:
-                break
-            
-            # 将请求放入队列，由工作线程处理
-            self.request_queue.put((data, info))
+        
+        self._stopped.wait()
         
         # 等待所有工作线程结束
         for _ in range(self.max_workers):
@@ -718,6 +1142,53 @@ class Endpoint:
         for thread in worker_threads:
             thread.join()
     
+    def _enqueue_request(self, data, info: dict) -> None:
+        """recv_handler of the pipe: queue a received message for the workers.
+        
+        Args:
+            data: Received message data
+            info: Received message info
+        """
+        if self.tracer is not None:
+            self._trace_stage(info, 'dispatch', ('received',), 'queued')
+        self.request_queue.put((data, info))
+    
+    def _trace_stage(self, info: dict, name: str, since: tuple, mark: str) -> bool:
+        """Export a stage span of a sampled message and stamp the stage's end.
+        
+        Args:
+            info: Message info, its trace header holds the stage timestamps
+            name: Span name
+            since: Timestamp keys the stage may start from, first present wins
+            mark: Key to stamp the end of the stage under
+            
+        Returns:
+            bool: Whether the message is sampled
+        """
+        trace = info.get('trace')
+        if not isinstance(trace, dict) or 'id' not in trace:
+            return False
+        now = perf_counter()
+        start = next((trace[key] for key in since if key in trace), None)
+        if start is not None:
+            self.tracer.span(trace['id'], name, start, now, route=info.get('route'), extension=info.get('extension'))
+        trace[mark] = now
+        return True
+    
+    def _trace_response(self, message_id: str) -> None:
+        """Export the round trip span of a sampled request whose response arrived."""
+        with self.lock:
+            traced = self._traces.pop(message_id, None)
+        if traced is not None:
+            self.tracer.span(traced[0], 'roundtrip', traced[1], message_id=message_id)
+    
+    def _pipe_closed(self) -> None:
+        """final_error_handler of the pipe: its transport failed or was stopped."""
+        if self.running:
+            logger.warning("Pipe closed, stopping endpoint")
+            self.event.emit('recv_exception')
+        self.stop()
+    
     def _worker_thread(self):
         """Worker thread function that processes requests from the queue."""
         while self.running:
@@ -727,77 +1198,184 @@ class Endpoint:
                 break
                 
             data, info = task
-            
-            # 创建线程本地的请求对象
-            thread_request = Request(data, info)
-            set_request(thread_request)  # 设置线程本地请求对象
-            
-            # 处理消息ID的响应
-            message_id = thread_request.message_id
-            with self.lock:
-                if message_id and message_id in self.response_handlers:
+            traced = self.tracer is not None and self._trace_stage(info, 'request.queue', ('queued', 'received'), 'started')
+            try:
+                self._process_request(data, info)
+            finally:
+                if traced:
+                    self._trace_stage(info, 'handler', ('started',), 'handled')
+                # 释放请求数据，落盘的临时文件在无引用后即被删除
+                set_request(None)
+                self._release(info)
+                task = data = info = None
+            self.request_queue.task_done()
+    
+    def _release(self, info: dict) -> None:
+        """Return a processed message's bytes to its pipe's receive window.
+        
+        Args:
+            info: Received message info
+        """
+        extension = info.get('extension')
+        if extension is None:
+            return
+        if self.is_multi_pipe:
+            self.pipe.release(extension, info.get('pipe_safe_code'))
+        else:
+            self.pipe.release(extension)
+    
+    def _process_request(self, data, info: dict) -> None:
+        """Process one received message on the current worker thread.
+        
+        Args:
+            data: Received message data
+            info: Received message info
+        """
+        # 创建线程本地的请求对象
+        thread_request = Request(data, info)
+        set_request(thread_request)  # 设置线程本地请求对象
+        
+        # 处理消息ID的响应
+        message_id = thread_request.message_id
+        if self.tracer is not None and message_id in self._traces:
+            self._trace_response(message_id)
+        with self.lock:
+            if message_id and message_id in self.response_handlers:
+                try:
+                    self.response_handlers[message_id](thread_request)
+                    del self.response_handlers[message_id]  # 处理完成后移除handler
+                except Exception as e:
+                    logger.error(f"Error processing response ID '{message_id}': {e}")
+                # 如果存在，清理message_id到pipe的映射
+                if message_id in self.message_to_pipe:
+                    del self.message_to_pipe[message_id]
+                return
+        
+        route = thread_request.route
+        result = None
+        
+        # 有路由的情况，调用对应的处理函数
+        if route and route in self.routes:
+            result = self._run_route(self.routes[route], thread_request)
+        # 超出流式处理上限的流式任务已完整接收，在工作线程中处理
+        elif route and route in self.stream_routes:
+            thread_request.stream = ChunkStream.from_data(data)
+            result = self._run_route(self.stream_routes[route]['handler'], thread_request)
+        # 没有路由或路由未注册，使用默认处理器
+        elif self.default_handler:
+            try:
+                # 不再需要替换全局请求对象
+                self.default_handler()
+            except Exception as e:
+                if self.error_handler:
                     try:
-                        self.response_handlers[message_id](thread_request)
-                        del self.response_handlers[message_id]  # 处理完成后移除handler
-                        
-                        # 如果存在，清理message_id到pipe的映射
-                        if message_id in self.message_to_pipe:
-                            del self.message_to_pipe[message_id]
-                            
-                        self.request_queue.task_done()
-                        continue
-                    except Exception as e:
-                        logger.error(f"Error processing response ID '{message_id}': {e}")
-                        # 清理映射
-                        if message_id in self.message_to_pipe:
-                            del self.message_to_pipe[message_id]
-                        self.request_queue.task_done()
-                        continue
+                        self.error_handler(e)
+                    except Exception as e2:
+                        logger.error(f"Error processing route '{route}': {e}")
+                else:
+                    logger.error(f"Default handler encountered an error processing message: {e}")
+        
+        # 触发请求事件
+        self.event.emit('request', thread_request)
+        
+        # 处理响应后触发响应事件
+        if isinstance(result, Response):
+            self.event.emit('response', result)
+    
+    def _run_route(self, handler: Callable, thread_request: Request):
+        """Run a wrapped route handler and send its Response, if any.
+        
+        Args:
+            handler: Wrapped route handler
+            thread_request: The current request
             
-            route = thread_request.route
-            result = None
+        Returns:
+            The handler's (or error handler's) result
+        """
+        result = None
+        try:
+            # 不再需要替换全局请求对象，直接使用线程本地存储
+            result = handler()
             
-            # 有路由的情况，调用对应的处理函数
-            if route and route in self.routes:
+            if isinstance(result, Response):
+                # 发送响应，如果有pipe_safe_code，使用指定的pipe
+                self._send_response_with_pipe(result, thread_request)
+        except Exception as e:
+            if self.error_handler:
                 try:
-                    # 不再需要替换全局请求对象，直接使用线程本地存储
-                    result = self.routes[route]()
-                    
+                    result = self.error_handler(e)
                     if isinstance(result, Response):
-                        # 发送响应，如果有pipe_safe_code，使用指定的pipe
                         self._send_response_with_pipe(result, thread_request)
-                except Exception as e:
-                    if self.error_handler:
-                        try:
-                            result = self.error_handler(e)
-                            if isinstance(result, Response):
-                                self._send_response_with_pipe(result, thread_request)
-                        except Exception as e2:
-                            logger.error(f"Error handler encountered an error: {e2}")
-                    else:
-                        logger.error(f"Error processing route '{route}': {e}")
-            # 没有路由或路由未注册，使用默认处理器
-            elif self.default_handler:
-                try:
-                    # 不再需要替换全局请求对象
-                    self.default_handler()
-                except Exception as e:
-                    if self.error_handler:
-                        try:
-                            self.error_handler(e)
-                        except Exception as e2:
-                            logger.error(f"Error processing route '{route}': {e}")
-                    else:
-                        logger.error(f"Default handler encountered an error processing message: {e}")
+                except Exception as e2:
+                    logger.error(f"Error handler encountered an error: {e2}")
+            else:
+                logger.error(f"Error processing route '{thread_request.route}': {e}")
+        return result
+    
+    def _stream_requested(self, extension: str, info: dict, length: int) -> ChunkStream:
+        """stream_handler of the pipe: start streaming routes at the mission head.
+        
+        Args:
+            extension: Mission extension
+            info: Mission info
+            length: Announced mission length, None if unknown
             
-            # 触发请求事件
-            self.event.emit('request', thread_request)
+        Returns:
+            ChunkStream: Stream the pipe delivers the chunks into, None for other routes
+        """
+        if info.get('is_response'):
+            return None
+        route = self.stream_routes.get(info.get('route'))
+        if route is None or not self._acquire_stream(extension):
+            return None
+        sink = ChunkStream(route['buffer'], length)
+        self.stream_pool.submit(self._process_stream, sink, info, route['handler'])
+        return sink
+    
+    def _acquire_stream(self, extension: str) -> bool:
+        """Reserve one of the `max_streams` streaming slots.
+        
+        Args:
+            extension: Mission extension
             
-            # 处理响应后触发响应事件
-            if isinstance(result, Response):
-                self.event.emit('response', result)
-                
-            self.request_queue.task_done()
+        Returns:
+            bool: False if all slots are taken and the mission is received in full instead
+        """
+        with self.lock:
+            if self._active_streams >= self.max_streams:
+                logger.debug(f"{self.max_streams} streams running, receiving {extension} before handling it")
+                return False
+            self._active_streams += 1
+            return True
+    
+    def _release_stream(self) -> None:
+        """Free a streaming slot taken by `_acquire_stream`."""
+        with self.lock:
+            self._active_streams -= 1
+    
+    def _process_stream(self, sink: ChunkStream, info: dict, handler: Callable) -> None:
+        """Run a streaming route handler on a thread of the stream pool.
+        
+        Args:
+            sink: Chunk stream of the mission
+            info: Mission info
+            handler: Wrapped streaming route handler
+        """
+        thread_request = Request(b'', info)
+        thread_request.stream = sink
+        set_request(thread_request)
+        try:
+            result = self._run_route(handler, thread_request)
+        finally:
+            # 处理函数未读完的数据直接丢弃，避免阻塞管道
+            sink.discard()
+            set_request(None)
+            self._release_stream()
+        
+        # 触发请求事件
+        self.event.emit('request', thread_request)
+        if isinstance(result, Response):
+            self.event.emit('response', result)
     
     def _send_response_with_pipe(self, response, request):
         """使用指定管道发送响应
@@ -814,6 +1392,10 @@ class Endpoint:
             'is_response': True,
             'message_id': request.message_id
         }
+        trace = request.get_header('trace')
+        if isinstance(trace, dict) and 'id' in trace:
+            # 响应沿用请求的追踪编号
+            info['trace'] = {'id': trace['id']}
         
         # 如果是MultiPipe且有pipe_safe_code，使用指定的pipe
         if self.is_multi_pipe and request.pipe_safe_code:
@@ -888,7 +1470,8 @@ class Endpoint:
         
         Args:
             route: The route to send the request to
-            data: The request data
+            data: The request data; iterators, readable file objects and
+                LsoProtocol are streamed without being loaded into memory
             callback: Optional response callback function that takes (data, info) parameters
             blocking_recv: If True, wait for and return the response
             pipe_safe_code: Optional pipe safe code for MultiPipe
@@ -912,27 +1495,31 @@ class Endpoint:
             if self.is_multi_pipe and pipe_safe_code:
                 self.message_to_pipe[message_id] = pipe_safe_code
         
-        # 发送数据
+        # 发送数据，流式数据源按需读取而不预先物化
         if isinstance(data, dict):
             data_bytes = json.dumps(data).encode('utf-8')
         elif isinstance(data, str):
             data_bytes = data.encode('utf-8')
-        elif isinstance(data, bytes):
+        elif isinstance(data, bytes) or Utils.is_stream_source(data):
             data_bytes = data
         else:
             data_bytes = json.dumps({"data": str(data)}).encode('utf-8')
             
+        info = {
+            'route': route,
+            'message_id': message_id
+        }
+        if self.tracer is not None:
+            info = self.tracer.inject(info)
+            if 'trace' in info and (callback or blocking_recv):
+                with self.lock:
+                    self._traces[message_id] = (info['trace']['id'], perf_counter())
+        
         # 获取发送任务的extension标识符
         if self.is_multi_pipe and pipe_safe_code:
-            mission_extension = self.pipe.send(data_bytes, {
-                'route': route,
-                'message_id': message_id
-            }, pipe_safe_code)
+            mission_extension = self.pipe.send(data_bytes, info, pipe_safe_code)
         else:
-            mission_extension = self.pipe.send(data_bytes, {
-                'route': route,
-                'message_id': message_id
-            })
+            mission_extension = self.pipe.send(data_bytes, info)
 
         # 如果返回的extension与message_id不同，说明是大数据任务
         # 存储它们之间的映射关系
@@ -968,22 +1555,41 @@ class Endpoint:
             data_bytes = json.dumps(data).encode('utf-8')
         elif isinstance(data, str):
             data_bytes = data.encode('utf-8')
-        elif isinstance(data, bytes):
+        elif isinstance(data, bytes) or Utils.is_stream_source(data):
             data_bytes = data
         else:
             data_bytes = json.dumps({"data": str(data)}).encode('utf-8')
             
+        response_info = {
+            'is_response': True,
+            'message_id': info.get('message_id')
+        }
+        trace = info.get('trace')
+        if isinstance(trace, dict) and 'id' in trace:
+            # 响应沿用请求的追踪编号
+            response_info['trace'] = {'id': trace['id']}
+        
         # 如果是MultiPipe且有pipe_safe_code，使用指定的pipe
         if self.is_multi_pipe and pipe_safe_code:
-            self.pipe.send(data_bytes, {
-                'is_response': True,
-                'message_id': info.get('message_id')
-            }, pipe_safe_code)
+            self.pipe.send(data_bytes, response_info, pipe_safe_code)
         else:
-            self.pipe.send(data_bytes, {
-                'is_response': True,
-                'message_id': info.get('message_id')
-            })
+            self.pipe.send(data_bytes, response_info)
+    
+    def stats(self) -> dict:
+        """Return a snapshot of the endpoint's traffic and queues.
+        
+        Counting is switched off with `pipe.metrics = False` (set it before
+        `start` on a MultiPipe), which leaves only the queue depths.
+        
+        Returns:
+            dict: The pipe's stats (see Pipe.stats and MultiPipe.stats), plus
+            'requests_queued' waiting for a worker and 'responses_pending'
+            awaited by callbacks or blocking sends
+        """
+        stats = self.pipe.stats()
+        stats['requests_queued'] = self.request_queue.qsize()
+        stats['responses_pending'] = len(self.response_handlers)
+        return stats
     
     def start(self, block: bool = True):
         """Start the endpoint.
@@ -991,6 +1597,14 @@ class Endpoint:
         Args:
             block: If True, block the current thread until the endpoint stops
         """
+        # 完成的任务由管道直接放入请求队列，无需轮询
+        self.pipe.recv_handler = self._enqueue_request
+        self.pipe.stream_handler = self._stream_requested
+        while self.pipe.is_data:
+            data, info = self.pipe.recv()
+            if info is not None:
+                self.request_queue.put((data, info))
+        self._stopped.clear()
         self.pipe.start()
         self.running = True
         # 触发启动事件
@@ -1014,6 +1628,7 @@ class Endpoint:
             
             self.running = False
             self.scheduler.stop()  # 停止调度器
+            self._stopped.set()
             
             # 添加检查，避免线程加入自己
             current_thread = threading.current_thread()
@@ -1064,36 +1679,13 @@ class Endpoint:
                 continue
             
             # 为每个路由创建包装器，使用endpoint的机制来包装函数
-            @functools.wraps(handler)
-            def wrapper():
-                try:
-                    # 执行请求前钩子
-                    for before_func in self.before_request_funcs:
-                        before_result = before_func()
-                        if before_result is not None:
-                            return before_result
-                    
-                    # 执行中间件链
-                    route_handler = handler
-                    for middleware in self.middlewares:
-                        route_handler = middleware(route_handler)
-                    
-                    # 执行实际处理函数
-                    result = route_handler()
-                    
-                    # 执行请求后钩子
-                    for after_func in self.after_request_funcs:
-                        after_result = after_func(result)
-                        if after_result is not None:
-                            result = after_result
-                    return result
-                except Exception as e:
-                    # 执行错误处理
-                    if self.error_handler:
-                        return self.error_handler(e)
-                    raise EndpointMiddlewareError('Endpoint middleware error', e)
-            
-            self.routes[route] = wrapper
+            self.routes[route] = self._wrap_handler(handler)
+        
+        for route, entry in blueprint.stream_routes.items():
+            self.stream_routes[route] = {
+                'handler': self._wrap_handler(entry['handler']),
+                'buffer': entry['buffer'],
+            }
         
         logger.info(f"Endpoint registered blueprint '{blueprint.name}' with {len(blueprint.routes)} routes")
         return self  # 返回self以支持链式调用
@@ -1,16 +1,29 @@
-from typing    import Callable, Union, Optional, Generator, Tuple
-from struct    import pack, unpack
-from os        import path, read as osread
-from mmap      import mmap, ACCESS_WRITE
+from typing    import Callable, Union, Optional, Generator, Tuple, Iterator
+from struct    import pack, unpack, Struct
+from os        import path, fstat, fdopen, remove, rename, listdir, makedirs, cpu_count
+from stat      import S_ISREG
+from mmap      import mmap, ACCESS_READ, ACCESS_WRITE
 from random    import choices
 from string    import ascii_letters, digits
 from queue     import Queue
-from threading import Thread, RLock
-from .error    import NetcoreError
+from threading import Thread, Lock, RLock, Condition
+from itertools import count
+from functools import partial
+from time      import perf_counter
+from .error    import NetcoreError, NetcorePipeError
+from .transport import SocketTransport
 
 import inspect
 import json
 import logging
+import os
+import re
+import socket
+import tempfile
+import weakref
+import zlib
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 # 配置日志记录器
 logger = logging.getLogger("netcore.lso")
@@ -60,13 +73,15 @@ class Utils:
         Examples:
             >>> Utils.calc_divisional_range(100, 4)
             [[0, 24], [25, 49], [50, 74], [75, 99]]
+            >>> Utils.calc_divisional_range(3, 4)
+            [[0, 0], [1, 1], [2, 2]]
         """
+        if size <= 0:
+            return []
+        # 块数不超过字节数，余下的字节并入最后一块
+        chuck = max(1, min(chuck, size))
         step = size//chuck
-        arr = list(range(0, size, step))
-        result = []
-        for i in range(len(arr)-1):
-            s_pos, e_pos = arr[i], arr[i+1]-1
-            result.append([s_pos, e_pos])
+        result = [[i*step, (i+1)*step-1] for i in range(chuck)]
         result[-1][-1] = size-1
         return result
     
@@ -214,6 +229,311 @@ class Utils:
             (has_varargs and required <= 1) or  # 支持 *args 
             (required == 0 and len(params) >= 1)  # 全可选参数
         )
+    
+    @staticmethod
+    def is_stream_source(data) -> bool:
+        """Check whether data should be sent as a streaming mission.
+        
+        Args:
+            data: Object passed to a send method
+            
+        Returns:
+            bool: True for iterators/generators, readable file objects and LsoProtocol
+        
+        Examples:
+            >>> Utils.is_stream_source(iter([b'a', b'b']))
+            True
+            
+            >>> Utils.is_stream_source(b'ab')
+            False
+        """
+        return isinstance(data, (LsoProtocol, Iterator)) or hasattr(data, 'read')
+
+class FrameReader:
+    """Buffered reader serving exact-length reads from large transport reads.
+    
+    Small reads (frame headers, short payloads) are served from an internal buffer
+    that is refilled with one large transport read, so many frames can be parsed
+    out of a single recv. Reads at least `buff` bytes long bypass the buffer and
+    land directly in the caller's memory, through `recv_into` when available.
+    
+    Short reads are retried until the requested length is satisfied; a transport
+    returning empty data (EOF) raises ConnectionError instead of spinning.
+    
+    Args:
+        recv: Transport receive function, called with the maximum number of bytes wanted
+        recv_into: Optional transport function filling a writable buffer, returning the byte count
+        buff: Transport read size. Use 0 for transports whose read(n) blocks until exactly
+            n bytes arrive (e.g. serial ports), so the reader never asks for more than needed
+    """
+    
+    def __init__(
+            self,
+            recv: Callable[[int], Union[bytes, bytearray]],
+            recv_into: Optional[Callable[[memoryview], int]] = None,
+            buff: int = 65536
+        ):
+        """Initialize an empty reader over the given transport functions."""
+        self.recv = recv
+        self.recv_into = recv_into
+        self.buff = buff
+        self._buffer = bytearray()
+        self._pos = 0
+        self._scratch: Optional[memoryview] = None
+    
+    @property
+    def buffered(self) -> int:
+        """Get the number of bytes received but not yet consumed.
+        
+        Returns:
+            int: Buffered byte count
+        """
+        return len(self._buffer) - self._pos
+    
+    def feed(self, data: Union[bytes, bytearray, memoryview]) -> None:
+        """Append externally received data to the buffer.
+        
+        Args:
+            data: Bytes read from the transport by the caller
+        """
+        self._compact()
+        self._buffer += data
+    
+    def peek(self, length: int) -> bytes:
+        """Return up to `length` buffered bytes without consuming them.
+        
+        Args:
+            length: Maximum number of bytes to return
+            
+        Returns:
+            bytes: Buffered data, may be shorter than requested
+        """
+        return bytes(self._buffer[self._pos:self._pos + length])
+    
+    def _compact(self) -> None:
+        """Drop consumed bytes from the front of the buffer."""
+        if self._pos:
+            del self._buffer[:self._pos]
+            self._pos = 0
+    
+    def _recv_chunk(self, size: int) -> Union[bytes, bytearray]:
+        """Read once from the transport.
+        
+        Raises:
+            ConnectionError: If the transport returns no data (EOF)
+        """
+        data = self.recv(size)
+        if not data:
+            raise ConnectionError("Unexpected EOF during buffered read")
+        return data
+    
+    def _fill(self, need: int) -> None:
+        """Read from the transport until at least `need` bytes are buffered."""
+        while self.buffered < need:
+            self._compact()
+            size = max(need - self.buffered, self.buff)
+            if self.recv_into and size <= self.buff:
+                # 复用固定的读取缓冲区，避免每次分配新的 bytes 对象
+                if self._scratch is None:
+                    self._scratch = memoryview(bytearray(self.buff))
+                n = self.recv_into(self._scratch)
+                if not n:
+                    raise ConnectionError("Unexpected EOF during buffered read")
+                self._buffer += self._scratch[:n]
+                continue
+            self._buffer += self._recv_chunk(size)
+    
+    def read(self, length: int) -> bytearray:
+        """Read exactly `length` bytes.
+        
+        Args:
+            length: Number of bytes to read
+            
+        Returns:
+            bytearray: The data read
+            
+        Raises:
+            ConnectionError: If EOF is reached before `length` bytes arrive
+        """
+        if self.buffered < length < self.buff:
+            self._fill(length)
+        if self.buffered >= length:
+            data = self._buffer[self._pos:self._pos + length]
+            self._pos += length
+            return data
+        data = bytearray(length)
+        self.readinto(memoryview(data))
+        return data
+    
+    def readinto(self, view: memoryview) -> None:
+        """Fill `view` completely.
+        
+        Args:
+            view: Writable buffer to fill
+            
+        Raises:
+            ConnectionError: If EOF is reached before the buffer is full
+        """
+        length = len(view)
+        got = min(self.buffered, length)
+        if got:
+            with memoryview(self._buffer) as buffer:
+                view[:got] = buffer[self._pos:self._pos + got]
+            self._pos += got
+        while got < length:
+            remaining = length - got
+            # 剩余数据较少时整块读入缓冲区，多余部分留给后续帧
+            if remaining < self.buff:
+                self._fill(remaining)
+                with memoryview(self._buffer) as buffer:
+                    view[got:] = buffer[self._pos:self._pos + remaining]
+                self._pos += remaining
+                return
+            # 大块数据直接读入目标缓冲区
+            if self.recv_into:
+                n = self.recv_into(view[got:])
+                if not n:
+                    raise ConnectionError("Unexpected EOF during buffered read")
+            else:
+                data = self._recv_chunk(remaining)
+                n = min(len(data), remaining)
+                view[got:got + n] = memoryview(data)[:n]
+                if len(data) > n:
+                    self.feed(memoryview(data)[n:])
+            got += n
+
+# 文件模式下追加数据的写缓冲大小，达到后一次写出
+LSO_WRITE_BUFFER = 1 << 16
+
+class LsoFile:
+    """Persistent read/write handle on a local LSO file with buffered appends.
+
+    Small appends are collected in memory and written with one system call once
+    `buffer` bytes are pending; larger ones are written directly. Writes go to
+    the tracked end of the data rather than the end of the file, so space
+    reserved with `preallocate` is filled in place, and `trim` cuts off whatever
+    was not filled.
+
+    Args:
+        local: Path of an existing file
+        buffer: Pending append size that triggers a write
+    """
+
+    def __init__(self, local: str, buffer: int = LSO_WRITE_BUFFER):
+        """Open the file for reading and writing."""
+        self.local = local
+        self.buffer = buffer
+        self._file = open(local, 'r+b', buffering=0)
+        self._fd = self._file.fileno()
+        # 已写入文件的数据末尾，预分配的空间不计在内
+        self.size = fstat(self._fd).st_size
+        self._pending = bytearray()
+
+    @property
+    def end(self) -> int:
+        """Get the end of the data including pending appends.
+
+        Returns:
+            int: Data length in bytes
+        """
+        return self.size + len(self._pending)
+
+    def fileno(self) -> int:
+        return self._fd
+
+    def _write(self, offset: int, data: Union[bytes, bytearray, memoryview]) -> None:
+        """Write all of `data` at `offset`."""
+        view = memoryview(data).cast('B')
+        written = 0
+        while written < len(view):
+            if hasattr(os, 'pwrite'):
+                written += os.pwrite(self._fd, view[written:], offset + written)
+            else:
+                self._file.seek(offset + written)
+                written += self._file.write(view[written:])
+
+    def append(self, data: Union[bytes, bytearray, memoryview]) -> None:
+        """Append data at the end of the data.
+
+        Args:
+            data: Bytes to append
+        """
+        if len(data) >= self.buffer:
+            self.flush()
+            self._write(self.size, data)
+            self.size += len(data)
+            return
+        self._pending += data
+        if len(self._pending) >= self.buffer:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write pending appends to the file."""
+        if not self._pending:
+            return
+        self._write(self.size, self._pending)
+        self.size += len(self._pending)
+        self._pending.clear()
+
+    def read_at(self, offset: int, size: int) -> bytes:
+        """Read up to `size` bytes at `offset`."""
+        self.flush()
+        if hasattr(os, 'pread'):
+            return os.pread(self._fd, size, offset)
+        self._file.seek(offset)
+        return self._file.read(size)
+
+    def write_at(self, offset: int, data: Union[bytes, bytearray, memoryview]) -> None:
+        """Overwrite data at `offset`, extending the data if it reaches past the end."""
+        self.flush()
+        self._write(offset, data)
+        self.size = max(self.size, offset + len(data))
+
+    def rewind(self, size: int = 0) -> None:
+        """Move the data end back to `size` bytes.
+
+        Following appends overwrite the old content in place, which avoids
+        freeing and reallocating its disk blocks; `trim` cuts off what is left.
+        """
+        self._pending.clear()
+        self.size = min(self.size, size)
+
+    def preallocate(self, size: int) -> None:
+        """Reserve disk space for `size` bytes of data where the platform supports it.
+
+        The file grows to the reserved size; the data end does not move.
+        """
+        if not hasattr(os, 'posix_fallocate') or size <= self.end:
+            return
+        try:
+            os.posix_fallocate(self._fd, self.end, size - self.end)
+        except OSError as e:
+            # 部分文件系统不支持预分配，退回按需增长
+            logger.debug(f"Preallocation of {self.local} failed: {e}")
+
+    def trim(self) -> None:
+        """Flush pending appends and cut off reserved space beyond the data."""
+        self.flush()
+        if fstat(self._fd).st_size > self.size:
+            os.ftruncate(self._fd, self.size)
+
+    def refresh(self) -> None:
+        """Take the data end from the file after it was changed through a mapping."""
+        self.flush()
+        self.size = fstat(self._fd).st_size
+
+    def close(self) -> None:
+        """Trim and close the file."""
+        # 打开失败时没有可关闭的文件
+        if getattr(self, '_file', None) is None or self._file.closed:
+            return
+        try:
+            self.trim()
+        finally:
+            self._file.close()
+
+    def __del__(self):
+        self.close()
 
 '''
 LsoPrococol:
@@ -241,15 +561,53 @@ class LsoProtocol:
         self.buff = buff
         self._extension = b''
         self.exp_data = {}
+        # 文件模式下每个对象持有一个文件句柄，首次文件操作时打开
+        self._file: Optional[LsoFile] = None
         # check file
         if self.local:
-            self.verify(self.local, recreate=True)
-            with open(self.local, 'rb') as f:
-                extn_length = unpack('i', f.read(4))[0]
-                self._extension = f.read(extn_length)
+            file = self._handle()
+            extn_length = unpack('i', file.read_at(0, 4))[0]
+            self._extension = file.read_at(4, extn_length)
     
     def __str__(self):
-        return self._extension
+        return self.extension
+    
+    def _handle(self) -> LsoFile:
+        """Return the handle on the local file, reopening it if `local` changed.
+
+        The file is verified whenever it is opened, and recreated with the
+        current extension if invalid. The path is not checked again while the
+        handle stays open; call `close` after replacing the file on disk.
+        """
+        file = self._file
+        # 句柄打开期间不再检查路径，避免每次读写都调用 stat
+        if file is not None and file.local == self.local:
+            return file
+        if file is not None:
+            file.close()
+        if not self.verify(self.local):
+            # 文件缺失或无效时以当前扩展名重建
+            self.create_empty_file(self.local, self._extension)
+        self._file = LsoFile(self.local)
+        return self._file
+    
+    def close(self) -> None:
+        """Close the handle on the local file.
+
+        It is reopened by the next file operation, which also picks up a
+        file that was replaced on disk.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+    
+    def flush(self) -> None:
+        """Write appends still buffered in the handle to the local file.
+
+        Needed before the file is read through another descriptor.
+        """
+        if self._file is not None:
+            self._file.flush()
     
     @property
     def length(self) -> int:
@@ -259,7 +617,7 @@ class LsoProtocol:
             int: Length of metadata in bytes
         """
         if self.local:
-            return path.getsize(self.local) - len(self._extension) - 8
+            return self._handle().end - len(self._extension) - 8
         return len(self._meta)
     
     @property
@@ -318,26 +676,31 @@ class LsoProtocol:
             try: self._extension = bytes(value)
             except: raise ValueError("extension must be of type 'bytes' or 'str'")
         if not self.local: return
-        self.verify(self.local, recreate=True)
+        mm = None
         try:
-            new_extn_length = len(self._extension) + 4
-            mm = None
-            # 使用 mmap 更新本地文件
-            with open(self.local, 'r+b') as f:
-                mm = mmap(f.fileno(), 0, access=ACCESS_WRITE)
-                old_extn_length = unpack('i', mm[:4])[0] + 4
-                diff = new_extn_length - old_extn_length
+            file = self._handle()
+            head = pack('i', len(self._extension)) + self._extension
+            if file.end < 8:
+                # 文件为空时直接写入完整的头部
+                file.rewind()
+                file.write_at(0, head + pack('i', 0))
+                return
+            old_extn_length = unpack('i', file.read_at(0, 4))[0] + 4
+            diff = len(head) - old_extn_length
+            if diff:
+                # 扩展名长度变化时用 mmap 平移其后的数据
+                mm = mmap(file.fileno(), 0, access=ACCESS_WRITE)
+                tail = mm.size() - old_extn_length
                 if diff > 0:
                     mm.resize(mm.size() + diff)
-                    mm.move(new_extn_length, old_extn_length, len(mm[old_extn_length:]) - diff)
-                else:
-                    mm.move(new_extn_length, old_extn_length, len(mm[old_extn_length:]))
-                mm.seek(0)
-                mm.write(pack('i', len(self._extension)))
-                mm.write(self._extension)
+                mm.move(len(head), old_extn_length, tail)
                 if diff < 0:
                     mm.resize(mm.size() + diff)
                 mm.flush()
+                mm.close()
+                mm = None
+                file.refresh()
+            file.write_at(0, head)
         except Exception as e:
             raise Exception(f"Error updating extension: {e}")
         finally:
@@ -447,23 +810,21 @@ class LsoProtocol:
 
         Returns:
             bytes: Received byte data
+            
+        Raises:
+            ConnectionError: If the function returns no data (EOF) before `length` bytes arrive
         """
-        meta = b''
-        temp = b''
-        is_finished = False
-        while not is_finished:
-            if len(meta) + buff <= length:
-                temp = function(buff)
-            else:
-                temp = function(length - len(temp))
+        meta = bytearray()
+        while len(meta) < length:
+            temp = function(min(buff, length - len(meta)))
+            if not temp:
+                raise ConnectionError("Unexpected EOF during function_recv")
             meta += temp
             if callable(handler): handler(temp)
             if isinstance(handler, list):
                 for i in handler:
                     if callable(i): i(temp)
-            if len(meta) == length:
-                is_finished = True
-        return temp
+        return bytes(meta)
     
     def _add_meta(self, data:bytes) -> None:
         """Add metadata to local file or memory.
@@ -472,7 +833,7 @@ class LsoProtocol:
             data: Byte data to add
         """
         if self.local:
-            with open(self.local, 'a+b') as f: f.write(data)
+            self._handle().append(data)
         else:
             self._meta.extend(data)
     
@@ -483,12 +844,13 @@ class LsoProtocol:
             meta_length: New metadata length
         """
         if not self.local: return
-        self.extension = self._extension
-        with open(self.local, 'a+b') as f:
-            mm = mmap(f.fileno(), 0, access=ACCESS_WRITE)
-            mm.seek(len(self._extension) + 4)
-            mm.write(pack('i', meta_length))
-            mm.flush()
+        file = self._handle()
+        extension_head = pack('i', len(self._extension)) + self._extension
+        # 头部缺失或扩展名与文件不符时先重写头部
+        if file.end < len(extension_head) + 4 or file.read_at(0, len(extension_head)) != extension_head:
+            self.extension = self._extension
+            file = self._handle()
+        file.write_at(len(extension_head), pack('i', meta_length))
     
     def set_meta(self, data:Union[bytes, bytearray, str]) -> None:
         """Set metadata.
@@ -499,24 +861,24 @@ class LsoProtocol:
         Raises:
             ValueError: If data type is incorrect
         """
-        if   isinstance(data, bytes): data = bytearray(data)
-        elif isinstance(data, bytearray): pass
-        elif isinstance(data, str): data = bytearray(data, encoding=self.encoding)
+        if   isinstance(data, (bytes, bytearray)): pass
+        elif isinstance(data, str): data = data.encode(self.encoding)
         else: raise ValueError('Invalid data type for meta.')
         if not self.local:
-            self._meta = data
+            self._meta = bytearray(data) if isinstance(data, bytes) else data
             return
-        start = len(self._extension) + 4
-        with open(self.local, 'a+b') as f:
-            mm = mmap(f.fileno(), 0, access=ACCESS_WRITE)
-            mm.resize(start + len(data) + 4)
-            mm.seek(start)
-            mm.write(pack('i', len(data)))
-            mm.write(data)
+        file = self._handle()
+        file.rewind(len(self._extension) + 4)
+        file.append(pack('i', len(data)))
+        file.append(data)
+        file.trim()
 
     def full_data(self, buff:Optional[int] = None) -> Generator:
         """Generator that returns complete data in chunks.
 
+        In file mode the chunks are sliced from one read-only mapping of the
+        file, so the file must not be shortened while the generator is in use.
+
         Args:
             buff: Number of bytes to read each time, defaults to instance's buff attribute
 
@@ -526,12 +888,19 @@ class LsoProtocol:
         if not buff: buff = self.buff
         # 如果有本地文件，读取文件内容
         if self.local:
-            with open(self.local, 'rb') as f:
-                while True:
-                    data = osread(f.fileno(), buff)
-                    if not data:
-                        break
-                    yield data
+            file = self._handle()
+            if file.end <= buff:
+                # 单块的小文件直接读出，省去映射的开销
+                if file.end: yield file.read_at(0, file.end)
+                return
+            # 整个文件只映射一次，按块切片返回
+            file.flush()
+            mm = mmap(file.fileno(), 0, access=ACCESS_READ)
+            try:
+                for i in range(0, len(mm), buff):
+                    yield mm[i:i + buff]
+            finally:
+                mm.close()
         else:
             yield self.head
             # 否则直接返回存储在 _meta 中的数据
@@ -549,7 +918,7 @@ class LsoProtocol:
         """Load data from a stream.
     
         Args:
-            function: Data receive function, used to read data from the stream
+            function: Data receive function or FrameReader, used to read data from the stream
             head: Optional head data, if provided extension and metadata length are obtained from it
             handler: Optional data handler function, used to process received data
             buff: Number of bytes to read each time, defaults to instance's buff attribute
@@ -569,36 +938,62 @@ class LsoProtocol:
         if not buff: 
             buff = self.buff
             
-        # 清空文件
-        if self.local:
-            with open(self.local, 'w', encoding=self.encoding) as f: 
-                f.write('')
-        else: 
-            self._meta = bytearray()
+        # 按需从流中读取，函数每次只被请求所需字节数
+        reader = function if isinstance(function, FrameReader) else FrameReader(function, buff=0)
             
         # 处理头部信息
-        if head:
-            # 从头部获取扩展名长度
-            extension_length = unpack('i', head[:4])[0]  # 读取扩展名长度
-            extension = head[4:4 + extension_length].decode(self.encoding)  # 读取扩展名
-            meta_length = unpack('i', head[4 + extension_length:8 + extension_length])[0]  # 读取元数据长度
-            if self.local:
-                self._add_meta(head)  # 将头部数据添加到元数据中
-        else:
+        if not head:
             # 从流中接收头部信息
-            if self.local:
-                extension_length = unpack('i', self.function_recv(function=function, length=4, handler=self._add_meta, buff=buff))[0]
-                extension = self.function_recv(function=function, length=extension_length, handler=self._add_meta, buff=buff).decode(self.encoding)
-                meta_length = unpack('i', self.function_recv(function=function, length=4, handler=self._add_meta, buff=buff))[0]
-            else:
-                extension_length = unpack('i', self.function_recv(function=function, length=4, buff=buff))[0]
-                extension = self.function_recv(function=function, length=extension_length, buff=buff).decode(self.encoding)
-                meta_length = unpack('i', self.function_recv(function=function, length=4, buff=buff))[0]
-            
-        # 接收所有元数据
+            extension_head = reader.read(4)
+            extension_body = reader.read(unpack('i', extension_head)[0])
+            head = extension_head + extension_body + reader.read(4)
+        # 从头部获取扩展名长度
+        extension_length = unpack('i', head[:4])[0]  # 读取扩展名长度
+        extension = bytes(head[4:4 + extension_length])  # 读取扩展名
+        meta_length = unpack('i', head[4 + extension_length:8 + extension_length])[0]  # 读取元数据长度
         self._extension = extension
-        self.function_recv(function=function, length=meta_length, handler=[self._add_meta, handler], buff=buff)
         
+        # 接收所有元数据
+        if not self.local:
+            if not callable(handler):
+                # 内存模式直接读入预分配的缓冲区
+                self._meta = bytearray(meta_length)
+                reader.readinto(memoryview(self._meta))
+                return self
+            self._meta = bytearray()
+            remaining = meta_length
+            while remaining:
+                data = reader.read(min(buff, remaining))
+                remaining -= len(data)
+                self._meta.extend(data)
+                handler(data)
+            return self
+        
+        # 从头覆盖原文件，长度已知时一次预留全部空间
+        file = self._handle()
+        file.rewind()
+        if meta_length >= file.buffer:
+            file.preallocate(len(head) + meta_length)
+        try:
+            file.append(head)  # 将头部数据添加到元数据中
+            remaining = meta_length
+            if callable(handler):
+                while remaining:
+                    data = reader.read(min(buff, remaining))
+                    remaining -= len(data)
+                    file.append(data)
+                    handler(data)
+            else:
+                # 无处理函数时按写缓冲大小读入复用的缓冲区后直接写出
+                block = memoryview(bytearray(min(file.buffer, meta_length)))
+                while remaining:
+                    n = min(len(block), remaining)
+                    reader.readinto(block[:n])
+                    file.append(block[:n])
+                    remaining -= n
+        finally:
+            # 去掉原文件多出的部分，出错时也去掉未写入的预留空间
+            file.trim()
         return self
     
     def load_generator(self, generator: Generator, extention:Optional[str]=None, handler:Optional[Callable[[bytes], None]]=None, set_length:bool=True) -> 'LsoProtocol':
@@ -619,21 +1014,24 @@ class LsoProtocol:
             - If an extension is provided, it will be set before loading data.
             - Each time data is received, if a handler function is provided, it will be called.
         """
-        # 清空文件
+        # 清空文件，原内容在写入时被覆盖
         if self.local:
-            with open(self.local, 'w', encoding=self.encoding) as f: 
-                f.write('')
+            self._handle().rewind()
         else: 
             self._meta = bytearray()
         if extention:
             self.extension = extention
         length = 0
         if set_length: self._set_length(length)
-        for data in generator:
-            if not data: continue
-            if callable(handler): handler(data)
-            length += len(data)
-            self._add_meta(data)
+        append = self._handle().append if self.local else self._meta.extend
+        try:
+            for data in generator:
+                if not data: continue
+                if callable(handler): handler(data)
+                length += len(data)
+                append(data)
+        finally:
+            if self.local: self._handle().trim()
         if set_length: self._set_length(length)
         return self
     
@@ -647,13 +1045,18 @@ class LsoProtocol:
             None
         """
         if not self.local or not self.verify(self.local): return
-        with open(self.local, 'r+b') as f:
-            mm = mmap(f.fileno(), 0, access=ACCESS_WRITE)
+        file = self._handle()
+        file.flush()
+        mm = mmap(file.fileno(), 0, access=ACCESS_WRITE)
+        try:
             size = mm.size()
             head_length = len(self._extension) + 8
             mm.move(0, head_length, size - head_length)
             mm.resize(size - head_length)
             mm.flush()
+        finally:
+            mm.close()
+        self.close()
         self.local = None
     
     def save(self, path:str):
@@ -708,28 +1111,19 @@ class RecvWrapper:
     def __init__(self, recv: Callable[[], bytes]):
         """Initialize buffer with raw byte receiver."""
         self.recv_func = recv
-        self.recv_data = bytearray()
+        self.reader = FrameReader(lambda size: recv(), buff=1)
     
     def recv(self, length: int) -> bytes:
         """Block until exactly `length` bytes are available.
         
-        Implements buffering through:
-        1. Data accumulation loop
-        2. Buffer slicing via Utils.split_bytes
-        3. State preservation of remaining bytes
+        Buffering is delegated to FrameReader, which keeps a read offset instead
+        of re-slicing the remaining bytes on every call.
         
         Raises:
             ConnectionError: If underlying recv() returns empty bytes (EOF) before
                 fulfilling requested length
         """
-        while len(self.recv_data) < length:
-            chunk = self.recv_func()
-            if not chunk:
-                raise ConnectionError("Unexpected EOF during buffered read")
-            self.recv_data.extend(chunk)
-        
-        data, self.recv_data = Utils.split_bytes(self.recv_data, length)
-        return data
+        return bytes(self.reader.read(length))
 
 '''
 Mission Head (use LsoProtocol):
@@ -737,247 +1131,2670 @@ extension: dict {type:mssion} | meta: dict
 
 Mission Data (use LsoProtocol):
 extension: str safe_code(6)   | meta: bytes
+
+Hello (always LsoProtocol, sent at Pipe.start when binary framing or a feature needing it is requested):
+extension: dict {type:hello, extension:''}  | meta: dict {version:int, framing:list}
+The empty 'extension' makes peers that predate the handshake skip the hello as
+data of an unknown mission.
+
+Credit (flow control, once the peer's hello offered 'credit'):
+extension: dict {type:credit} | meta: json {limit:int, missions:{extension:int}}
+
+Message (small mission in a single frame, once the peer's hello offered 'inline'):
+extension: dict {type:message} | meta: head_length(uint32) | head: json {extension, info} | data
+
+Ping / Pong (heartbeat, once the peer's hello offered 'heartbeat'):
+extension: dict {type:ping|pong} | meta: json {seq:int}
+
+Resume (resumable missions, once both hellos carried a 'node' id):
+extension: dict {type:resume} | meta: json {offsets:{extension:int}} | {drop:[extension]} | {done:extension}
+
+Binary Frame (after both sides agreed on 'binary' framing):
+frame_type(uint8) | flags(uint8) | stream_id(uint32) | payload_length(uint32) | payload(bytes)
+
+Streaming missions of unknown length announce `length: null` in their head; their
+last data frame carries the 'end' flag (binary header flags, or `flags` in the LSO extension).
 '''
 
-class Pipe:
-    """Data transmission pipe for transferring data between different endpoints.
+# 二进制帧版本与帧头结构
+FRAME_VERSION = 1
+FRAME_HEAD = Struct('!BBII')
+# 单帧消息负载开头的消息头长度
+MESSAGE_HEAD = Struct('!I')
+
+# 二进制帧类型，与 LSO 模式下扩展信息中的 type 一一对应
+FRAME_TYPES = {
+    'mission': 1,
+    'data': 2,
+    'cancel': 3,
+    'credit': 4,
+    'message': 5,
+    'ping': 6,
+    'pong': 7,
+    'resume': 8,
+}
+FRAME_NAMES = {value: key for key, value in FRAME_TYPES.items()}
+
+# 帧标志位
+FRAME_FLAGS = {
+    'end': 0x01,         # 长度未知的流式任务的最后一个数据帧
+    'compressed': 0x02,  # 数据帧负载按任务头中的 codec 压缩
+}
+
+# 可协商的压缩算法：名称 -> (压缩函数, 解压器工厂)，bz2 和 lzma 在部分精简构建中不可用
+CODECS = {'zlib': (zlib.compress, zlib.decompressobj)}
+try:
+    import bz2
+    CODECS['bz2'] = (bz2.compress, bz2.BZ2Decompressor)
+except ImportError:
+    pass
+try:
+    import lzma
+    CODECS['lzma'] = (lzma.compress, lzma.LZMADecompressor)
+except ImportError:
+    pass
+
+# 长度未知的任务单个数据帧解压后的上限，防止解压炸弹
+MAX_INFLATE = 1 << 26
+
+# 压缩分块共用的线程池，zlib/bz2/lzma 压缩时释放 GIL
+_compress_pool: Optional[ThreadPoolExecutor] = None
+_compress_pool_lock = Lock()
+
+def _get_compress_pool() -> ThreadPoolExecutor:
+    """Return the shared chunk compression thread pool, creating it on first use."""
+    global _compress_pool
+    with _compress_pool_lock:
+        if _compress_pool is None:
+            _compress_pool = ThreadPoolExecutor(max_workers=min(4, cpu_count() or 1), thread_name_prefix='netcore-compress')
+        return _compress_pool
+
+def _compress_chunk(codec:str, chunk:Union[bytes, memoryview]) -> tuple[Union[bytes, memoryview], int]:
+    """Compress one data frame payload.
     
-    This class manages the sending and receiving of data, supports task queues and pools,
-    and uses threads to handle asynchronous operations.
-    It is the core component of network communication, handling all data transfer and message distribution.
+    Args:
+        codec: Codec name from CODECS
+        chunk: Raw payload
+        
+    Returns:
+        tuple: (payload, frame flags); the raw chunk without the 'compressed'
+        flag if compression saves less than 10%
     """
+    if not len(chunk):
+        return chunk, 0
+    data = CODECS[codec][0](chunk)
+    if len(data) > len(chunk) * 0.9:
+        return chunk, 0
+    return data, FRAME_FLAGS['compressed']
+
+def _decompress_chunk(codec:str, data:Union[bytes, bytearray], limit:int) -> bytes:
+    """Decompress one data frame payload.
     
-    def __init__(self, recv_function:Callable[[Optional[int]], bytes], send_function:Callable[[bytes], None]):
-        """Initialize a Pipe instance.
+    Args:
+        codec: Codec name from the mission head
+        data: Compressed payload
+        limit: Maximum decompressed size
         
-        Args:
-            recv_function: Function to receive data, accepts an optional integer parameter (number of bytes to read)
-            send_function: Function to send data, accepts a bytes parameter (data to send)
-        """
-        # if not Utils.accepts_single_argument(recv_function):
-        #     recv_function = RecvWrapper(recv_function)
-        self.recv_function = recv_function  # 接收数据的函数
-        self.send_function = send_function  # 发送数据的函数
-        # 任务头队列，优先发送
-        self.mission_head = Queue()
-        # 任务队列
-        self.send_pool: dict[str, Queue|Generator] = {}  # 存储待发送的数据
-        # 接收的数据
-        self.recv_pool: dict[str, bytes] = {}  # 存储接收到的完整数据
-        # 接收的数据的额外信息
-        self.recv_info: dict[str, dict] = {}  # 存储接收数据的元信息
-        # 临时，在接收完成后转移到 recv_info
-        self.temp_pool: dict[str, dict] = {}  # 临时存储接收中的数据
-        # 发送任务的额外信息
-        self.misson_info: dict[str, dict] = {}  # 存储发送任务的元信息
+    Returns:
+        bytes: The raw payload
+        
+    Raises:
+        ValueError: If the codec is unknown, or the payload is truncated or inflates beyond limit
+    """
+    if codec not in CODECS:
+        raise ValueError(f'unsupported codec {codec}')
+    decompressor = CODECS[codec][1]()
+    raw = decompressor.decompress(data, limit + 1)
+    if len(raw) > limit or not decompressor.eof:
+        raise ValueError(f'{codec} frame inflates beyond {limit} bytes or is truncated')
+    return raw
 
-        # 添加线程锁
-        self.send_lock = RLock()
-        self.recv_lock = RLock()
+# 可续传任务文件名中的节点编号与任务标识，其他标识的任务不续传
+RESUME_NAME = re.compile(r'[A-Za-z0-9_-]+')
+RESUME_NODE = re.compile(r'[A-Za-z0-9]+')
 
-        # 接收和发送线程
-        self.recv_thread = Thread(target=self._recv_thread)
-        self.send_thread = Thread(target=self._send_thread)
+# 进程内正被某个管道收发的续传文件，同一目录下的其他管道不得再加载
+_resume_claims: set[str] = set()
+_resume_lock = Lock()
 
-        # 接收线程是否出错
-        self.recv_exception = False
+def _claim_resume_file(local:str) -> bool:
+    """Reserve a resume file for one pipe; False if another pipe holds it."""
+    with _resume_lock:
+        if local in _resume_claims:
+            return False
+        _resume_claims.add(local)
+        return True
 
-        self.final_error_handler: Callable = None
-        self.cancel_handler: Callable[[str], None] = self._cancel_handler
-        self.mission_complete_handler: Callable[[str], None] = self._mission_complete_handler
+def _release_resume_file(local:str, delete:bool=True) -> None:
+    """Give up a resume file, deleting it unless it is kept for a later reconnect."""
+    with _resume_lock:
+        _resume_claims.discard(local)
+    if delete:
+        try:
+            remove(local)
+        except FileNotFoundError:
+            pass
+
+def _resume_head(extension:dict, length:int) -> bytes:
+    """Build the LSO meta head of a resume file."""
+    extension = json.dumps(extension).encode('utf-8')
+    # 元数据长度超出 int32 时记为 -1，以文件大小为准
+    return pack('i', len(extension)) + extension + pack('i', length if length < 2 ** 31 else -1)
+
+def _read_resume_head(file) -> tuple[dict, int]:
+    """Read the extension and head length of a resume file."""
+    size = unpack('i', file.read(4))[0]
+    extension = json.loads(file.read(size))
+    return extension, size + 8
+
+
+class _HeartbeatTimer:
+    """Single background thread driving the heartbeats of all pipes.
     
-    def _mission_complete_handler(self, extension: str) -> None:
-        """Handle mission completion.
-        
-        Args:
-            extension: The extension identifier of the task that has completed
-        """
-        pass
+    Pipes register once their peer has announced heartbeat support; each
+    tick queues a ping or tears the pipe down if the peer went silent. Pipes
+    are held weakly and dropped once they close.
+    """
+    
+    def __init__(self):
+        self._pipes = weakref.WeakSet()
+        self._condition = Condition()
+        self._changed = False
+        self._thread: Optional[Thread] = None
+    
+    def add(self, pipe:'Pipe') -> None:
+        """Start driving the heartbeats of a pipe."""
+        with self._condition:
+            self._pipes.add(pipe)
+            self._changed = True
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name='netcore-heartbeat', daemon=True)
+                self._thread.start()
+            self._condition.notify()
+    
+    def _run(self) -> None:
+        """Main loop: tick every pipe, then sleep until the earliest one is due."""
+        while True:
+            with self._condition:
+                pipes = list(self._pipes)
+                self._changed = False
+            now = perf_counter()
+            wait = 1.0
+            for pipe in pipes:
+                try:
+                    due = pipe._heartbeat_tick(now)
+                except Exception as e:
+                    logger.error(f'Heartbeat error: {e}')
+                    due = None
+                if due is None:
+                    self._pipes.discard(pipe)
+                else:
+                    wait = min(wait, due - now)
+            with self._condition:
+                if not self._changed:
+                    self._condition.wait(max(wait, 0.01))
 
-    def _cancel_handler(self, extension: str) -> None:
-        """Handle mission cancellation.
+_heartbeat_timer = _HeartbeatTimer()
+
+# 支持的帧格式，按优先级排列
+FRAMINGS = ('binary', 'lso')
+
+# 发送任务的优先级类别，数值越小越优先；类别之间严格优先，类别内按权重做赤字轮询
+PRIORITIES = {'high': 0, 'normal': 1, 'low': 2}
+
+class Mission:
+    """Outbound mission holding a single payload buffer and a send cursor.
+    
+    The payload is never split up front: each call to `next_chunk` hands out a
+    zero-copy memoryview slice starting at the cursor, so the chunk size can be
+    decided by the send scheduler at send time.
+    
+    The caller must not mutate the buffer until the mission has completed.
+    
+    Attributes:
+        view (memoryview): Byte view over the payload
+        length (int): Total payload length in bytes
+        offset (int): Number of bytes already handed out
+        buff (Optional[int]): Fixed chunk size, None to let the pipe decide
+    """
+    
+    def __init__(self, data:Union[bytes, bytearray, memoryview], buff:Optional[int]=None):
+        """Initialize a Mission instance.
         
         Args:
-            extension: The extension identifier of the task to cancel
+            data: Payload to send, any bytes-like object
+            buff: Optional fixed chunk size, None to use the pipe's chunk size
         """
-        pass
+        self.view = memoryview(data).cast('B')
+        self.length = self.view.nbytes
+        self.offset = 0
+        self.buff = buff
     
-    def _recv(self) -> tuple[LsoProtocol, dict]:
-        """Receive a complete LSO protocol data packet.
+    @property
+    def done(self) -> bool:
+        """Check whether the whole payload has been handed out.
         
         Returns:
-            tuple: (LsoProtocol instance, information dictionary)
+            bool: True if no data remains
         """
-        lso = LsoProtocol().load_stream(self.recv_function)
-        info = json.loads(lso.extension)
-        return lso, info
+        return self.offset >= self.length
     
-    def _send(self, data:bytes, info:dict) -> None:
-        """Send data and related information.
+    def next_chunk(self, size:int) -> memoryview:
+        """Return the next chunk and advance the cursor.
         
         Args:
-            data: Byte data to send
-            info: Metadata related to the data
+            size: Maximum chunk size in bytes
+            
+        Returns:
+            memoryview: Zero-copy slice of the payload
         """
-        lso = LsoProtocol(local=None, encoding='utf-8', buff=2048)
-        lso.extension = json.dumps(info)
-        lso.set_meta(data)
-        for i in lso.full_data():
-            self.send_function(i)
+        chunk = self.view[self.offset:self.offset + size]
+        self.offset += len(chunk)
+        return chunk
+
+class FileRange:
+    """Byte range of an open file, sent as a data frame payload without reading it.
     
-    def create_mission(self, data:bytes, info:dict={}, extension:Optional[str]=None, buff:int=4096) -> str:
-        """Create a send mission.
-        
-        Split large data into chunks and add to the send queue, each chunk will be sent separately.
+    Produced for file-backed stream missions while the pipe's transport can
+    send file ranges directly (Pipe.send_file_function); `len()` is the
+    number of bytes in the range.
+    """
+    
+    __slots__ = ('file', 'offset', 'length')
+    
+    def __init__(self, file, offset:int, length:int):
+        """Describe `length` bytes of `file` starting at `offset`."""
+        self.file = file
+        self.offset = offset
+        self.length = length
+    
+    def __len__(self) -> int:
+        return self.length
+
+class StreamMission:
+    """Outbound mission pulling its payload lazily from a stream.
+    
+    The source can be an iterable of bytes-like chunks, a readable binary file
+    object or an LsoProtocol (its meta is read from the local file). Data is only
+    pulled when the send scheduler asks for the next chunk, so the payload never
+    has to be held in memory as a whole.
+    
+    With a known length the receiver preallocates its buffer as for Mission, and
+    the source must provide at least that many bytes (extra data is not sent).
+    With an unknown length the stream ends when the source is exhausted, which is
+    signalled by an empty data frame carrying the 'end' flag.
+    
+    Regular binary files of known length (including the local file of an
+    LsoProtocol) can also be handed out as FileRanges, which the transport
+    sends straight from the file.
+    
+    Attributes:
+        length (Optional[int]): Total payload length in bytes, None if unknown
+        offset (int): Number of bytes already handed out
+        buff (Optional[int]): Fixed chunk size, None to let the pipe decide
+        file: The regular file the payload is read from, None for other sources
+    """
+    
+    def __init__(self, source, length:Optional[int]=None, buff:Optional[int]=None):
+        """Initialize a StreamMission instance.
         
         Args:
-            data: Byte data to send
-            info: Metadata related to the data
-            extension: Optional extension identifier, defaults to a random secure code
-            buff: Size of each data chunk, default is 4096 bytes
-            
-        Returns:
-            str: The mission's extension identifier
+            source: Iterable of bytes-like chunks, readable binary file object or LsoProtocol
+            length: Total payload length, detected for regular files and LsoProtocol
+                when omitted, otherwise unknown
+            buff: Optional fixed chunk size, None to use the pipe's chunk size
         """
-        with self.send_lock:  # 添加锁保护
+        self.offset = 0
+        self.buff = buff
+        self._read: Optional[Callable[[int], bytes]] = None
+        self._iter = None
+        self._pending = memoryview(b'')
+        self._exhausted = False
+        self._file = None
+        # 可按区间直接发送的普通文件、负载在其中的起始位置，以及按区间发送后是否需要重新定位读取位置
+        self.file = None
+        self._base = 0
+        self._seek = False
+        if isinstance(source, LsoProtocol):
+            if source.local:
+                # 先写出句柄中缓冲的追加数据，再直接从本地文件的元数据部分读取
+                source.flush()
+                self._file = open(source.local, 'rb')
+                self._base = len(source._extension) + 8
+                self._file.seek(self._base)
+                self._read = self._file.read
+                self.file = self._file
+            else:
+                self._iter = iter((source.meta,))
+            if length is None:
+                length = source.length
+        elif hasattr(source, 'read'):
+            self._read = source.read
+            remaining = self._remaining_size(source)
+            if length is None:
+                length = remaining
+            if remaining is not None and 'b' in getattr(source, 'mode', ''):
+                self.file = source
+                self._base = source.tell()
+        else:
+            self._iter = iter(source)
+        self.length = length
+        if length is None:
+            self.file = None
+    
+    @staticmethod
+    def _remaining_size(file) -> Optional[int]:
+        """Return the bytes left in a regular file from its current position, if known."""
+        try:
+            status = fstat(file.fileno())
+            if not S_ISREG(status.st_mode):
+                return None
+            return max(status.st_size - file.tell(), 0)
+        except (AttributeError, OSError, ValueError):
+            return None
+    
+    @property
+    def done(self) -> bool:
+        """Check whether the whole payload has been handed out.
+        
+        Returns:
+            bool: True if the source is exhausted or the known length was reached
+        """
+        return self._exhausted or (self.length is not None and self.offset >= self.length)
+    
+    def _pull(self, size:int) -> Union[bytes, memoryview]:
+        """Pull up to `size` bytes from the source, empty once it is exhausted."""
+        if self._read is not None:
+            if self._seek:
+                # 之前的区间未经读取发出，读取位置需跟上
+                self.file.seek(self._base + self.offset)
+                self._seek = False
+            return self._read(size) or b''
+        while not self._pending:
+            try:
+                self._pending = memoryview(next(self._iter)).cast('B')
+            except StopIteration:
+                return b''
+        chunk = self._pending[:size]
+        self._pending = self._pending[size:]
+        return chunk
+    
+    def next_chunk(self, size:int) -> Union[bytes, memoryview]:
+        """Pull the next chunk from the source and advance the cursor.
+        
+        Args:
+            size: Maximum chunk size in bytes
+            
+        Returns:
+            bytes|memoryview: The chunk, empty when an unknown-length stream ends
+            
+        Raises:
+            ValueError: If the source ends before the announced length
+        """
+        if self.length is not None:
+            size = min(size, self.length - self.offset)
+        chunk = self._pull(size)
+        if not len(chunk):
+            self._exhausted = True
+            self.close()
+            if self.length is not None:
+                raise ValueError(f'stream ended at {self.offset} of {self.length} bytes')
+        self.offset += len(chunk)
+        if self.length is not None and self.offset >= self.length:
+            self.close()
+        return chunk
+    
+    def next_range(self, size:int) -> FileRange:
+        """Hand out the next chunk as a range of `file` without reading it.
+        
+        Args:
+            size: Maximum range length in bytes
+            
+        Returns:
+            FileRange: The range, to be sent before the mission is closed
+            
+        Raises:
+            ValueError: If the file is shorter than the announced length
+        """
+        size = min(size, self.length - self.offset)
+        start = self._base + self.offset
+        if fstat(self.file.fileno()).st_size < start + size:
+            self._exhausted = True
+            raise ValueError(f'file ended before {self.offset + size} of {self.length} bytes')
+        self.offset += size
+        self._seek = True
+        return FileRange(self.file, start, size)
+    
+    def close(self) -> None:
+        """Release the source: close a file opened for an LsoProtocol and stop iteration."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._pending = memoryview(b'')
+
+class ChunkStream:
+    """Bounded queue of an inbound mission's chunks, consumed while it arrives.
+    
+    The receiving pipe puts each data frame's payload as it lands and the
+    consumer iterates over the chunks. The pipe grants the sender credit for
+    this mission only as the consumer takes chunks, so at most `max_buffer`
+    bytes are queued and a slow consumer throttles just its own mission. With
+    a peer that does not support credit, the pipe instead stops reading from
+    its transport while more than `max_buffer` bytes are queued.
+    
+    Iteration ends when the whole mission has arrived; it raises
+    NetcorePipeError if the mission is canceled or the pipe fails first.
+    
+    Attributes:
+        length (Optional[int]): Announced mission length, None if unknown
+        received (int): Number of bytes put so far
+        max_buffer (int): Queued bytes above which the producer is paused
+        on_drain (Optional[Callable]): Called when the queue drops below max_buffer
+        on_read (Optional[Callable]): Called with the number of bytes the consumer
+            took or discarded, used by the pipe to return credit to the sender
+    """
+    
+    def __init__(self, max_buffer:int=1048576, length:Optional[int]=None):
+        """Initialize a ChunkStream instance.
+        
+        Args:
+            max_buffer: Queued bytes above which the producer is paused
+            length: Announced mission length, None if unknown
+        """
+        self.max_buffer = max_buffer
+        self.length = length
+        self.received = 0
+        self.on_drain: Optional[Callable[[], None]] = None
+        self.on_read: Optional[Callable[[int], None]] = None
+        self._chunks = deque()
+        self._buffered = 0
+        self._finished = False
+        self._discarded = False
+        self._error: Optional[Exception] = None
+        self._source: Optional[Iterator] = None
+        self._condition = Condition()
+    
+    @classmethod
+    def from_data(cls, data:Union[bytes, bytearray, 'LsoProtocol'], buff:int=1048576) -> 'ChunkStream':
+        """Create a finished stream over a mission that was received in full.
+        
+        Chunks of an LsoProtocol are read from its file as they are taken.
+        
+        Args:
+            data: The received data
+            buff: Number of bytes read from an LsoProtocol per chunk
+            
+        Returns:
+            ChunkStream: Stream yielding `data`
+        """
+        if isinstance(data, LsoProtocol):
+            sink = cls(length=data.length)
+            sink._source = data.full_data(buff)
+        else:
+            sink = cls(length=len(data))
+            sink._source = iter((data,) if data else ())
+        sink.received = sink.length
+        sink._finished = True
+        return sink
+    
+    @property
+    def writable(self) -> bool:
+        """Check whether the producer may put more data without waiting.
+        
+        Returns:
+            bool: True if the queue is below max_buffer or nobody consumes it anymore
+        """
+        return self._discarded or self._error is not None or self._buffered < self.max_buffer
+    
+    def put(self, chunk:Union[bytes, bytearray]) -> bool:
+        """Queue a chunk (producer side); never blocks.
+        
+        Args:
+            chunk: Payload of one data frame
+            
+        Returns:
+            bool: False if the consumer discarded the stream and the chunk was dropped
+        """
+        with self._condition:
+            self.received += len(chunk)
+            if self._discarded:
+                return False
+            self._chunks.append(chunk)
+            self._buffered += len(chunk)
+            self._condition.notify_all()
+            return True
+    
+    def finish(self) -> None:
+        """Mark the mission as completely received (producer side)."""
+        with self._condition:
+            self._finished = True
+            self._condition.notify_all()
+    
+    def abort(self, error:Exception) -> None:
+        """End the stream with an error (producer side).
+        
+        Args:
+            error: Exception raised to the consumer
+        """
+        with self._condition:
+            if self._finished:
+                return
+            self._error = error
+            self._condition.notify_all()
+    
+    def wait_writable(self) -> None:
+        """Block the producer until the queue is below max_buffer."""
+        with self._condition:
+            while not self.writable:
+                self._condition.wait()
+    
+    def get(self, timeout:Optional[float]=None) -> Optional[bytearray]:
+        """Wait for the next chunk (consumer side).
+        
+        Args:
+            timeout: Maximum seconds to wait, None to wait indefinitely
+            
+        Returns:
+            Optional[bytearray]: The next chunk, None at the end of the mission
+            
+        Raises:
+            NetcorePipeError: If the mission was canceled or the pipe failed
+            TimeoutError: If no chunk arrived within `timeout`
+        """
+        with self._condition:
+            while not self._chunks and not self._finished and self._error is None:
+                if not self._condition.wait(timeout):
+                    raise TimeoutError('no chunk received within timeout')
+            if not self._chunks:
+                if self._error is not None:
+                    raise NetcorePipeError('Chunk stream aborted', self._error)
+                if self._source is None or self._discarded:
+                    return None
+                return next(self._source, None)
+            chunk = self._chunks.popleft()
+            was_full = self._buffered >= self.max_buffer
+            self._buffered -= len(chunk)
+            drained = was_full and self._buffered < self.max_buffer
+            if drained:
+                self._condition.notify_all()
+        if self.on_read is not None:
+            self.on_read(len(chunk))
+        if drained and self.on_drain is not None:
+            self.on_drain()
+        return chunk
+    
+    def __iter__(self):
+        """Iterate over chunks until the mission has been fully received."""
+        while True:
+            chunk = self.get()
+            if chunk is None:
+                return
+            yield chunk
+    
+    def read(self) -> bytearray:
+        """Wait for the rest of the mission and return it as one buffer.
+        
+        Returns:
+            bytearray: All remaining data
+        """
+        data = bytearray()
+        for chunk in self:
+            data += chunk
+        return data
+    
+    def discard(self) -> None:
+        """Drop queued and future chunks (consumer side), releasing the producer."""
+        with self._condition:
+            self._discarded = True
+            self._chunks.clear()
+            dropped, self._buffered = self._buffered, 0
+            self._condition.notify_all()
+        if dropped and self.on_read is not None:
+            self.on_read(dropped)
+        if self.on_drain is not None:
+            self.on_drain()
+
+class Pipe:
+    """Data transmission pipe for transferring data between different endpoints.
+    
+    This class manages the sending and receiving of data, supports task queues and pools,
+    and uses threads to handle asynchronous operations.
+    It is the core component of network communication, handling all data transfer and message distribution.
+    """
+    
+    def __init__(
+            self,
+            recv_function:Callable[[Optional[int]], bytes],
+            send_function:Callable[[bytes], None],
+            framing:str='lso',
+            recv_into_function:Optional[Callable[[memoryview], int]]=None,
+            recv_buff:Optional[int]=None,
+            send_parts_function:Optional[Callable[[list], None]]=None
+        ):
+        """Initialize a Pipe instance.
+        
+        Args:
+            recv_function: Function to receive data, accepts an optional integer parameter (number of bytes to read)
+            send_function: Function to send data, accepts a bytes parameter (data to send)
+            framing: Requested frame format, 'lso' (default, compatible with every peer) or
+                'binary' (compact struct headers, negotiated with the peer at start)
+            recv_into_function: Optional function that reads directly into a writable buffer and
+                returns the number of bytes read (like socket.recv_into). Detected automatically
+                when recv_function is a socket's bound recv method.
+            recv_buff: Transport read size of the frame reader. Defaults to 65536 for sockets,
+                whose recv returns what is available, and 0 (read exactly what is needed) for
+                other transports, whose read(n) may block until n bytes arrive.
+            send_parts_function: Optional function writing a list of buffers completely in
+                one gathered write (like SocketTransport.sendmsg_all). Large chunks are then
+                sent together with their header without being copied.
+        
+        Raises:
+            ValueError: If the framing is not supported
+        """
+        if framing not in FRAMINGS:
+            raise ValueError(f"framing must be one of {FRAMINGS}")
+        # if not Utils.accepts_single_argument(recv_function):
+        #     recv_function = RecvWrapper(recv_function)
+        # 直接读入缓冲区的接收函数，可避免一次拷贝
+        owner = getattr(recv_function, '__self__', None)
+        is_socket = isinstance(owner, socket.socket) and getattr(recv_function, '__name__', '') == 'recv'
+        if getattr(send_function, '__self__', None) is owner and is_socket and getattr(send_function, '__name__', '') == 'send':
+            # socket.send 可能只写出部分数据导致帧损坏，改用 sendall
+            send_function = owner.sendall
+        self.recv_function = recv_function  # 接收数据的函数
+        self.send_function = send_function  # 发送数据的函数
+        # 一次写出多个缓冲区的发送函数，None 时拼接后交给 send_function
+        self.send_parts_function = send_parts_function
+        # 直接发送文件区间的函数 (file, offset, count, head)，设置后文件任务的负载不经用户态读取
+        self.send_file_function: Optional[Callable] = None
+        # 按文件区间发送时每帧的最大长度
+        self.sendfile_chunk = 1048576
+        if recv_into_function is None and is_socket:
+            recv_into_function = owner.recv_into
+        self.recv_into_function = recv_into_function
+        # 底层套接字，可交给 Reactor 以非阻塞方式驱动
+        self.socket: Optional[socket.socket] = owner if is_socket else None
+        # 非套接字传输对象（如 ShmTransport），设置后在对端失联时调用其 close 中断阻塞的收发
+        self.transport = None
+        if recv_buff is None:
+            recv_buff = 65536 if is_socket else 0
+        # 带缓冲的帧读取器，一次读取可解析多个帧
+        self.reader = FrameReader(recv_function, recv_into_function, recv_buff)
+        # 任务头队列，优先发送
+        self.mission_head = Queue()
+        # 任务队列
+        self.send_pool: dict[str, Mission] = {}  # 存储待发送的数据
+        # 默认分块大小，在发送时决定
+        self.chunk_size = 4096
+        # 自适应分块：按实测发送速率调整 chunk_size，使一个分块的发送耗时接近 chunk_latency
+        self.adaptive_chunks = False
+        self.chunk_bounds: tuple[int, int] = (512, 1048576)
+        self.chunk_latency = 0.01
+        # 实测发送速率（字节/秒），只统计有积压时的发送
+        self.send_rate: Optional[float] = None
+        self._rate_window = {'last': None, 'bytes': 0, 'time': 0.0}
+        # 发送时使用的压缩算法（CODECS 中的名称），None 不压缩；仅在对端握手声明支持后生效
+        self.compression: Optional[str] = None
+        # 小于该长度的任务不压缩
+        self.compress_threshold = 1024
+        # 不少于该数量分块的任务在线程池中并行压缩后续分块
+        self.compress_parallel = 4
+        # 对端可解压的算法，来自其握手
+        self._peer_codecs: set[str] = set()
+        # 不超过该长度的任务连同任务头以单帧发送，None（默认）表示关闭；仅在对端握手声明支持后生效
+        self.inline_threshold: Optional[int] = None
+        self._peer_inline = False
+        # 待发送的单帧消息：extension -> (数据, 元信息, 创建时间)，按创建顺序发送
+        self._inline: OrderedDict[str, tuple] = OrderedDict()
+        # 心跳间隔（秒），None 表示关闭；仅在对端握手声明支持后生效
+        self.heartbeat_interval: Optional[float] = None
+        # 连续这么多个心跳间隔收不到对端任何帧时关闭管道
+        self.heartbeat_misses = 3
+        # 平滑往返时延及其抖动（秒），由心跳测得，None 表示尚无样本
+        self.rtt: Optional[float] = None
+        self.rtt_jitter: Optional[float] = None
+        self._peer_heartbeat = False
+        # 可续传任务的持久化目录，None 表示关闭；两端都设置时任务在重连后从断点继续
+        self.resume_dir: Optional[str] = None
+        # 不小于该长度的内存任务持久化为可续传任务
+        self.resume_threshold = 1 << 20
+        self._node_id: Optional[str] = None
+        self._peer_node: Optional[str] = None
+        # 已发完但对端尚未确认收齐的续传任务：extension -> 持久化文件
+        self._resume_unacked: dict[str, str] = {}
+        # 收发计数开关；关闭后 stats 只报告队列深度
+        self.metrics = True
+        # 收发计数，发送方向只由发送驱动写入，接收方向只由接收驱动写入，无需加锁
+        self._counters = {
+            'bytes_sent': 0, 'frames_sent': 0, 'missions_sent': 0, 'send_busy': 0.0,
+            'bytes_received': 0, 'frames_received': 0, 'missions_received': 0,
+            'transfers': 0, 'transfer_total': 0.0, 'transfer_max': 0.0,
+        }
+        self._counters_since = perf_counter()
+        # 设置后（netcore.trace.Tracer），记录带 trace 头的任务在本端各阶段的耗时
+        self.tracer = None
+        self._heartbeat = {'seq': 0, 'sent': {}, 'next': 0.0, 'last_recv': perf_counter(), 'pings': 0, 'pongs': 0, 'last_rtt': None, 'min_rtt': None}
+        # 各优先级类别中活跃任务的轮询队列
+        self._active: list[deque] = [deque() for _ in PRIORITIES]
+        # 未指定优先级且不超过该长度的任务归入 high 类别，使小响应抢占批量数据
+        self.small_mission = 16384
+        # 各优先级类别已完成任务的排队延迟统计
+        self._class_stats: dict[str, dict] = {
+            name: {'missions': 0, 'bytes': 0, 'latency_total': 0.0, 'latency_max': 0.0}
+            for name in PRIORITIES
+        }
+        # 超过该长度的接收任务写入临时 LSO 文件而不占用内存，None 表示不落盘
+        self.spill_threshold: Optional[int] = None
+        # 临时文件目录，None 使用系统临时目录
+        self.spill_dir: Optional[str] = None
+        # 内存上限：接收中任务的重组缓冲区与已交付未释放的数据之和，超出时任务落盘，None 表示不限
+        self.recv_budget: Optional[int] = 268435456
+        
+        # 接收窗口：已交付但未释放（及流式任务中未被消费）的数据上限，None 表示不做流量控制
+        self.recv_window: Optional[int] = 16777216
+        # 对端握手声明支持 credit 后才向其通告接收窗口
+        self._peer_credit = False
+        # 为 True 时任务交给 recv_handler 后即释放；为 False 时由处理方调用 release
+        self.release_on_delivery = True
+        # 接收方向的流量控制状态，通过 credit 帧把允许发送的绝对字节上限通告给对端
+        self._flow_lock = Lock()
+        self._flow = {
+            'received': 0,    # 已接收的数据字节总数
+            'held': {},       # 任务 -> 占用接收窗口的字节数
+            'held_total': 0,
+            'granted': 0,     # 已通告的管道上限
+            'missions': {},   # 流式任务 -> {'recv', 'window', 'granted'}
+            'reserved': 0,    # 接收中任务的内存重组缓冲区字节数，只计入 recv_budget
+            'queued': False,  # 已有待发送的 credit 帧
+        }
+        # 发送预算：内存中尚未发出的任务数据上限，超出时 create_mission 等待，None 表示不限
+        self.send_budget: Optional[int] = None
+        # 等待发送预算的秒数，None 为一直等待，0 为立即抛出 TimeoutError
+        self.send_timeout: Optional[float] = None
+        self._queued_bytes = 0
+        # 对端通告的发送上限，None 表示对端不做流量控制
+        self._peer_limit: Optional[int] = None
+        self._sent_bytes = 0
+        # 因单任务额度用完而暂停的任务
+        self._blocked: set[str] = set()
+        # 已切分待发送的压缩分块字节数，已计入 _sent_bytes
+        self._prefetched = 0
+        self._send_closed = False
+        # 接收的数据
+        self.recv_pool: dict[str, bytes] = {}  # 存储接收到的完整数据
+        # 接收的数据的额外信息
+        self.recv_info: dict[str, dict] = {}  # 存储接收数据的元信息
+        # 临时，在接收完成后转移到 recv_info
+        self.temp_pool: dict[str, dict] = {}  # 临时存储接收中的数据
+        # 发送任务的额外信息
+        self.misson_info: dict[str, dict] = {}  # 存储发送任务的元信息
+
+        # 添加线程锁
+        self.send_lock = RLock()
+        self.recv_lock = RLock()
+        # 发送调度条件变量，有任务时唤醒发送线程
+        self.send_condition = Condition(self.send_lock)
+        # 发送预算条件变量，任务数据发出后唤醒等待预算的调用方
+        self.budget_condition = Condition(self.send_lock)
+
+        # 接收和发送线程
+        self.recv_thread = Thread(target=self._recv_thread)
+        self.send_thread = Thread(target=self._send_thread)
+
+        # 接收线程是否出错
+        self.recv_exception = False
+        # 驱动该管道的 Reactor，为 None 时由自身的收发线程驱动
+        self.reactor = None
+
+        # 帧格式协商状态，握手完成前双方均使用 LSO 格式
+        self.framing = framing
+        self.send_framing = 'lso'
+        self.recv_framing = 'lso'
+        self._hello_replied = False
+        self._handshake_done = framing == 'lso'
+        # 等待对端握手的秒数，超时后按不支持握手的对端处理并沿用 LSO 格式，None 表示一直等待
+        self.handshake_timeout: Optional[float] = 5.0
+        self._handshake_fallback = False
+        # 二进制帧的流编号
+        self._stream_ids = count(1)
+        self._recv_streams: dict[int, str] = {}
+
+        self.final_error_handler: Callable = None
+        self.cancel_handler: Callable[[str], None] = self._cancel_handler
+        self.mission_complete_handler: Callable[[str], None] = self._mission_complete_handler
+        # 设置后，完成的任务直接交给该处理器而不进入 recv_pool
+        self.recv_handler: Optional[Callable[[bytearray, dict], None]] = None
+        # 设置后，在任务头到达时调用；返回 ChunkStream 的任务按块交付而不整体重组
+        self.stream_handler: Optional[Callable[[str, dict, Optional[int]], Optional[ChunkStream]]] = None
+    
+    @classmethod
+    def from_socket(cls, sock:socket.socket, framing:str='lso', nodelay:bool=True, sndbuf:Optional[int]=None, rcvbuf:Optional[int]=None, keepalive:Optional[float]=None) -> 'Pipe':
+        """Create a pipe over a connected TCP or Unix domain stream socket.
+        
+        The socket is wrapped in a SocketTransport: frames are written with
+        sendall (large chunks with their header in one sendmsg, file-backed
+        missions with sendfile), read with recv_into, and the socket options
+        are applied. The transport is kept
+        as `pipe.transport` for its counters (`pipe.transport.stats()`), and
+        the pipe can still be handed to a Reactor.
+        
+        Args:
+            sock: Connected stream socket
+            framing: Requested frame format, 'lso' or 'binary'
+            nodelay: Disable Nagle's algorithm on TCP sockets
+            sndbuf: SO_SNDBUF in bytes, None keeps the system default
+            rcvbuf: SO_RCVBUF in bytes, None keeps the system default
+            keepalive: Idle seconds before TCP keepalive probes, None leaves keepalive off
+            
+        Returns:
+            Pipe: Pipe over the socket (not started)
+        """
+        transport = SocketTransport(sock, nodelay=nodelay, sndbuf=sndbuf, rcvbuf=rcvbuf, keepalive=keepalive)
+        pipe = cls(
+            transport.recv, transport.sendall, framing=framing,
+            recv_into_function=transport.recv_into, recv_buff=65536,
+            send_parts_function=transport.sendmsg_all
+        )
+        pipe.send_file_function = transport.sendfile_all
+        pipe.socket = sock
+        pipe.transport = transport
+        return pipe
+    
+    def _mission_complete_handler(self, extension: str) -> None:
+        """Handle mission completion.
+        
+        Args:
+            extension: The extension identifier of the task that has completed
+        """
+        pass
+
+    def _cancel_handler(self, extension: str) -> None:
+        """Handle mission cancellation.
+        
+        Args:
+            extension: The extension identifier of the task to cancel
+        """
+        pass
+    
+    def _recv_head(self) -> tuple[dict, int]:
+        """Receive a frame header in the currently agreed framing.
+        
+        Binary frames are translated back to the same information dictionary
+        the LSO framing carries in its extension, so callers are framing-agnostic.
+        The payload is left on the wire for `_recv_payload`.
+        
+        Returns:
+            tuple: (information dictionary, payload length)
+        """
+        if self.recv_framing == 'binary':
+            frame_type, flags, stream, length = FRAME_HEAD.unpack(self.reader.read(FRAME_HEAD.size))
+            info = {'type': FRAME_NAMES.get(frame_type, frame_type), 'flags': flags}
+            if frame_type != FRAME_TYPES['mission']:
+                info['extension'] = self._recv_streams.get(stream)
+            return info, length
+        extension_length = unpack('i', self.reader.read(4))[0]
+        info = json.loads(self.reader.read(extension_length))
+        length = unpack('i', self.reader.read(4))[0]
+        return info, length
+    
+    def _recv_payload(self, length:int, target:Optional[memoryview]=None) -> Union[bytearray, memoryview]:
+        """Receive a frame payload.
+        
+        Args:
+            length: Payload length from the frame header
+            target: Optional writable buffer of exactly `length` bytes to receive into
+            
+        Returns:
+            bytearray|memoryview: The payload (the target itself when given)
+        """
+        if target is None:
+            return self.reader.read(length)
+        self.reader.readinto(target)
+        return target
+    
+    def _recv(self) -> tuple[bytearray, dict]:
+        """Receive a complete frame in the currently agreed framing.
+        
+        Returns:
+            tuple: (payload bytes, information dictionary)
+        """
+        info, length = self._recv_head()
+        return self._recv_payload(length), info
+    
+    def _send(self, data:bytes, info:dict) -> None:
+        """Send data and related information.
+        
+        Args:
+            data: Byte data to send
+            info: Metadata related to the data
+        """
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        head = self._frame_head(info, len(data))
+        if self.metrics:
+            self._counters['frames_sent'] += 1
+            self._counters['bytes_sent'] += len(data)
+        if isinstance(data, FileRange):
+            # 文件区间连同帧头交给传输层直接发送
+            self.send_file_function(data.file, data.offset, data.length, head)
+            return
+        if len(data) > 65536:
+            # 大分块不拼接，避免拷贝负载；支持聚集写时与帧头一次写出
+            if self.send_parts_function is not None:
+                self.send_parts_function([head, data])
+                return
+            self.send_function(head)
+            self.send_function(data)
+            return
+        self.send_function(b''.join((head, data)))
+    
+    def _frame_head(self, info:dict, length:int) -> bytes:
+        """Encode a frame header in the currently agreed framing.
+        
+        Args:
+            info: Frame information (type, flags, stream or LSO extension)
+            length: Payload length
+            
+        Returns:
+            bytes: Header to write in front of the payload
+        """
+        if self.send_framing == 'binary' and info['type'] in FRAME_TYPES:
+            return FRAME_HEAD.pack(FRAME_TYPES[info['type']], info.get('flags', 0), info.get('stream', 0), length)
+        # 与 LsoProtocol.full_data 的输出相同，但整帧写出而不按 2048 字节切分
+        extension = json.dumps(info).encode('utf-8')
+        return b''.join((pack('i', len(extension)), extension, pack('i', length)))
+    
+    @property
+    def _offers_hello(self) -> bool:
+        """Whether this side starts the handshake: to agree on framing, compression, inline messages, flow control or resumption."""
+        return (self.framing != 'lso' or self.compression is not None or self.inline_threshold is not None
+                or self.resume_dir is not None or self.recv_window is not None)
+    
+    @property
+    def node_id(self) -> str:
+        """Persistent id of this side's resume_dir, created on first use.
+        
+        The peer stores resume files under this id, so a reconnect from the
+        same directory continues the missions of earlier connections.
+        
+        Raises:
+            ValueError: If resume_dir is not set
+        """
+        if self._node_id is None:
+            if self.resume_dir is None:
+                raise ValueError("node_id requires resume_dir")
+            makedirs(self.resume_dir, exist_ok=True)
+            local = path.join(self.resume_dir, 'node')
+            try:
+                with open(local, 'r', encoding='utf-8') as f:
+                    self._node_id = f.read().strip()
+            except FileNotFoundError:
+                self._node_id = Utils.safe_code(16)
+                with open(local, 'w', encoding='utf-8') as f:
+                    f.write(self._node_id)
+        return self._node_id
+    
+    def _send_hello(self) -> None:
+        """Send the handshake to the peer (always in LSO framing).
+        
+        It offers the framings this side accepts, lists the codecs it can
+        decompress and announces that it accepts single-frame messages, obeys
+        credit and answers pings. With resume_dir set it also carries this side's node id.
+        """
+        offer = [self.framing] if self.framing == 'lso' else list(FRAMINGS)
+        self._hello_replied = True
+        hello = {'version': FRAME_VERSION, 'framing': offer, 'compression': list(CODECS), 'inline': True, 'credit': True, 'heartbeat': True}
+        if self.resume_dir is not None:
+            hello['node'] = self.node_id
+        # 不支持握手的对端把带空 extension 的帧当作未知任务的数据丢弃
+        self._send(json.dumps(hello), {'type': 'hello', 'extension': ''})
+    
+    def _handshake_expired(self) -> None:
+        """Fall back to LSO framing after the peer left the handshake unanswered.
+        
+        Called once `handshake_timeout` passed without the peer's hello. Such a
+        peer predates the handshake, so the pipe keeps the LSO framing and sends
+        no frame types beyond missions, data and cancels.
+        """
+        with self.send_condition:
+            if self._handshake_done:
+                return
+            self._handshake_fallback = True
+            self._handshake_done = True
+            self._notify_sender()
+        logger.warning(f'No handshake from the peer within {self.handshake_timeout}s, keeping LSO framing')
+    
+    def _handle_hello(self, data:dict) -> None:
+        """Handle the peer's framing handshake and switch to the agreed framing.
+        
+        The peer sends nothing after its hello until it has seen ours, so every
+        frame following the hello is already in the agreed framing.
+        
+        Args:
+            data: Hello payload with 'version', 'framing' offer, the
+                'compression' codecs the peer can decompress and whether it
+                accepts 'inline' messages, obeys 'credit' and answers pings
+                ('heartbeat'), and
+                its 'node' id if it keeps resumable missions
+        """
+        peer_offer = data.get('framing', ['lso'])
+        agreed = 'lso'
+        if self.framing == 'binary' and 'binary' in peer_offer and data.get('version') == FRAME_VERSION:
+            agreed = 'binary'
+        if agreed != 'lso' and self._handshake_fallback:
+            # 对端已按本端的握手切换帧格式，而本端此后发出的仍是 LSO 帧，连接无法继续
+            raise NetcorePipeError(f'Peer answered the handshake after {self.handshake_timeout}s, frames were already sent in LSO framing')
+        self.recv_framing = agreed
+        peer_node = data.get('node')
+        if self.resume_dir is None or not isinstance(peer_node, str) or not RESUME_NODE.fullmatch(peer_node):
+            peer_node = None
+        with self.send_condition:
+            if self.framing == 'lso' and not self._hello_replied:
+                # 对端请求协商而本端未发起，回复本端支持的帧格式
+                self._hello_replied = True
+                self.mission_head.put({'type': 'hello'})
+            self.send_framing = agreed
+            self._peer_codecs = set(data.get('compression', ())) & set(CODECS)
+            self._peer_inline = bool(data.get('inline'))
+            self._peer_credit = bool(data.get('credit'))
+            self._peer_heartbeat = bool(data.get('heartbeat'))
+            if peer_node is not None:
+                # 告知对端本端已收到的续传进度，对端据此继续发送
+                self._peer_node = peer_node
+                self.mission_head.put({'type': 'resume', 'offsets': self._resume_offsets()})
+            self._handshake_done = True
+            self._notify_sender()
+        # 对端支持流量控制后才通告接收窗口，旧版本对端无法识别 credit 帧
+        self._queue_credit()
+        if self._peer_heartbeat and self.heartbeat_interval is not None:
+            _heartbeat_timer.add(self)
+        logger.info(f'Pipe framing negotiated: {agreed}, peer codecs: {sorted(self._peer_codecs)}')
+    
+    def create_mission(self, data:bytes, info:dict={}, extension:Optional[str]=None, buff:Optional[int]=None, priority:Optional[str]=None, weight:int=1) -> str:
+        """Create a send mission.
+        
+        The mission keeps a single reference to the data; chunks are sliced off as
+        zero-copy memoryviews when the send thread schedules them, so each chunk
+        will be sent separately without copying the payload up front.
+        
+        Data of at most `inline_threshold` bytes without an explicit lower
+        priority is sent as a single message frame carrying the head as well,
+        once the peer's handshake announced support for it. With resume_dir
+        set, data of at least `resume_threshold` bytes is first written to an
+        LSO file there so the mission can continue after a reconnect.
+        
+        Args:
+            data: Byte data to send
+            info: Metadata related to the data
+            extension: Optional extension identifier, defaults to a random secure code
+            buff: Optional fixed chunk size, defaults to the pipe's chunk_size at send time
+            priority: Priority class name from PRIORITIES; defaults to 'high' for
+                missions up to `small_mission` bytes and 'normal' otherwise
+            weight: Share of the class's bandwidth, in chunks per scheduling visit
+            
+        Returns:
+            str: The mission's extension identifier
+            
+        Raises:
+            ValueError: If the priority is unknown or the weight is not positive
+        """
+        mission = Mission(data, buff)
+        if (self._peer_inline and self.inline_threshold is not None and mission.length <= self.inline_threshold
+                and priority in (None, 'high')):
+            return self._add_message(data, info, extension)
+        resume = None
+        if self.resume_dir is not None and mission.length >= self.resume_threshold:
             extension = extension or Utils.safe_code(6)
-            queue = Queue()
-            for i in Utils.split_bytes_into_chunks(data, buff):
-                queue.put(i)
-            self.send_pool[extension] = queue
+            resume = self._persist_mission(mission, info, extension, priority, weight)
+        return self._add_mission(mission, info, extension, priority, weight, resume)
+    
+    def _add_message(self, data:bytes, info:dict, extension:Optional[str]) -> str:
+        """Queue a small mission to be sent as a single message frame.
+        
+        Messages skip the scheduler: they are sent in creation order ahead of
+        any mission data, within the peer's credit.
+        
+        Args:
+            data: Byte data to send
+            info: Metadata related to the data
+            extension: Optional extension identifier, defaults to a random secure code
+            
+        Returns:
+            str: The message's extension identifier
+        """
+        with self.send_condition:
+            self._wait_budget(len(data))
+            self._queued_bytes += len(data)
+            extension = extension or Utils.safe_code(6)
+            self._inline[extension] = (data, info, perf_counter())
+            self._notify_sender()
+        return extension
+    
+    def create_stream_mission(self, source, info:dict={}, length:Optional[int]=None, extension:Optional[str]=None, buff:Optional[int]=None, priority:Optional[str]=None, weight:int=1) -> str:
+        """Create a send mission whose payload is pulled lazily from a stream.
+        
+        Chunks are read from the source only when the send scheduler gets to the
+        mission, so it is multiplexed with other traffic like any mission and can
+        be canceled with `cancel_mission`. Reads happen on the sending thread.
+        
+        Args:
+            source: Iterable of bytes-like chunks, readable binary file object or LsoProtocol
+            info: Metadata related to the data
+            length: Total payload length if known; detected for regular files and
+                LsoProtocol, otherwise the stream is sent with an unknown length
+            extension: Optional extension identifier, defaults to a random secure code
+            buff: Optional fixed chunk size, defaults to the pipe's chunk_size at send time
+            priority: Priority class name from PRIORITIES, see create_mission
+            weight: Share of the class's bandwidth, in chunks per scheduling visit
+            
+        Returns:
+            str: The mission's extension identifier
+            
+        Raises:
+            ValueError: If the priority is unknown or the weight is not positive
+        """
+        return self._add_mission(StreamMission(source, length, buff), info, extension, priority, weight)
+    
+    def _add_mission(self, mission:Union[Mission, StreamMission], info:dict, extension:Optional[str], priority:Optional[str]=None, weight:int=1, resume:Optional[str]=None, queued:Optional[int]=None) -> str:
+        """Queue a mission head and register the mission with the scheduler.
+        
+        Args:
+            mission: Mission or StreamMission to send
+            info: Metadata related to the data
+            extension: Optional extension identifier, defaults to a random secure code
+            priority: Priority class name, None to classify by length
+            weight: Chunks sent per scheduling visit
+            resume: LSO file persisting a resumable mission
+            queued: Bytes charged to send_budget, defaults to the length of an
+                in-memory mission
+            
+        Returns:
+            str: The mission's extension identifier
+            
+        Raises:
+            ValueError: If the priority is unknown or the weight is not positive
+            TimeoutError: If the send budget stays exhausted for send_timeout seconds
+            NetcorePipeError: If the pipe closes while waiting for the send budget
+        """
+        if priority is None:
+            small = mission.length is not None and mission.length <= self.small_mission
+            priority = 'high' if small else 'normal'
+        if priority not in PRIORITIES:
+            raise ValueError(f"priority must be one of {tuple(PRIORITIES)}")
+        if weight < 1:
+            raise ValueError("weight must be a positive integer")
+        # 被采样的任务记录各阶段耗时
+        trace = info.get('trace') if self.tracer is not None else None
+        trace = trace.get('id') if isinstance(trace, dict) else None
+        # 只有内存中的任务占用发送预算，流式任务按需读取
+        if queued is None:
+            queued = mission.length if isinstance(mission, Mission) else 0
+        with self.send_condition:  # 添加锁保护
+            self._wait_budget(queued)
+            self._queued_bytes += queued
+            extension = extension or Utils.safe_code(6)
+            stream = next(self._stream_ids)
+            self.send_pool[extension] = mission
             self.misson_info[extension] = {
-                'length': len(data)
+                'length': mission.length,
+                'stream': stream,
+                'priority': priority,
+                'weight': weight,
+                # 赤字轮询的剩余额度，可为负表示上次超发
+                'deficit': 0,
+                'created': perf_counter(),
+                # 对端通告的单任务上限，None 表示不限
+                'limit': None,
+                # 尚未从发送预算中扣除的数据
+                'queued': queued,
+                # 压缩算法，任务头发送时决定；已切分待发送的压缩分块
+                'codec': None,
+                'ready': deque(),
+                'probed': False,
+                # 任务头是否已发出
+                'announced': False,
+                # 可续传任务的持久化文件
+                'resume': resume,
+                # 追踪编号，None 表示未被采样
+                'trace': trace,
+            }
+            self._active[PRIORITIES[priority]].append(extension)
+            # 保存任务到待发送队列，任务头必须先于数据入队
+            self.mission_head.put({
+                'extension': extension,
+                'length': mission.length,
+                'info': info,
+                'stream': stream,
+            })
+            self._notify_sender()
+        return extension
+    
+    def _has_pending(self) -> bool:
+        """Check whether the send thread has anything to do.
+        
+        Must be called with send_lock held.
+        
+        Missions waiting for credit from the peer do not count.
+        
+        Returns:
+            bool: True if a control frame is queued or mission data may be sent
+        """
+        if not self.mission_head.empty():
+            return True
+        if self._inline:
+            room = self._send_room()
+            if room is None or room >= len(next(iter(self._inline.values()))[0]):
+                return True
+        if not self.send_pool:
+            return False
+        if self._send_room() == 0 and not self._prefetched:
+            return False
+        return len(self._blocked) < len(self.send_pool)
+    
+    def _send_room(self) -> Optional[int]:
+        """Return the data bytes the peer's credit still allows, None if unlimited."""
+        if self._peer_limit is None:
+            return None
+        return max(self._peer_limit - self._sent_bytes, 0)
+    
+    def _wait_budget(self, length:int) -> None:
+        """Wait until `length` more bytes fit into send_budget.
+        
+        A mission larger than the whole budget is admitted once nothing else
+        is queued. Must be called with send_lock held.
+        
+        Args:
+            length: In-memory bytes the new mission adds
+            
+        Raises:
+            TimeoutError: If the budget stays exhausted for send_timeout seconds
+            NetcorePipeError: If the pipe closes while waiting
+        """
+        if self.send_budget is None or not length:
+            return
+        timeout = self._budget_timeout()
+        deadline = None if timeout is None else perf_counter() + timeout
+        while self._queued_bytes and self._queued_bytes + length > self.send_budget:
+            if self._send_closed:
+                raise NetcorePipeError('Pipe closed while waiting for send budget')
+            remaining = None if deadline is None else deadline - perf_counter()
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError(f'send budget of {self.send_budget} bytes exhausted')
+            self.budget_condition.wait(remaining)
+    
+    def _budget_timeout(self) -> Optional[float]:
+        """Seconds `_wait_budget` may wait, None to wait indefinitely."""
+        return self.send_timeout
+    
+    def _release_budget(self, info:dict, length:int) -> None:
+        """Return sent or dropped mission bytes to the send budget.
+        
+        Must be called with send_lock held.
+        """
+        length = min(length, info['queued'])
+        if length:
+            info['queued'] -= length
+            self._queued_bytes -= length
+            self.budget_condition.notify_all()
+    
+    def _notify_sender(self) -> None:
+        """Wake the send loop; must be called with send_lock held."""
+        self.send_condition.notify_all()
+        if self.reactor is not None:
+            self.reactor.wake(self)
+    
+    def _wake_sender(self) -> None:
+        """Wake the send thread so it re-checks its queues and state."""
+        with self.send_condition:
+            self._notify_sender()
+    
+    def _send_mission_heads(self) -> None:
+        """Send all queued mission heads, cancel and credit messages."""
+        while not self.mission_head.empty():
+            mission = self.mission_head.get()
+            # 处理不同类型的任务头
+            if mission.get('type') == 'hello':
+                self._send_hello()
+            elif mission.get('type') == 'credit':
+                # 内容在发送时计算，总是通告最新的接收窗口
+                credit = self._credit_payload()
+                if credit is not None:
+                    self._send(json.dumps(credit), {'type': 'credit'})
+            elif mission.get('type') == 'ping':
+                # 记录实际写出的时间，不计入本端排队时间
+                with self.send_lock:
+                    heartbeat = self._heartbeat
+                    heartbeat['seq'] += 1
+                    heartbeat['sent'][heartbeat['seq']] = perf_counter()
+                    heartbeat['pings'] += 1
+                    seq = heartbeat['seq']
+                self._send(json.dumps({'seq': seq}), {'type': 'ping'})
+            elif mission.get('type') == 'pong':
+                self._send(json.dumps({'seq': mission['seq']}), {'type': 'pong'})
+            elif mission.get('type') == 'resume':
+                self._send(json.dumps({key: value for key, value in mission.items() if key != 'type'}), {'type': 'resume'})
+            elif mission.get('type') == 'cancel':
+                # 发送取消消息
+                self._send(json.dumps({"extension": mission['extension']}), {
+                    "type": "cancel",
+                    "extension": mission['extension'],
+                    "stream": mission.get('stream', 0),
+                })
+            else:
+                # 发送正常任务头，压缩算法在此时按握手结果决定
+                codec = self._mission_codec(mission['length'])
+                with self.send_lock:
+                    info = self.misson_info.get(mission['extension'])
+                    if info is not None:
+                        # 任务数据只能在任务头之后发送
+                        info['announced'] = True
+                        if codec is not None:
+                            info['codec'] = codec
+                            mission['codec'] = codec
+                        if info['resume'] is not None:
+                            info['resume'] = self._bind_resumable(mission['extension'], info['resume'])
+                            if info['resume'] is not None:
+                                mission['resumable'] = True
+                                offset = self.send_pool[mission['extension']].offset
+                                if offset:
+                                    mission['offset'] = offset
+                self._send(json.dumps(mission), {
+                    'type': 'mission'
+                })
+                if info is not None and info['trace'] is not None and self.tracer is not None:
+                    info['announced_at'] = perf_counter()
+                    self.tracer.span(info['trace'], 'send.queue', info['created'], info['announced_at'], extension=mission['extension'])
+            self.mission_head.task_done()
+    
+    def _send_messages(self) -> None:
+        """Send queued single-frame messages while the peer's credit allows.
+        
+        Consecutive messages are coalesced into one write of up to 64 KiB.
+        """
+        while True:
+            batch = []
+            size = 0
+            with self.send_lock:
+                room = self._send_room()
+                while self._inline and size < 65536:
+                    extension = next(iter(self._inline))
+                    data = self._inline[extension][0]
+                    if room is not None and room < size + len(data):
+                        # 对端接收窗口不足，等待 credit
+                        break
+                    batch.append((extension, *self._inline.popitem(last=False)[1]))
+                    size += len(data)
+                if not batch:
+                    return
+                self._sent_bytes += size
+                if size:
+                    self._queued_bytes -= size
+                    self.budget_condition.notify_all()
+            parts = []
+            payload = 0
+            for extension, data, info, _ in batch:
+                head = json.dumps({'extension': extension, 'info': info}).encode('utf-8')
+                length = MESSAGE_HEAD.size + len(head) + len(data)
+                payload += length
+                parts += (self._frame_head({'type': 'message'}, length), MESSAGE_HEAD.pack(len(head)), head, data)
+            self.send_function(b''.join(parts))
+            if self.metrics:
+                self._counters['frames_sent'] += len(batch)
+                self._counters['bytes_sent'] += payload
+                self._counters['missions_sent'] += len(batch)
+            if self.tracer is not None:
+                for extension, data, info, created in batch:
+                    trace = info.get('trace')
+                    if isinstance(trace, dict):
+                        self.tracer.span(trace['id'], 'send.queue', created, extension=extension, bytes=len(data))
+            with self.send_lock:
+                for extension, data, _, created in batch:
+                    self._record_latency('high', len(data), created)
+            for extension, *_ in batch:
+                self.mission_complete_handler(extension)
+    
+    def _mission_codec(self, length:Optional[int]) -> Optional[str]:
+        """Choose the codec of a mission about to be announced, None to send it raw."""
+        if self.compression is None or self.compression not in self._peer_codecs:
+            return None
+        if length is not None and length < self.compress_threshold:
+            return None
+        return self.compression
+    
+    def _next_frame(self, mission:Union[Mission, StreamMission], info:dict, size:int, room:Optional[int]) -> Optional[tuple]:
+        """Produce the next data frame payload of a mission.
+        
+        Compressed missions are sliced ahead: with at least `compress_parallel`
+        chunks of data, up to that many upcoming chunks are compressed
+        concurrently in the shared thread pool while earlier ones are sent.
+        Sliced chunks count against the peer's credit right away, so frames
+        already compressed can always be sent. If the first chunk does not
+        compress, the rest of the mission is sent raw.
+        
+        Args:
+            mission: Mission to read from
+            info: The mission's scheduler info
+            size: Raw chunk size
+            room: Raw bytes the peer's credit still allows, None if unlimited
+            
+        Returns:
+            tuple|None: (payload, frame flags, raw bytes sliced from the
+            mission), None if nothing may be sent
+        """
+        codec = info['codec']
+        ready = info['ready']
+        if codec is None and not ready:
+            if room is not None and room <= 0:
+                return None
+            if self._sends_file(mission, info):
+                chunk = mission.next_range(size if room is None else min(size, room))
+                return chunk, 0, len(chunk)
+            chunk = mission.next_chunk(size if room is None else min(size, room))
+            flags = FRAME_FLAGS['end'] if mission.length is None and mission.done else 0
+            return chunk, flags, len(chunk)
+        sliced = 0
+        if codec is not None:
+            parallel = mission.length is None or mission.length >= size * self.compress_parallel
+            depth = self.compress_parallel if parallel else 1
+            # 预先切分后续分块，交给线程池压缩
+            while len(ready) < depth and not mission.done:
+                if room is not None and room - sliced <= 0:
+                    break
+                chunk = mission.next_chunk(size if room is None else min(size, room - sliced))
+                end = FRAME_FLAGS['end'] if mission.length is None and mission.done else 0
+                if parallel:
+                    result = _get_compress_pool().submit(_compress_chunk, codec, chunk)
+                else:
+                    result = _compress_chunk(codec, chunk)
+                ready.append((len(chunk), end, result))
+                sliced += len(chunk)
+        if not ready:
+            return None
+        raw, end, result = ready.popleft()
+        with self.send_lock:
+            self._prefetched += sliced - raw
+        payload, flags = result if isinstance(result, tuple) else result.result()
+        if not info['probed']:
+            info['probed'] = True
+            if not flags and raw:
+                # 首个分块无法压缩，剩余数据按原样发送
+                info['codec'] = None
+        return payload, flags | end, sliced
+    
+    def _sends_file(self, mission:Union[Mission, StreamMission], info:dict) -> bool:
+        """Whether the mission's next chunks go out as file ranges."""
+        return (self.send_file_function is not None and isinstance(mission, StreamMission)
+                and mission.file is not None and info['codec'] is None and not info['ready'])
+    
+    def _next_mission(self) -> Optional[tuple[str, Union[Mission, StreamMission], dict]]:
+        """Pick the next mission of the most urgent class that may send.
+        
+        Normally this is the mission at the front of its class; missions waiting
+        for credit from the peer are passed over. Canceled missions left at the
+        front of the class queues are dropped on the way. Must be called with
+        send_lock held.
+        
+        Returns:
+            tuple|None: (extension, mission, mission info), None if nothing may send
+        """
+        for queue in self._active:
+            while queue and queue[0] not in self.misson_info:
+                # 任务已被取消
+                queue.popleft()
+            for extension in queue:
+                if extension in self._blocked:
+                    continue
+                info = self.misson_info.get(extension)
+                if info is not None and info['announced']:
+                    return extension, self.send_pool[extension], info
+        return None
+    
+    def _requeue(self, extension:str, info:dict) -> None:
+        """Move a served mission to the back of its class; must hold send_lock."""
+        queue = self._active[PRIORITIES[info['priority']]]
+        if queue and queue[0] == extension:
+            queue.rotate(-1)
+            return
+        try:
+            queue.remove(extension)
+        except ValueError:
+            return
+        queue.append(extension)
+    
+    def _complete_mission(self, extension:str, mission:Union[Mission, StreamMission], info:dict) -> None:
+        """Retire a fully sent mission and record its queueing latency.
+        
+        Must be called with send_lock held.
+        """
+        if self.send_pool.get(extension) is not mission:
+            return
+        logger.info(f'{extension} mission completed. size: {mission.offset}')
+        if isinstance(mission, StreamMission):
+            # 按区间发送的文件任务在最后一帧写出后才关闭
+            mission.close()
+        self.send_pool.pop(extension, None)
+        self.misson_info.pop(extension, None)
+        self._blocked.discard(extension)
+        queue = self._active[PRIORITIES[info['priority']]]
+        if queue and queue[0] == extension:
+            queue.popleft()
+        self._record_latency(info['priority'], mission.offset, info['created'])
+        if self.metrics:
+            self._counters['missions_sent'] += 1
+        if info['trace'] is not None and self.tracer is not None:
+            self.tracer.span(info['trace'], 'send.transfer', info.get('announced_at', info['created']), extension=extension, bytes=mission.offset)
+        if info['resume'] is not None:
+            # 持久化文件保留到对端确认收齐
+            self._resume_unacked[extension] = info['resume']
+        self.mission_complete_handler(extension)
+    
+    def _record_latency(self, priority:str, size:int, created:float) -> None:
+        """Add a fully sent mission to its class's statistics; must hold send_lock."""
+        latency = perf_counter() - created
+        stats = self._class_stats[priority]
+        stats['missions'] += 1
+        stats['bytes'] += size
+        stats['latency_total'] += latency
+        stats['latency_max'] = max(stats['latency_max'], latency)
+    
+    def _send_round(self) -> None:
+        """Run one scheduling round.
+        
+        Flushes queued control frames (mission heads, cancel and credit
+        messages) and single-frame messages, then serves a single mission: the next one of the most
+        urgent non-empty priority class. Classes are served in strict priority
+        order; within a class the mission receives `weight` chunks worth of
+        deficit and sends while it has any left (deficit round-robin), then
+        moves to the back of its class. Keeping rounds this short lets control
+        frames and small high priority missions overtake bulk data after at
+        most one visit. Data is never sent beyond the credit granted by the
+        peer, for the pipe as a whole and for the mission.
+        """
+        # 发送控制帧（任务头、取消和 credit 消息），控制帧总是先于任务数据
+        self._send_mission_heads()
+        self._send_messages()
+        
+        with self.send_lock:  # 添加锁保护
+            room = self._send_room()
+            if room == 0 and not self._prefetched:
+                # 对端接收窗口已满，等待 credit
+                return
+            picked = self._next_mission()
+            if picked is None:
+                return
+            extension, mission, info = picked
+            if mission.done and not info['ready']:
+                self._complete_mission(extension, mission, info)
+                return
+            if info['limit'] is not None:
+                mission_room = max(info['limit'] - mission.offset, 0)
+                room = mission_room if room is None else min(room, mission_room)
+            size = mission.buff or self.chunk_size
+            if self._sends_file(mission, info):
+                # 文件区间以大块发送，配额随之放大，其他任务在帧之间穿插
+                size = max(size, self.sendfile_chunk)
+            info['deficit'] += info['weight'] * size
+        
+        sent = 0
+        error = None
+        while info['deficit'] > 0 and not (mission.done and not info['ready']) and self.misson_info.get(extension) is info:
+            # 分块大小在发送时决定，流式任务在此时才读取数据
+            try:
+                result = self._next_frame(mission, info, size, room)
+                if result is None:
+                    break
+                data, flags, sliced = result
+            except Exception as e:
+                error = e
+                break
+            sent += sliced
+            if room is not None:
+                room -= sliced
+            info['deficit'] -= max(len(data), 1)
+            frame = {
+                'type': 'data',
+                'extension': extension,
+                'stream': info['stream'],
             }
-        # 保存任务到待发送队列
-        self.mission_head.put({
-            'extension': extension,
-            'length': len(data),
-            'info': info,
-        })
-        return extension
+            if flags:
+                frame['flags'] = flags
+            self._send(data, frame)
+        
+        with self.send_lock:
+            self._sent_bytes += sent
+            registered = self.misson_info.get(extension) is info
+            if registered:
+                self._release_budget(info, sent)
+            if self.adaptive_chunks:
+                self._track_rate(sent)
+            if error is not None:
+                logger.error(f'{extension} mission source error: {error}')
+                self.cancel_mission(extension)
+                return
+            if not registered:
+                return
+            if mission.done and not info['ready']:
+                info['deficit'] = 0
+                self._complete_mission(extension, mission, info)
+                return
+            if info['limit'] is not None and mission.offset >= info['limit'] and not info['ready']:
+                # 单任务额度用完，等待对端的 credit
+                info['deficit'] = 0
+                self._blocked.add(extension)
+            # 额度用完，移到本类别队尾
+            self._requeue(extension, info)
+    
+    def _run_send_round(self) -> None:
+        """Run a scheduling round, adding its duration to the send busy time."""
+        if not self.metrics:
+            self._send_round()
+            return
+        started = perf_counter()
+        try:
+            self._send_round()
+        finally:
+            self._counters['send_busy'] += perf_counter() - started
+    
+    def _track_rate(self, sent:int) -> None:
+        """Measure the send rate and retune chunk_size from it.
+        
+        Only time spent while data was backlogged is counted, so the rate
+        reflects what the transport drains rather than how often the
+        application sends. Every 100 ms of such time the rate is folded into
+        a moving average and chunk_size is set to the amount the link sends
+        in `chunk_latency`, rounded down to a power of two and clamped to
+        `chunk_bounds`. Must be called with send_lock held.
+        
+        Args:
+            sent: Payload bytes sent in the round that just finished
+        """
+        now = perf_counter()
+        window = self._rate_window
+        if window['last'] is not None:
+            window['bytes'] += sent
+            window['time'] += now - window['last']
+        window['last'] = now if self._has_pending() else None
+        if window['time'] < 0.1:
+            return
+        sample = window['bytes'] / window['time']
+        window['bytes'], window['time'] = 0, 0.0
+        self.send_rate = sample if self.send_rate is None else 0.7 * self.send_rate + 0.3 * sample
+        low, high = self.chunk_bounds
+        target = max(low, min(high, int(self.send_rate * self.chunk_latency)))
+        size = 1 << (target.bit_length() - 1)
+        size = max(size, low)
+        if size != self.chunk_size:
+            logger.debug(f'chunk size {self.chunk_size} -> {size} at {Utils.bytes_format(int(self.send_rate))}/s')
+            self.chunk_size = size
     
     def _send_thread(self):
         """Main function of the send thread.
         
-        Continuously monitors the task queue and sends data, handling task headers and task data.
+        Blocks on send_condition until a mission head, cancel message or mission
+        data is queued, then runs a scheduling round.
         """
         try:
+            if self._offers_hello:
+                # 发起帧格式与压缩协商，二进制帧在收到对端握手前不发送其他帧
+                self._send_hello()
+                timeout = self.handshake_timeout
+                deadline = None if timeout is None else perf_counter() + timeout
+                with self.send_condition:
+                    while not self.recv_exception and not self._handshake_done:
+                        remaining = None if deadline is None else deadline - perf_counter()
+                        if remaining is not None and remaining <= 0:
+                            break
+                        self.send_condition.wait(remaining)
+                if not self._handshake_done and not self.recv_exception:
+                    self._handshake_expired()
             while True:
-                # 接收线程错误时，停止发送线程
-                if self.recv_exception:
-                    self.recv_exception = False
-                    self._send_error_handler('with_exception')
-                    break
-                
-                with self.send_lock:  # 添加锁保护
-                    send_pool_copy = list(self.send_pool.items())
-                
-                for extension, queue in send_pool_copy:
-                    # 发送任务头
-                    while not self.mission_head.empty():
-                        mission = self.mission_head.get()
-                        # 处理不同类型的任务头
-                        if mission.get('type') == 'cancel':
-                            # 发送取消消息
-                            self._send(json.dumps({"extension": mission['extension']}), {
-                                "type": "cancel",
-                                "extension": mission['extension']
-                            })
-                        else:
-                            # 发送正常任务头
-                            self._send(json.dumps(mission), {
-                                'type': 'mission'
-                            })
-                        self.mission_head.task_done()
-                    
-                    with self.send_lock:  # 添加锁保护
-                        info = self.misson_info[extension]
+                with self.send_condition:  # 添加锁保护
+                    # 没有待发送内容时阻塞等待，避免空转占用CPU
+                    while not self.recv_exception and not self._has_pending():
+                        self.send_condition.wait()
                     
-                    # 发送任务数据
-                    if queue.empty():
-                        with self.send_lock:  # 添加锁保护
-                            logger.info(f'{extension} mission completed. size: {info["length"]}')
-                            self.send_pool.pop(extension)
-                            self.misson_info.pop(extension)
-                            self.mission_complete_handler(extension)
-                        continue
-                    
-                    data = queue.get()
-                    self._send(data, {
-                        'type': 'data',
-                        'extension': extension,
-                    })
-                    queue.task_done()
+                    # 接收线程错误时，停止发送线程
+                    if self.recv_exception:
+                        self.recv_exception = False
+                        self._send_error_handler('with_exception')
+                        break
+                
+                self._run_send_round()
         except KeyboardInterrupt:
             self._send_error_handler('close')
         except Exception as e:
             self._send_error_handler('error', e)
     
+    def _recv_frame(self) -> None:
+        """Receive one frame and apply it.
+        
+        Handles task headers and task data, assembles complete messages.
+        """
+        info, length = self._recv_head()
+        # 收到任何帧都说明对端存活
+        self._heartbeat['last_recv'] = perf_counter()
+        if self.metrics:
+            self._counters['frames_received'] += 1
+            self._counters['bytes_received'] += length
+        
+        # Handle task data, read straight into the preallocated buffer
+        if info['type'] == 'data':
+            self._recv_data(info['extension'], length, info.get('flags', 0))
+            return
+        
+        payload = self._recv_payload(length)
+        
+        # Handle framing handshake
+        if info['type'] == 'hello':
+            self._handle_hello(json.loads(payload))
+            return
+        
+        # Handle flow control credit from the peer
+        if info['type'] == 'credit':
+            self._handle_credit(json.loads(payload))
+            return
+        
+        # Handle heartbeat
+        if info['type'] == 'ping':
+            with self.send_condition:
+                self.mission_head.put({'type': 'pong', 'seq': json.loads(payload)['seq']})
+                self._notify_sender()
+            return
+        if info['type'] == 'pong':
+            self._handle_pong(json.loads(payload)['seq'])
+            return
+        
+        # Handle resumption progress and acknowledgements
+        if info['type'] == 'resume':
+            self._handle_resume(json.loads(payload))
+            return
+        
+        # Handle single-frame message
+        if info['type'] == 'message':
+            self._recv_message(payload)
+            return
+        
+        # Handle mission task header
+        if info['type'] == 'mission':
+            data = json.loads(payload)
+            if self._open_stream(data):
+                return
+            resume, start, buffer = None, 0, None
+            if data.get('resumable') and data['length'] and self._peer_node is not None:
+                # 可续传任务追加写入 LSO 文件，文件长度即已收到的进度
+                resume, start = self._open_resumable(data)
+            if resume is None and data['length'] != 0:
+                # 接收任务头，按声明的长度预分配重组缓冲区
+                buffer = self._allocate(data)
+            with self.recv_lock:
+                self.recv_info[data['extension']] = data['info']
+                if data['length'] == 0:
+                    self.recv_pool[data['extension']] = bytearray()
+                else:
+                    self.temp_pool[data['extension']] = {
+                        'length': data['length'],
+                        'recv': start,
+                        'data': buffer,
+                        'reserved': len(buffer) if isinstance(buffer, bytearray) else 0,
+                        'stream': data.get('stream'),
+                        'codec': data.get('codec'),
+                        'resumable': bool(data.get('resumable')),
+                        'file': resume,
+                        'started': perf_counter(),
+                    }
+                    if data.get('stream') is not None:
+                        self._recv_streams[data['stream']] = data['extension']
+            if data['length'] == 0:
+                if self.metrics:
+                    self._counters['missions_received'] += 1
+                self._mission_received(data['extension'])
+            return
+        
+        # Handle cancellation message
+        if info['type'] == 'cancel':
+            extension = info.get('extension')
+            with self.recv_lock:
+                # Remove from temp pool if task is in progress
+                if extension in self.temp_pool:
+                    entry = self.temp_pool.pop(extension)
+                    self._recv_streams.pop(entry['stream'], None)
+                    self._unreserve(entry.get('reserved', 0))
+                    if entry.get('sink') is not None:
+                        entry['sink'].abort(ConnectionAbortedError(f'mission {extension} canceled by peer'))
+                    if entry.get('file') is not None:
+                        entry['file'].close()
+                        _release_resume_file(entry['file'].name)
+                    logger.info(f"Canceled ongoing reception of task {extension}")
+                
+                # Remove from recv pool if task was completed
+                if extension in self.recv_pool:
+                    self.recv_pool.pop(extension, None)
+                    self.recv_info.pop(extension, None)
+                    logger.info(f"Removed completed task {extension} due to cancellation")
+            self._forget_stream(extension)
+            self.release(extension)
+            self.cancel_handler(extension)
+            return
+    
+    def _recv_message(self, payload:bytearray) -> None:
+        """Deliver a single-frame message without reassembly bookkeeping.
+        
+        Args:
+            payload: Frame payload: head length, JSON head, then the data
+        """
+        size = MESSAGE_HEAD.unpack_from(payload)[0]
+        head = json.loads(payload[MESSAGE_HEAD.size:MESSAGE_HEAD.size + size])
+        # 原地去掉消息头，剩余部分即为数据
+        del payload[:MESSAGE_HEAD.size + size]
+        extension = head['extension']
+        self._count_received(len(payload))
+        if self.metrics:
+            self._counters['missions_received'] += 1
+        if self.tracer is not None and isinstance(head['info'].get('trace'), dict):
+            head['info']['trace']['received'] = perf_counter()
+        if self.stream_handler is not None:
+            sink = self.stream_handler(extension, dict(head['info'], extension=extension), len(payload))
+            if sink is not None:
+                if payload:
+                    sink.put(payload)
+                sink.finish()
+                return
+        with self.recv_lock:
+            self.recv_info[extension] = head['info']
+            self.recv_pool[extension] = payload
+        # 与完整任务相同，交付并释放前占用接收窗口
+        self._hold(extension, len(payload))
+        self._mission_received(extension)
+    
+    def _open_stream(self, data:dict) -> bool:
+        """Offer a mission head to stream_handler.
+        
+        If the handler returns a ChunkStream, the mission's chunks are put into
+        it as they arrive instead of being reassembled.
+        
+        Args:
+            data: Decoded mission head
+            
+        Returns:
+            bool: True if the mission is delivered as a stream
+        """
+        if self.stream_handler is None:
+            return False
+        extension = data['extension']
+        sink = self.stream_handler(extension, dict(data['info'], extension=extension), data['length'])
+        if sink is None:
+            return False
+        if data['length'] == 0:
+            sink.finish()
+            return True
+        if self.recv_window is not None:
+            # 流式任务单独限额，消费者跟不上时只暂停该任务而不阻塞整个管道
+            sink.on_read = partial(self._stream_read, extension)
+            with self._flow_lock:
+                self._flow['missions'][extension] = {'recv': 0, 'window': sink.max_buffer, 'granted': 0}
+            self._queue_credit()
+        with self.recv_lock:
+            self.temp_pool[extension] = {
+                'length': data['length'],
+                'recv': 0,
+                'data': None,
+                'stream': data.get('stream'),
+                'sink': sink,
+                'codec': data.get('codec'),
+                'resumable': bool(data.get('resumable')),
+                'started': perf_counter(),
+            }
+            if data.get('stream') is not None:
+                self._recv_streams[data['stream']] = extension
+        return True
+    
+    def _allocate(self, data:dict, spill:bool=False) -> Union[bytearray, memoryview]:
+        """Allocate the reassembly buffer of an inbound mission.
+        
+        Missions announced above spill_threshold, or that would take the
+        in-memory receive data past recv_budget, are received into a temporary
+        LSO file instead of memory: the buffer is a writable memoryview over the
+        file's meta, mapped with mmap, and the file path is added to the
+        mission info as 'local'. The file is deleted once the buffer is no
+        longer referenced; link or copy it to keep it.
+        
+        Args:
+            data: Decoded mission head, its info is updated in place
+            spill: Receive into a temporary file whatever the length
+            
+        Returns:
+            bytearray|memoryview: Buffer of the announced length, empty for an unknown length
+        """
+        length = data['length']
+        if length is None:
+            # 长度未知的流式任务从空缓冲区开始追加
+            return bytearray()
+        if not spill and (self.spill_threshold is None or length <= self.spill_threshold) and self._reserve(length):
+            return bytearray(length)
+        extension = json.dumps(dict(data['info'], extension=data['extension'])).encode('utf-8')
+        # 元数据长度超出 int32 时记为 -1，以文件大小为准
+        head = pack('i', len(extension)) + extension + pack('i', length if length < 2 ** 31 else -1)
+        fd, local = tempfile.mkstemp(prefix='netcore-', suffix='.lso', dir=self.spill_dir)
+        with fdopen(fd, 'r+b') as f:
+            f.write(head)
+            f.truncate(len(head) + length)
+            mm = mmap(f.fileno(), 0, access=ACCESS_WRITE)
+        weakref.finalize(mm, remove, local)
+        data['info']['local'] = local
+        logger.info(f"{data['extension']} spilled to {local}. size: {length}")
+        return memoryview(mm)[len(head):]
+    
+    def _reserve(self, length:int) -> bool:
+        """Reserve in-memory receive space for a reassembly buffer.
+        
+        Args:
+            length: Bytes to reserve
+            
+        Returns:
+            bool: False if the reservation would exceed recv_budget
+        """
+        with self._flow_lock:
+            flow = self._flow
+            if self.recv_budget is not None and flow['reserved'] + flow['held_total'] + length > self.recv_budget:
+                return False
+            flow['reserved'] += length
+            return True
+    
+    def _unreserve(self, length:int) -> None:
+        """Return space reserved by `_reserve` once its mission completed or was canceled."""
+        if length:
+            with self._flow_lock:
+                self._flow['reserved'] -= length
+    
+    def _reserve_unknown(self, extension:str, entry:dict, length:int) -> None:
+        """Reserve space for data appended to an in-memory mission of unknown length.
+        
+        Raises:
+            ValueError: If the mission would take the in-memory data past recv_budget
+        """
+        if not self._reserve(length):
+            raise ValueError(f'{extension} of unknown length exceeds recv_budget {self.recv_budget}, use a stream_handler.')
+        entry['reserved'] += length
+    
+    def _resume_path(self, kind:str, extension:str, peer:Optional[str]=None) -> Optional[str]:
+        """Return the resume file of a mission, None if its extension cannot name a file.
+        
+        Args:
+            kind: 'out' for missions sent, 'in' for missions received
+            extension: Mission extension identifier
+            peer: Peer node id, None for a file not yet bound to a peer
+        """
+        if not RESUME_NAME.fullmatch(extension):
+            return None
+        name = f'{kind}-{extension}.lso' if peer is None else f'{kind}-{peer}-{extension}.lso'
+        return path.join(self.resume_dir, name)
+    
+    def _resume_files(self, kind:str) -> Iterator[tuple[str, str]]:
+        """Yield (extension, path) of the unclaimed resume files kept for the peer."""
+        prefix = f'{kind}-{self._peer_node}-'
+        try:
+            names = listdir(self.resume_dir)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name.startswith(prefix) and name.endswith('.lso'):
+                yield name[len(prefix):-4], path.join(self.resume_dir, name)
+    
+    def _persist_mission(self, mission:Mission, info:dict, extension:str, priority:Optional[str], weight:int) -> Optional[str]:
+        """Write an outbound mission to an LSO file in resume_dir.
+        
+        The file is bound to the peer's node id once the mission head is sent,
+        so it can be reloaded when the same peer connects again.
+        
+        Returns:
+            Optional[str]: The file path, None if the extension cannot name a file
+        """
+        local = self._resume_path('out', extension)
+        if local is None or not _claim_resume_file(local):
+            return None
+        makedirs(self.resume_dir, exist_ok=True)
+        head = _resume_head({'extension': extension, 'info': info, 'priority': priority, 'weight': weight}, mission.length)
+        with open(local, 'wb') as f:
+            f.write(head)
+            f.write(mission.view)
+        return local
+    
+    def _bind_resumable(self, extension:str, local:str) -> Optional[str]:
+        """Bind a persisted mission to the peer as its head is sent; must hold send_lock.
+        
+        Returns:
+            Optional[str]: The bound file path, None if the peer cannot resume
+        """
+        if self._peer_node is None:
+            # 对端不支持续传，持久化文件没有用处
+            _release_resume_file(local)
+            return None
+        bound = self._resume_path('out', extension, self._peer_node)
+        if bound == local:
+            return local
+        _release_resume_file(local, delete=False)
+        if not _claim_resume_file(bound):
+            remove(local)
+            return None
+        rename(local, bound)
+        return bound
+    
+    def _resume_offsets(self) -> dict[str, int]:
+        """Return the bytes received so far of every partial mission from the peer."""
+        offsets = {}
+        for extension, local in self._resume_files('in'):
+            with _resume_lock:
+                if local in _resume_claims:
+                    continue
+            with open(local, 'rb') as f:
+                _, head = _read_resume_head(f)
+                offsets[extension] = fstat(f.fileno()).st_size - head
+        return offsets
+    
+    def _handle_resume(self, data:dict) -> None:
+        """Apply a resume frame: the peer's progress, dropped or completed missions.
+        
+        Args:
+            data: Resume payload with 'offsets' (extension -> bytes received),
+                'drop' (partial missions the peer no longer has) or 'done'
+                (a resumable mission the peer received completely)
+        """
+        if self.resume_dir is None or self._peer_node is None:
+            return
+        if 'offsets' in data:
+            dropped = self._restore_missions(data['offsets'])
+            if dropped:
+                with self.send_condition:
+                    self.mission_head.put({'type': 'resume', 'drop': dropped})
+                    self._notify_sender()
+        for extension in data.get('drop', ()):
+            local = self._resume_path('in', extension, self._peer_node)
+            if local is not None and _claim_resume_file(local):
+                logger.info(f'{extension} partial mission dropped by peer')
+                _release_resume_file(local)
+        if 'done' in data:
+            with self.send_lock:
+                local = self._resume_unacked.pop(data['done'], None)
+            if local is not None:
+                _release_resume_file(local)
+    
+    def _restore_missions(self, offsets:dict[str, int]) -> list[str]:
+        """Queue the unfinished missions kept for the peer from earlier connections.
+        
+        Each mission continues from the offset the peer reports, the file is
+        mapped with mmap so it does not count against send_budget.
+        
+        Args:
+            offsets: Bytes the peer already received, by mission extension
+            
+        Returns:
+            list[str]: Extensions the peer reported but this side has no file for
+        """
+        restored = set()
+        for extension, local in self._resume_files('out'):
+            if not _claim_resume_file(local):
+                continue
+            with open(local, 'r+b') as f:
+                meta, head = _read_resume_head(f)
+                mm = mmap(f.fileno(), 0, access=ACCESS_WRITE)
+            mission = Mission(memoryview(mm)[head:])
+            offset = offsets.get(extension, 0)
+            # 对端已收齐却未确认的任务重新发送，保证至少交付一次
+            mission.offset = offset if 0 <= offset < mission.length else 0
+            restored.add(extension)
+            logger.info(f'{extension} mission resumed at {mission.offset} of {mission.length}')
+            self._add_mission(mission, meta['info'], extension, meta['priority'], meta['weight'], local, queued=0)
+        return [
+            extension for extension in offsets
+            if extension not in restored and extension not in self.misson_info
+            and not path.exists(self._resume_path('out', extension, self._peer_node) or '')
+        ]
+    
+    def _open_resumable(self, data:dict) -> tuple[Optional[object], int]:
+        """Open the LSO file receiving a resumable mission.
+        
+        A mission head carrying an 'offset' continues the file kept from an
+        earlier connection, other heads start a new file.
+        
+        Args:
+            data: Decoded mission head
+            
+        Returns:
+            tuple: The file opened for appending (None to receive in memory) and the bytes already received
+            
+        Raises:
+            ValueError: If the file is missing or holds fewer bytes than the head's offset
+        """
+        extension = data['extension']
+        offset = data.get('offset', 0)
+        local = self._resume_path('in', extension, self._peer_node)
+        if local is None or not _claim_resume_file(local):
+            if offset:
+                raise ValueError(f'{extension} resumed without a partial file.')
+            return None, 0
+        head = _resume_head(dict(data['info'], extension=extension), data['length'])
+        if offset:
+            try:
+                f = open(local, 'r+b')
+            except FileNotFoundError:
+                _release_resume_file(local, delete=False)
+                raise ValueError(f'{extension} resumed without a partial file.')
+            _, size = _read_resume_head(f)
+            if fstat(f.fileno()).st_size - size < offset:
+                f.close()
+                _release_resume_file(local, delete=False)
+                raise ValueError(f'{extension} resume offset {offset} beyond received data.')
+            # 截掉对端不再重发的部分写入
+            f.truncate(size + offset)
+            f.seek(size + offset)
+            logger.info(f'{extension} reception resumed at {offset}')
+        else:
+            f = open(local, 'wb')
+            f.write(head)
+        return f, offset
+    
+    def _close_resumable(self, extension:str, file) -> memoryview:
+        """Map a completely received resume file, like a spilled mission; must hold recv_lock.
+        
+        The file path is added to the mission info as 'local' and the file is
+        deleted once the returned buffer is no longer referenced.
+        """
+        file.flush()
+        file.seek(0)
+        _, head = _read_resume_head(file)
+        mm = mmap(file.fileno(), 0, access=ACCESS_WRITE)
+        file.close()
+        weakref.finalize(mm, _release_resume_file, file.name)
+        self.recv_info[extension]['local'] = file.name
+        return memoryview(mm)[head:]
+    
+    def _stream_full(self, sink:ChunkStream) -> None:
+        """Apply backpressure while a chunk stream's consumer is behind.
+        
+        Blocks the receive thread; a reactor instead stops reading this pipe.
+        
+        Args:
+            sink: The chunk stream over its buffer limit
+        """
+        if self.reactor is not None:
+            self.reactor.pause(self, sink)
+        else:
+            sink.wait_writable()
+    
+    @property
+    def _credit_flow(self) -> bool:
+        """Whether both sides run credit-based flow control."""
+        return self.recv_window is not None and self._peer_limit is not None
+    
+    def _hold(self, extension:str, length:int) -> None:
+        """Account bytes of a mission that occupy the receive window.
+        
+        Args:
+            extension: Mission extension
+            length: Bytes to add, negative to release
+        """
+        with self._flow_lock:
+            held = self._flow['held']
+            left = held.get(extension, 0) + length
+            if left:
+                held[extension] = left
+            else:
+                held.pop(extension, None)
+            self._flow['held_total'] += length
+    
+    def _move_hold(self, extension:str, target:str) -> int:
+        """Account the bytes a mission holds in the receive window to `target` instead.
+        
+        Used by MultiPipe to keep a stripe's bytes in the window until the
+        mission it belongs to is released.
+        
+        Args:
+            extension: Mission extension currently holding the bytes
+            target: Extension to release them under
+            
+        Returns:
+            int: Bytes moved
+        """
+        with self._flow_lock:
+            held = self._flow['held']
+            length = held.pop(extension, 0)
+            if length:
+                held[target] = held.get(target, 0) + length
+            return length
+    
+    def _count_received(self, length:int, extension:Optional[str]=None) -> None:
+        """Account a received data frame and grant credit when due.
+        
+        Args:
+            length: Payload length of the data frame
+            extension: Streamed mission still receiving the frame's data, if any
+        """
+        with self._flow_lock:
+            self._flow['received'] += length
+            mission = self._flow['missions'].get(extension)
+            if mission is not None:
+                mission['recv'] += length
+        self._queue_credit()
+    
+    def _stream_read(self, extension:str, length:int) -> None:
+        """on_read of a chunk stream: its consumer took or dropped data."""
+        self._hold(extension, -length)
+        self._queue_credit()
+    
+    def _forget_stream(self, extension:str) -> None:
+        """Stop tracking the per-mission window of a finished or canceled mission."""
+        with self._flow_lock:
+            self._flow['missions'].pop(extension, None)
+    
+    def release(self, extension:str) -> None:
+        """Return a delivered mission's bytes to the receive window.
+        
+        Called automatically by `recv` and, with release_on_delivery, after
+        recv_handler returns. Consumers that keep missions after the handler
+        returns (like Endpoint's request queue) disable release_on_delivery and
+        call this once they are done with the data.
+        
+        Args:
+            extension: Extension identifier of the mission
+        """
+        with self._flow_lock:
+            length = self._flow['held'].pop(extension, 0)
+            self._flow['held_total'] -= length
+        if length:
+            self._queue_credit()
+    
+    def _queue_credit(self) -> None:
+        """Queue a credit frame if the peer's allowance grew enough to announce.
+        
+        Credit is announced when it grew by a quarter of the window, or as soon
+        as it grows at all once the peer has used up what it was granted. Only
+        peers whose hello offered 'credit' are sent credit frames.
+        """
+        if self.recv_window is None or not self._peer_credit:
+            return
+        with self._flow_lock:
+            flow = self._flow
+            if flow['queued']:
+                return
+            due = self._credit_due(flow['received'], self.recv_window, flow['held_total'], flow['granted'])
+            for extension, mission in flow['missions'].items():
+                if due:
+                    break
+                due = self._credit_due(mission['recv'], mission['window'], flow['held'].get(extension, 0), mission['granted'])
+            if not due:
+                return
+            flow['queued'] = True
+        with self.send_condition:
+            self.mission_head.put({'type': 'credit'})
+            self._notify_sender()
+    
+    @staticmethod
+    def _credit_due(received:int, window:int, held:int, granted:int) -> bool:
+        """Check whether a grown allowance is worth announcing."""
+        limit = received + window - held
+        return limit - granted >= window // 4 or (received >= granted and limit > granted)
+    
+    def _credit_payload(self) -> Optional[dict]:
+        """Compute the credit frame content at send time.
+        
+        Returns:
+            Optional[dict]: Absolute byte limits for the pipe ('limit') and for
+            streamed missions ('missions'), None if flow control is disabled
+        """
+        if self.recv_window is None:
+            return None
+        with self._flow_lock:
+            flow = self._flow
+            flow['queued'] = False
+            # 上限只增不减，已通告的额度不会收回
+            flow['granted'] = max(flow['granted'], flow['received'] + self.recv_window - flow['held_total'])
+            missions = {}
+            for extension, mission in flow['missions'].items():
+                limit = mission['recv'] + mission['window'] - flow['held'].get(extension, 0)
+                if limit > mission['granted'] or not mission['granted']:
+                    mission['granted'] = max(mission['granted'], limit)
+                    missions[extension] = mission['granted']
+            return {'limit': flow['granted'], 'missions': missions}
+    
+    def _handle_credit(self, data:dict) -> None:
+        """Apply credit announced by the peer and wake the sender.
+        
+        The first credit frame switches the sending side to flow control; a
+        peer that never sends one is not limited.
+        
+        Args:
+            data: Credit payload with 'limit' and per-mission 'missions' limits
+        """
+        with self.send_condition:
+            self._peer_limit = max(self._peer_limit or 0, data['limit'])
+            for extension, limit in data.get('missions', {}).items():
+                info = self.misson_info.get(extension)
+                if info is None:
+                    continue
+                info['limit'] = limit if info['limit'] is None else max(info['limit'], limit)
+                if info['limit'] > self.send_pool[extension].offset:
+                    self._blocked.discard(extension)
+            self._notify_sender()
+    
+    def _heartbeat_tick(self, now:float) -> Optional[float]:
+        """Queue a due ping and check the peer's liveness; runs on the heartbeat thread.
+        
+        Args:
+            now: Current perf_counter time
+            
+        Returns:
+            Optional[float]: When the pipe needs the next tick, None to stop
+            driving it (heartbeats disabled or the pipe closed)
+        """
+        interval = self.heartbeat_interval
+        if interval is None or self._send_closed:
+            return None
+        heartbeat = self._heartbeat
+        deadline = heartbeat['last_recv'] + interval * self.heartbeat_misses
+        if now >= deadline:
+            logger.warning(f'Peer silent for {now - heartbeat["last_recv"]:.1f}s ({self.heartbeat_misses} heartbeats), closing pipe')
+            self._peer_lost()
+            return None
+        if now >= heartbeat['next']:
+            heartbeat['next'] = now + interval
+            with self.send_condition:
+                self.mission_head.put({'type': 'ping'})
+                self._notify_sender()
+        return min(heartbeat['next'], deadline)
+    
+    def _handle_pong(self, seq:int) -> None:
+        """Take an RTT sample from a pong and update the smoothed estimates.
+        
+        RTT and jitter follow the TCP retransmission timer estimator (RFC
+        6298): rtt moves 1/8 and rtt_jitter 1/4 of the way to each sample.
+        
+        Args:
+            seq: Sequence number of the answered ping
+        """
+        now = perf_counter()
+        with self.send_lock:
+            heartbeat = self._heartbeat
+            sent = heartbeat['sent'].pop(seq, None)
+            # 更早的 ping 不会再有回应
+            for old in [key for key in heartbeat['sent'] if key < seq]:
+                del heartbeat['sent'][old]
+            if sent is None:
+                return
+            sample = now - sent
+            heartbeat['pongs'] += 1
+            heartbeat['last_rtt'] = sample
+            heartbeat['min_rtt'] = sample if heartbeat['min_rtt'] is None else min(heartbeat['min_rtt'], sample)
+            if self.rtt is None:
+                self.rtt, self.rtt_jitter = sample, sample / 2
+            else:
+                self.rtt_jitter = 0.75 * self.rtt_jitter + 0.25 * abs(self.rtt - sample)
+                self.rtt = 0.875 * self.rtt + 0.125 * sample
+    
+    def _peer_lost(self) -> None:
+        """Tear the pipe down after the peer went silent.
+        
+        Socket-backed pipes shut the socket down and pipes with a `transport`
+        close it, so whichever loop reads it fails with EOF and runs the usual
+        error handling. Other transports cannot be interrupted; the pipe is
+        stopped, which ends the send thread, while the receive thread stays
+        blocked until the transport returns.
+        """
+        if self.socket is not None:
+            try:
+                self.socket.shutdown(socket.SHUT_RDWR)
+                return
+            except OSError:
+                pass
+        if self.transport is not None:
+            self.transport.close()
+            return
+        self.stop()
+    
+    def heartbeat_stats(self) -> dict:
+        """Return heartbeat measurements.
+        
+        Returns:
+            dict: Smoothed 'rtt' and 'jitter', 'last_rtt' and 'min_rtt' (seconds,
+            None before the first pong), 'pings' sent, 'pongs' received, and
+            'idle' seconds since the last frame from the peer
+        """
+        with self.send_lock:
+            heartbeat = self._heartbeat
+            return {
+                'rtt': self.rtt,
+                'jitter': self.rtt_jitter,
+                'last_rtt': heartbeat['last_rtt'],
+                'min_rtt': heartbeat['min_rtt'],
+                'pings': heartbeat['pings'],
+                'pongs': heartbeat['pongs'],
+                'idle': perf_counter() - heartbeat['last_recv'],
+            }
+    
+    def _count_transfer(self, elapsed:float) -> None:
+        """Record a mission received in full, timed from its head to its last chunk."""
+        counters = self._counters
+        counters['missions_received'] += 1
+        counters['transfers'] += 1
+        counters['transfer_total'] += elapsed
+        if elapsed > counters['transfer_max']:
+            counters['transfer_max'] = elapsed
+    
+    def _trace_received(self, extension:str, entry:dict) -> None:
+        """Export the reassembly span of a sampled mission and stamp its arrival."""
+        with self.recv_lock:
+            trace = self.recv_info.get(extension, {}).get('trace')
+        if not isinstance(trace, dict):
+            return
+        # 到达时间留给 Endpoint 计算分发延迟
+        trace['received'] = perf_counter()
+        self.tracer.span(trace['id'], 'recv.reassembly', entry['started'], trace['received'], extension=extension, bytes=entry['recv'])
+    
+    def stats(self) -> dict:
+        """Return traffic counters and queue depths.
+        
+        Counters are kept without locks while `metrics` is True and read here
+        without stopping the pipe, so a snapshot may be a frame behind.
+        
+        Returns:
+            dict: Frame payload 'bytes_sent'/'bytes_received' (after
+            compression, without headers), 'frames_sent'/'frames_received',
+            completed 'missions_sent'/'missions_received', 'transfers' timed
+            from head to last chunk with 'transfer_avg' and 'transfer_max'
+            seconds, 'send_busy' seconds spent in scheduling rounds and its
+            share of 'uptime' as 'busy_ratio', and the current depths of
+            'send_pool' (including queued messages), 'temp_pool', 'recv_pool',
+            'control_frames' and 'queued_bytes'
+        """
+        counters = dict(self._counters)
+        uptime = perf_counter() - self._counters_since
+        transfers = counters['transfers']
+        counters.update({
+            'transfer_avg': counters.pop('transfer_total') / transfers if transfers else 0.0,
+            'uptime': uptime,
+            'busy_ratio': counters['send_busy'] / uptime if uptime else 0.0,
+            'send_pool': len(self.send_pool) + len(self._inline),
+            'temp_pool': len(self.temp_pool),
+            'recv_pool': len(self.recv_pool),
+            'control_frames': self.mission_head.qsize(),
+            'queued_bytes': self._queued_bytes,
+        })
+        return counters
+    
     def _recv_thread(self):
         """Main function of the receive thread.
         
-        Continuously receives data, handles task headers and task data, assembles complete messages.
+        Continuously receives and applies frames until the transport fails.
         """
         try:
             while True:
-                lso, info = self._recv()
-                
-                # Handle mission task header
-                if info['type'] == 'mission':
-                    # 接收任务头
-                    data = lso.json
-                    with self.recv_lock:
-                        self.temp_pool[data['extension']] = {
-                            'length': data['length'],
-                            'recv': 0,
-                            'data': bytearray(),
-                        }
-                        self.recv_info[data['extension']] = data['info']
-                    continue
-                
-                # Handle cancellation message
-                if info['type'] == 'cancel':
-                    extension = info.get('extension')
-                    with self.recv_lock:
-                        # Remove from temp pool if task is in progress
-                        if extension in self.temp_pool:
-                            self.temp_pool.pop(extension, None)
-                            logger.info(f"Canceled ongoing reception of task {extension}")
-                        
-                        # Remove from recv pool if task was completed
-                        if extension in self.recv_pool:
-                            self.recv_pool.pop(extension, None)
-                            self.recv_info.pop(extension, None)
-                            logger.info(f"Removed completed task {extension} due to cancellation")
-                    self.cancel_handler(extension)
-                    continue
-                
-                # Handle task data
-                with self.recv_lock:
-                    # Check if task was canceled or doesn't exist
-                    if info['extension'] not in self.temp_pool:
-                        logger.debug(f"Ignoring data for canceled or unknown task {info['extension']}")
-                        continue
-                    
-                    # Process the data
-                    self.temp_pool[info['extension']]['data'] += lso.meta
-                    self.temp_pool[info['extension']]['recv'] += len(lso.meta)
-                    
-                    # Task completed check
-                    if self.temp_pool[info['extension']]['recv'] == self.temp_pool[info['extension']]['length']:
-                        self.recv_pool[info['extension']] = self.temp_pool[info['extension']]['data']
-                        self.temp_pool.pop(info['extension'])
-                        continue
-                    
-                    # Data error check
-                    if self.temp_pool[info['extension']]['recv'] > self.temp_pool[info['extension']]['length']:
-                        raise ValueError(f'{info["extension"]} recv length error.')
+                self._recv_frame()
         except KeyboardInterrupt:
             self._recv_error_handler('close')
         except Exception as e:
             self.recv_exception = True
+            self._wake_sender()
             self._recv_error_handler('error', e)
     
+    def _buffered_frame_size(self) -> Optional[int]:
+        """Compute the total size of the next frame from already buffered bytes.
+        
+        Used by non-blocking drivers to only apply a frame once it is complete.
+        
+        Returns:
+            Optional[int]: Frame size in bytes, None if its header is not fully buffered yet
+        """
+        if self.recv_framing == 'binary':
+            head = self.reader.peek(FRAME_HEAD.size)
+            if len(head) < FRAME_HEAD.size:
+                return None
+            return FRAME_HEAD.size + FRAME_HEAD.unpack(head)[3]
+        head = self.reader.peek(4)
+        if len(head) < 4:
+            return None
+        extension_length = unpack('i', head)[0]
+        head = self.reader.peek(extension_length + 8)
+        if len(head) < extension_length + 8:
+            return None
+        return extension_length + 8 + unpack('i', head[extension_length + 4:])[0]
+    
+    def _mission_received(self, extension:str) -> None:
+        """Deliver a completed mission to recv_handler, if one is set.
+        
+        Without a handler the mission stays in recv_pool for `recv`.
+        
+        Args:
+            extension: Extension identifier of the completed mission
+        """
+        if self.recv_handler is None:
+            return
+        with self.recv_lock:
+            if extension not in self.recv_pool:
+                return
+            data = self.recv_pool.pop(extension)
+            info = self.recv_info.pop(extension)
+        info.update({
+            'extension': extension
+        })
+        try:
+            self.recv_handler(data, info)
+        finally:
+            if self.release_on_delivery:
+                self.release(extension)
+    
+    def _recv_data(self, extension:str, length:int, flags:int=0) -> None:
+        """Receive a data frame payload into its mission's reassembly buffer.
+        
+        The payload is read directly into the buffer preallocated from the
+        mission head, at the mission's current offset. Missions of unknown
+        length are appended to instead and complete on the 'end' flag.
+        Compressed payloads are inflated with the codec from the mission head
+        first; lengths and flow control count the inflated bytes.
+        
+        Args:
+            extension: Mission extension the data belongs to
+            length: Payload length from the frame header
+            flags: Frame flags from the frame header
+            
+        Raises:
+            ValueError: If the data exceeds the announced mission length or
+                a compressed payload cannot be inflated
+        """
+        with self.recv_lock:
+            entry = self.temp_pool.get(extension)
+        # Check if task was canceled or doesn't exist
+        if entry is None:
+            logger.debug(f"Ignoring data for canceled or unknown task {extension}")
+            self._recv_payload(length)
+            self._count_received(length)
+            return
+        
+        start = entry['recv']
+        sink = entry.get('sink')
+        if flags & FRAME_FLAGS['compressed']:
+            if entry.get('codec') not in CODECS:
+                raise ValueError(f'{extension} compressed data without a known codec.')
+            limit = MAX_INFLATE if entry['length'] is None else entry['length'] - start
+            # 解压后的长度受任务剩余长度限制，防止压缩炸弹
+            payload = _decompress_chunk(entry['codec'], self._recv_payload(length), limit)
+            length = len(payload)
+        else:
+            payload = None
+        if entry['length'] is not None and start + length > entry['length']:
+            raise ValueError(f'{extension} recv length error.')
+        if payload is not None:
+            if sink is not None:
+                if length:
+                    self._hold(extension, length)
+                    if not sink.put(payload):
+                        self._hold(extension, -length)
+            elif entry.get('file') is not None:
+                entry['file'].write(payload)
+            elif entry['length'] is None:
+                self._reserve_unknown(extension, entry, length)
+                entry['data'] += payload
+            else:
+                entry['data'][start:start + length] = payload
+        elif sink is not None:
+            # Streamed mission, hand the chunk to its consumer
+            if length:
+                payload = self._recv_payload(length)
+                # 先计入占用，避免消费者先于此处释放
+                self._hold(extension, length)
+                if not sink.put(payload):
+                    self._hold(extension, -length)
+        elif entry.get('file') is not None:
+            # Resumable mission, append to its LSO file
+            if length:
+                entry['file'].write(self._recv_payload(length))
+        elif entry['length'] is None:
+            # Unknown length, append in arrival order
+            if length:
+                self._reserve_unknown(extension, entry, length)
+                entry['data'] += self._recv_payload(length)
+        else:
+            # Process the data
+            with memoryview(entry['data']) as view:
+                self._recv_payload(length, view[start:start + length])
+        
+        with self.recv_lock:
+            entry['recv'] += length
+            # Task completed check
+            if entry['length'] is None:
+                finished = bool(flags & FRAME_FLAGS['end'])
+            else:
+                finished = entry['recv'] == entry['length']
+            completed = finished and self.temp_pool.get(extension) is entry
+            if completed:
+                if entry.get('file') is not None:
+                    entry['data'] = self._close_resumable(extension, entry['file'])
+                if sink is None:
+                    self.recv_pool[extension] = entry['data']
+                self._recv_streams.pop(self.temp_pool.pop(extension)['stream'], None)
+        if completed and sink is None and isinstance(entry['data'], bytearray):
+            # 内存中的完整任务在交付并释放前占用接收窗口，落盘的任务不占用
+            self._hold(extension, len(entry['data']))
+            self._unreserve(entry['reserved'])
+        if completed:
+            self._forget_stream(extension)
+            if self.metrics:
+                self._count_transfer(perf_counter() - entry['started'])
+            if self.tracer is not None:
+                self._trace_received(extension, entry)
+            if entry['resumable']:
+                # 确认完成，发送端可删除其持久化文件
+                with self.send_condition:
+                    self.mission_head.put({'type': 'resume', 'done': extension})
+                    self._notify_sender()
+        self._count_received(length, None if completed else extension)
+        if sink is not None:
+            if completed:
+                sink.finish()
+            elif not sink.writable and not self._credit_flow:
+                # 对端不遵守 credit 时退回到暂停读取
+                self._stream_full(sink)
+        elif completed:
+            self._mission_received(extension)
+    
     def _send_error_handler(self, message:str, exception:Exception=None):
         """Handle errors during sending.
         
@@ -991,6 +3808,11 @@ class Pipe:
             logger.info('Pipe closed.')
         if message == 'with_exception':
             logger.warning('Pipe closed with recv exception.')
+        with self.send_condition:
+            # 唤醒等待发送预算的调用方，任务不会再被发出
+            self._send_closed = True
+            self._drop_missions()
+            self.budget_condition.notify_all()
         if self.final_error_handler:
             try:
                 logger.info('Final error handler is running.')
@@ -998,6 +3820,27 @@ class Pipe:
             except Exception as e:
                 logger.error(f'Final error handler occurred error: {e}')
 
+    def _drop_missions(self) -> None:
+        """Release every queued outbound mission of a closed pipe; must hold send_lock."""
+        for mission in self.send_pool.values():
+            if isinstance(mission, StreamMission):
+                mission.close()
+        for extension, info in self.misson_info.items():
+            if info['resume'] is not None:
+                # 已绑定对端的文件留待重连后续传，未绑定的无从续传
+                _release_resume_file(info['resume'], delete=info['resume'] == self._resume_path('out', extension))
+        for local in self._resume_unacked.values():
+            _release_resume_file(local, delete=False)
+        self._resume_unacked.clear()
+        self.send_pool.clear()
+        self.misson_info.clear()
+        self._inline.clear()
+        self._blocked.clear()
+        for queue in self._active:
+            queue.clear()
+        self._queued_bytes = 0
+        self._prefetched = 0
+    
     def _recv_error_handler(self, message:str, exception:Exception=None):
         """Handle errors during receiving.
         
@@ -1009,20 +3852,36 @@ class Pipe:
             logger.error(f'Pipe error: {exception}')
         if message == 'close':
             logger.info('Pipe closed.')
+        # 未完成的流式任务不会再收到数据，可续传任务的文件保留到重连
+        with self.recv_lock:
+            sinks = [entry['sink'] for entry in self.temp_pool.values() if entry.get('sink') is not None]
+            for entry in self.temp_pool.values():
+                if entry.get('file') is not None:
+                    entry['file'].close()
+                    _release_resume_file(entry['file'].name, delete=False)
+        for sink in sinks:
+            sink.abort(exception or ConnectionError('Pipe closed'))
     
     def send(self, data:bytes, info:dict={}, **kwargs) -> str:
         """Send data and related information.
         
-        Simplified version of create_mission, for quick data sending.
+        Simplified version of create_mission, for quick data sending. Iterators,
+        readable file objects and LsoProtocol are sent as streaming missions
+        (see create_stream_mission).
         
         Args:
-            data: Byte data to send
+            data: Byte data, or a stream source, to send
             info: Metadata related to the data
+            **kwargs: `length` of a stream source, if known; `priority` and
+                `weight` of the mission (see create_mission)
             
         Returns:
             str: The mission's extension identifier
         """
-        return self.create_mission(data, info)
+        priority, weight = kwargs.get('priority'), kwargs.get('weight', 1)
+        if Utils.is_stream_source(data):
+            return self.create_stream_mission(data, info, kwargs.get('length'), priority=priority, weight=weight)
+        return self.create_mission(data, info, priority=priority, weight=weight)
     
     def recv(self) -> tuple[bytes, dict]:
         """Receive data and related information.
@@ -1040,7 +3899,8 @@ class Pipe:
             info.update({
                 'extension': extension
             })
-            return data, info
+        self.release(extension)
+        return data, info
     
     @property
     def is_data(self) -> bool:
@@ -1052,6 +3912,30 @@ class Pipe:
         with self.recv_lock:  # 添加锁保护
             return bool(self.recv_pool)
     
+    def scheduler_stats(self) -> dict[str, dict]:
+        """Return queueing latency statistics per priority class.
+        
+        Latency is measured from mission creation until its last chunk was
+        handed to the transport, so it covers the time spent behind other
+        traffic in the send scheduler.
+        
+        Returns:
+            dict: Per class name, 'missions', 'bytes', 'active' (missions still
+            queued), 'latency_avg' and 'latency_max' in seconds
+        """
+        with self.send_lock:
+            result = {}
+            for name, stats in self._class_stats.items():
+                missions = stats['missions']
+                result[name] = {
+                    'missions': missions,
+                    'bytes': stats['bytes'],
+                    'active': sum(1 for info in self.misson_info.values() if info['priority'] == name),
+                    'latency_avg': stats['latency_total'] / missions if missions else 0.0,
+                    'latency_max': stats['latency_max'],
+                }
+            return result
+    
     def start(self):
         """Start the pipe's send and receive threads."""
         self.recv_thread.start()
@@ -1068,23 +3952,50 @@ class Pipe:
         Returns:
             bool: True if the task was found and canceled, False otherwise
         """
-        with self.send_lock:
+        with self.send_condition:
+            if extension in self._inline:
+                # 单帧消息尚未发出，直接丢弃
+                data = self._inline.pop(extension)[0]
+                if data:
+                    self._queued_bytes -= len(data)
+                    self.budget_condition.notify_all()
+                logger.info(f"Mission {extension} canceled successfully")
+                return True
+            
             # Check if the task exists in our send pool
             if extension not in self.send_pool:
                 logger.warning(f"Cannot cancel mission {extension}: not found")
                 return False
             
             # Remove the task from our send pools
-            self.send_pool.pop(extension, None)
-            self.misson_info.pop(extension, None)
+            mission = self.send_pool.pop(extension, None)
+            info = self.misson_info.pop(extension, None) or {}
+            self._blocked.discard(extension)
+            if info:
+                self._release_budget(info, info['queued'])
+                # 已切分但未发送的压缩分块不会到达对端，退回其占用的额度
+                pending = 0
+                while info['ready']:
+                    raw, _, result = info['ready'].popleft()
+                    if not isinstance(result, tuple):
+                        result.cancel()
+                    pending += raw
+                self._prefetched -= pending
+                self._sent_bytes -= pending
+            if isinstance(mission, StreamMission):
+                mission.close()
+            if info.get('resume') is not None:
+                _release_resume_file(info['resume'])
             
             # Schedule a cancellation message to be sent
             try:
                 # 创建取消消息并加入任务头队列，保持消息顺序
                 self.mission_head.put({
                     'type': 'cancel',
-                    'extension': extension
+                    'extension': extension,
+                    'stream': info.get('stream', 0),
                 })
+                self._notify_sender()
                 logger.info(f"Mission {extension} canceled successfully")
                 return True
             except Exception as e:
@@ -1096,3 +4007,4 @@ class Pipe:
         # 这里实际上无法安全地停止线程，只能通过异常退出
         # 可以通过设置标志位并让线程自己检查退出
         self.recv_exception = True
+        self._wake_sender()
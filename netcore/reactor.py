@@ -0,0 +1,295 @@
+from typing    import Optional
+from threading import Thread, Timer, Lock, current_thread
+from .lso      import Pipe, ChunkStream
+
+import selectors
+import socket
+import logging
+
+logger = logging.getLogger("netcore.reactor")
+
+
+class Reactor:
+    """Selector-based I/O loop driving many socket pipes from a single thread.
+
+    A pipe attached to a reactor starts no threads of its own. Its socket is
+    switched to non-blocking mode: readable data is fed to the pipe's frame
+    reader and every fully buffered frame is applied, while scheduling rounds
+    are written into a per-pipe outbound buffer that is flushed as fast as the
+    socket accepts it. Other threads wake the loop through the pipe's
+    `_notify_sender`, e.g. when `create_mission` queues new data.
+
+    Completed missions are delivered to the pipe's recv_handler on the reactor
+    thread, so the handler should only hand them off (e.g. to a queue).
+    """
+
+    def __init__(self, name: str = 'netcore-reactor', recv_buff: int = 65536, high_water: int = 262144):
+        """Create a reactor.
+
+        Args:
+            name: Name of the reactor thread
+            recv_buff: Maximum number of bytes read from a socket at once
+            high_water: Outbound buffer size per pipe above which no further
+                scheduling rounds are run until the socket drains
+        """
+        self.name = name
+        self.recv_buff = recv_buff
+        self.high_water = high_water
+        self.selector = selectors.DefaultSelector()
+        # 已接管的管道及其待写出的数据
+        self.pipes: dict[Pipe, bytearray] = {}
+        # 因流式任务的消费者跟不上而暂停读取的管道
+        self._paused: dict[Pipe, ChunkStream] = {}
+        self.running = False
+        self.thread: Optional[Thread] = None
+
+        # 其他线程提交的变更，由循环线程统一处理
+        self._lock = Lock()
+        self._added: list[Pipe] = []
+        self._changed: set[Pipe] = set()
+        self._woken = False
+        self._wake_recv, self._wake_send = socket.socketpair()
+        self._wake_recv.setblocking(False)
+        self._wake_send.setblocking(False)
+        self.selector.register(self._wake_recv, selectors.EVENT_READ, None)
+
+        self._scratch = memoryview(bytearray(recv_buff))
+
+    def add_pipe(self, pipe: Pipe) -> None:
+        """Attach a socket-backed pipe; it must not have been started.
+
+        The pipe's send_function is redirected into the reactor's outbound
+        buffer, so the pipe must only be driven by this reactor afterwards.
+
+        Args:
+            pipe: Pipe created over a socket's recv/send methods
+
+        Raises:
+            ValueError: If the pipe has no underlying socket
+        """
+        if pipe.socket is None:
+            raise ValueError("Reactor can only drive socket-backed pipes")
+        pipe.reactor = self
+        with self._lock:
+            self._added.append(pipe)
+        self.wake(pipe)
+
+    def wake(self, pipe: Pipe) -> None:
+        """Ask the loop to service a pipe; safe to call from any thread.
+
+        Args:
+            pipe: Pipe with new outbound work or a state change
+        """
+        with self._lock:
+            self._changed.add(pipe)
+            if self._woken or current_thread() is self.thread:
+                return
+            self._woken = True
+        try:
+            self._wake_send.send(b'\0')
+        except BlockingIOError:
+            # 唤醒缓冲区已满，循环必然会被唤醒
+            pass
+
+    def pause(self, pipe: Pipe, sink: ChunkStream) -> None:
+        """Stop reading from a pipe until a chunk stream drains.
+
+        Called by the pipe on the reactor thread when a stream consumer falls
+        behind; the consumer wakes the reactor once it catches up.
+
+        Args:
+            pipe: Pipe whose frames feed the stream
+            sink: Chunk stream over its buffer limit
+        """
+        self._paused[pipe] = sink
+        sink.on_drain = lambda: self.wake(pipe)
+
+    def start(self) -> None:
+        """Start the reactor thread."""
+        self.running = True
+        self.thread = Thread(target=self._run, name=self.name, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """Stop the reactor thread and release the selector.
+
+        Attached pipes should be stopped first so their final handlers run.
+        """
+        self.running = False
+        with self._lock:
+            self._woken = True
+        try:
+            self._wake_send.send(b'\0')
+        except OSError:
+            pass
+        if self.thread and self.thread is not current_thread():
+            self.thread.join(timeout=1.0)
+
+    def _run(self) -> None:
+        """Main loop of the reactor thread."""
+        try:
+            while self.running:
+                with self._lock:
+                    timeout = 0 if self._changed or self._added else None
+                for key, mask in self.selector.select(timeout):
+                    if key.data is None:
+                        self._drain_wakeup()
+                        continue
+                    pipe = key.data
+                    if mask & selectors.EVENT_READ:
+                        self._on_readable(pipe)
+                    if mask & selectors.EVENT_WRITE and pipe in self.pipes:
+                        self._service(pipe)
+
+                with self._lock:
+                    added, self._added = self._added, []
+                    changed, self._changed = self._changed, set()
+                for pipe in added:
+                    self._attach(pipe)
+                for pipe in changed:
+                    if pipe in self.pipes:
+                        self._service(pipe)
+        except Exception as e:
+            logger.error(f'Reactor {self.name} error: {e}')
+        finally:
+            self.selector.close()
+            self._wake_recv.close()
+            self._wake_send.close()
+
+    def _drain_wakeup(self) -> None:
+        """Consume wakeup bytes and re-arm the wakeup."""
+        try:
+            while self._wake_recv.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        with self._lock:
+            self._woken = False
+
+    def _attach(self, pipe: Pipe) -> None:
+        """Register a newly added pipe with the selector."""
+        out = bytearray()
+        pipe.socket.setblocking(False)
+        pipe.send_function = out.extend
+        pipe.send_parts_function = None
+        pipe.send_file_function = None
+        self.pipes[pipe] = out
+        self.selector.register(pipe.socket, selectors.EVENT_READ, pipe)
+        if pipe._offers_hello:
+            # 发起帧格式与压缩协商，二进制帧在收到对端握手前不发送其他帧
+            pipe._send_hello()
+            if not pipe._handshake_done and pipe.handshake_timeout is not None:
+                # 对端超时未应答时退回 LSO 格式
+                timer = Timer(pipe.handshake_timeout, pipe._handshake_expired)
+                timer.daemon = True
+                timer.start()
+        self._service(pipe)
+
+    def _detach(self, pipe: Pipe) -> None:
+        """Unregister a pipe from the selector."""
+        self.pipes.pop(pipe, None)
+        self._paused.pop(pipe, None)
+        try:
+            self.selector.unregister(pipe.socket)
+        except (KeyError, ValueError):
+            pass
+
+    def _update_interest(self, pipe: Pipe) -> None:
+        """Register the events a pipe currently needs.
+
+        Reads are skipped while the pipe is paused, writes are only watched while
+        data is left over that the socket did not accept.
+        """
+        events = 0
+        if pipe not in self._paused:
+            events |= selectors.EVENT_READ
+        if self.pipes[pipe]:
+            events |= selectors.EVENT_WRITE
+        key = self.selector.get_map().get(pipe.socket)
+        if not events:
+            if key is not None:
+                self.selector.unregister(pipe.socket)
+        elif key is None:
+            self.selector.register(pipe.socket, events, pipe)
+        elif key.events != events:
+            self.selector.modify(pipe.socket, events, pipe)
+
+    def _on_readable(self, pipe: Pipe) -> None:
+        """Read what the socket has and apply every complete frame."""
+        try:
+            n = pipe.socket.recv_into(self._scratch)
+        except (BlockingIOError, InterruptedError):
+            return
+        except Exception as e:
+            self._recv_failed(pipe, e)
+            return
+        if n == 0:
+            self._recv_failed(pipe, ConnectionError("Unexpected EOF during frame read"))
+            return
+        pipe.reader.feed(self._scratch[:n])
+        if self._apply_frames(pipe):
+            self._update_interest(pipe)
+
+    def _apply_frames(self, pipe: Pipe) -> bool:
+        """Apply every fully buffered frame until the pipe is paused.
+
+        Returns:
+            bool: False if the pipe failed and was detached
+        """
+        try:
+            while pipe not in self._paused:
+                size = pipe._buffered_frame_size()
+                if size is None or pipe.reader.buffered < size:
+                    break
+                pipe._recv_frame()
+        except Exception as e:
+            self._recv_failed(pipe, e)
+            return False
+        return True
+
+    def _recv_failed(self, pipe: Pipe, exception: Exception) -> None:
+        """Tear down a pipe whose receiving side failed, like _recv_thread."""
+        self._detach(pipe)
+        pipe.recv_exception = True
+        pipe._recv_error_handler('error', exception)
+        pipe._send_error_handler('with_exception')
+
+    def _service(self, pipe: Pipe) -> None:
+        """Run scheduling rounds into the outbound buffer and flush it.
+
+        Write interest is only registered while data is left over that the
+        socket did not accept.
+        """
+        if pipe.recv_exception:
+            # 管道被停止
+            self._detach(pipe)
+            pipe._send_error_handler('with_exception')
+            return
+        sink = self._paused.get(pipe)
+        if sink is not None and sink.writable:
+            # 消费者已跟上，继续处理已缓冲的帧并恢复读取
+            del self._paused[pipe]
+            if not self._apply_frames(pipe):
+                return
+        out = self.pipes[pipe]
+        try:
+            while True:
+                while len(out) < self.high_water:
+                    with pipe.send_lock:
+                        if not (pipe._handshake_done and pipe._has_pending()):
+                            break
+                    pipe._run_send_round()
+                if not out:
+                    break
+                try:
+                    sent = pipe.socket.send(out)
+                except (BlockingIOError, InterruptedError):
+                    break
+                del out[:sent]
+                if out:
+                    break
+        except Exception as e:
+            self._detach(pipe)
+            pipe._send_error_handler('error', e)
+            return
+        self._update_interest(pipe)
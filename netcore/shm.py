@@ -0,0 +1,406 @@
+from typing          import Optional, Union
+from multiprocessing import shared_memory, resource_tracker
+from struct          import Struct
+from threading       import Event
+from time            import sleep
+from tempfile        import gettempdir
+from weakref         import finalize
+from os              import path
+from .lso            import Pipe
+
+import logging
+import os
+import select
+import sys
+
+logger = logging.getLogger("netcore.shm")
+
+# 让出处理器（同时释放 GIL），单核主机上对端进程也得以运行；无 sched_yield 的平台退化为 sleep(0)
+_yield = getattr(os, 'sched_yield', None) or (lambda: sleep(0))
+
+'''
+Shared memory segment:
+segment_head(64) | ring 0 (creator -> attacher) | ring 1 (attacher -> creator)
+
+Segment head:
+magic(8s) | capacity(uint64)
+
+Ring:
+write_pos | read_pos | writer_closed | reader_closed | reader_waiting | writer_waiting | data(capacity)
+Every header field is a uint64 in its own 64 byte cache line; the positions only
+grow and are taken modulo the capacity.
+
+Doorbells (POSIX only): one FIFO per ring and direction next to the segment,
+`<tmp>/<name>-<ring>d` wakes the ring's reader, `<tmp>/<name>-<ring>r` its writer.
+'''
+
+SEGMENT_MAGIC = b'NCSHM001'
+SEGMENT_HEAD = Struct('!8sQ')
+SEGMENT_HEAD_SIZE = 64
+RING_HEAD_SIZE = 384
+# 环形缓冲区头中各字段在 uint64 视图中的下标
+_WRITE, _READ, _WRITER_CLOSED, _READER_CLOSED, _READER_WAITING, _WRITER_WAITING = 0, 8, 16, 24, 32, 40
+
+
+def _bell_paths(name: str) -> list[str]:
+    """Doorbell FIFO paths of a segment: data and room of ring 0, then of ring 1."""
+    base = path.join(gettempdir(), name.lstrip('/'))
+    return [f'{base}-{ring}{kind}' for ring in (0, 1) for kind in 'dr']
+
+
+def _open_bells(name: str, create: bool) -> list[Optional[int]]:
+    """Open the doorbell FIFOs, creating them first on the creating side.
+
+    Returns:
+        list: Four file descriptors, or Nones where FIFOs are unavailable
+    """
+    if not hasattr(os, 'mkfifo'):
+        return [None] * 4
+    bells = []
+    for bell in _bell_paths(name):
+        try:
+            if create:
+                os.mkfifo(bell, 0o600)
+            # 以读写方式打开 FIFO，不必等待另一端，也不会因对端关闭而读到 EOF
+            bells.append(os.open(bell, os.O_RDWR | os.O_NONBLOCK))
+        except OSError as e:
+            logger.warning(f"Doorbell {bell} unavailable, falling back to polling: {e}")
+            for fd in bells:
+                os.close(fd)
+            return [None] * 4
+    return bells
+
+
+def _close_bells(bells: list[Optional[int]]) -> None:
+    """Close doorbell descriptors; run when the transport is garbage collected."""
+    for fd in bells:
+        if fd is not None:
+            os.close(fd)
+
+
+def _ring_bell(fd: Optional[int]) -> None:
+    """Wake the side blocked on a doorbell."""
+    if fd is None:
+        return
+    try:
+        os.write(fd, b'\0')
+    except (BlockingIOError, OSError):
+        # FIFO 已满说明唤醒尚未被消费，无需再写
+        pass
+
+
+class _Ring:
+    """Single-producer/single-consumer byte ring inside a shared memory buffer.
+
+    The producer only stores the write position and the consumer only stores
+    the read position. Both are aligned 8-byte words written through a uint64
+    memoryview, i.e. with a single store, and each side publishes its position
+    only after copying the data, so no lock is needed. A side about to block
+    sets its waiting flag; the other side rings the doorbell only while that
+    flag is set, so a busy ring costs no system calls.
+    """
+
+    def __init__(self, buf: memoryview, offset: int, capacity: int, data_bell: Optional[int], room_bell: Optional[int]):
+        """Map a ring at `offset` of the segment buffer."""
+        self.capacity = capacity
+        self.head = buf[offset:offset + RING_HEAD_SIZE].cast('Q')
+        self.data = buf[offset + RING_HEAD_SIZE:offset + RING_HEAD_SIZE + capacity]
+        self.data_bell = data_bell
+        self.room_bell = room_bell
+
+    def write(self, data: memoryview) -> int:
+        """Copy as much of `data` as fits.
+
+        Returns:
+            int: Number of bytes written, 0 if the ring is full
+        """
+        head = self.head
+        pos = head[_WRITE]
+        n = min(self.capacity - (pos - head[_READ]), len(data))
+        if n:
+            start = pos % self.capacity
+            first = min(n, self.capacity - start)
+            self.data[start:start + first] = data[:first]
+            if n > first:
+                self.data[:n - first] = data[first:n]
+            head[_WRITE] = pos + n
+            if head[_READER_WAITING]:
+                _ring_bell(self.data_bell)
+        return n
+
+    def read_into(self, view: memoryview) -> int:
+        """Move as many available bytes as fit into `view`.
+
+        Returns:
+            int: Number of bytes read, 0 if the ring is empty
+        """
+        head = self.head
+        pos = head[_READ]
+        n = min(head[_WRITE] - pos, len(view))
+        if n:
+            start = pos % self.capacity
+            first = min(n, self.capacity - start)
+            view[:first] = self.data[start:start + first]
+            if n > first:
+                view[first:n] = self.data[:n - first]
+            head[_READ] = pos + n
+            if head[_WRITER_WAITING]:
+                _ring_bell(self.room_bell)
+        return n
+
+    def release(self) -> None:
+        """Release the views into the segment."""
+        self.head.release()
+        self.data.release()
+
+
+class ShmTransport:
+    """Shared memory transport for pipes between processes on the same host.
+
+    One process creates the segment and passes its `name` to the other, which
+    attaches to it. The segment holds one single-producer/single-consumer ring
+    per direction, so data moves with one copy in and one copy out and no
+    system call while the rings are busy.
+
+    A side finding its ring empty (or full) first yields `spin` times, then
+    flags itself as waiting and blocks on a FIFO doorbell that the other side
+    rings once it sees the flag. The wait is bounded by `max_wait` seconds as a
+    safety net against a missed wakeup. Where FIFOs are unavailable the ring is
+    polled with exponential backoff up to `max_wait`.
+
+    Example:
+        server: transport = ShmTransport.create(); pipe = transport.pipe()
+        client: pipe = ShmTransport.attach(name).pipe()
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool, spin: int = 100, max_wait: Optional[float] = None):
+        """Wrap a mapped segment; use `create` or `attach` instead.
+
+        Args:
+            shm: The mapped shared memory segment
+            owner: Whether this side created the segment and unlinks it on close
+            spin: Number of polls, each yielding the processor, before blocking
+            max_wait: Longest block in seconds before the ring is checked again,
+                defaults to 0.05 with doorbells and 0.001 when polling
+        """
+        magic, capacity = SEGMENT_HEAD.unpack_from(shm.buf)
+        if magic != SEGMENT_MAGIC:
+            raise ValueError(f"Shared memory segment {shm.name} is not a netcore transport")
+        self.shm = shm
+        self.owner = owner
+        self.capacity = capacity
+        bells = _open_bells(shm.name, owner)
+        self._bells = bells
+        # 文件描述符可能仍被阻塞中的线程使用，在对象回收时才关闭
+        finalize(self, _close_bells, bells)
+        if max_wait is None:
+            max_wait = 0.05 if bells[0] is not None else 0.001
+        self.spin = spin
+        self.max_wait = max_wait
+        first = _Ring(shm.buf, SEGMENT_HEAD_SIZE, capacity, bells[0], bells[1])
+        second = _Ring(shm.buf, SEGMENT_HEAD_SIZE + RING_HEAD_SIZE + capacity, capacity, bells[2], bells[3])
+        # 创建方写第一个环、读第二个环，连接方相反
+        self._out, self._in = (first, second) if owner else (second, first)
+        self._closed = Event()
+        # 累计阻塞等待的次数
+        self.waits = 0
+
+    @classmethod
+    def create(cls, capacity: int = 4194304, name: Optional[str] = None, **kwargs) -> 'ShmTransport':
+        """Create a new segment.
+
+        Args:
+            capacity: Size of each direction's ring in bytes, rounded up to 64
+            name: Segment name, generated when None
+            **kwargs: spin and max_wait (see __init__)
+
+        Returns:
+            ShmTransport: The creating side of the transport
+        """
+        capacity = -(-capacity // 64) * 64
+        shm = shared_memory.SharedMemory(name=name, create=True, size=SEGMENT_HEAD_SIZE + 2 * (RING_HEAD_SIZE + capacity))
+        SEGMENT_HEAD.pack_into(shm.buf, 0, SEGMENT_MAGIC, capacity)
+        return cls(shm, True, **kwargs)
+
+    @classmethod
+    def attach(cls, name: str, **kwargs) -> 'ShmTransport':
+        """Attach to a segment created by another process.
+
+        Args:
+            name: Name of the segment (the creator's `name`)
+            **kwargs: spin and max_wait (see __init__)
+
+        Returns:
+            ShmTransport: The attaching side of the transport
+
+        Raises:
+            FileNotFoundError: If no segment with this name exists
+            ValueError: If the segment was not created by ShmTransport
+        """
+        # 连接方不拥有该段，避免 resource_tracker 在本进程退出时将其删除
+        if sys.version_info >= (3, 13):
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            shm = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return cls(shm, False, **kwargs)
+
+    @property
+    def name(self) -> str:
+        """Name under which the other process attaches."""
+        return self.shm.name
+
+    @property
+    def closed(self) -> bool:
+        """Whether this side has closed the transport."""
+        return self._closed.is_set()
+
+    def _wait(self, ring: _Ring, flag: int, bell: Optional[int], attempt: int) -> None:
+        """Back off while a ring is empty (reader) or full (writer).
+
+        The first waits after spinning only set the waiting flag, so the caller
+        checks the ring once more before actually blocking on the doorbell.
+        """
+        if attempt < self.spin:
+            _yield()
+            return
+        if bell is None:
+            self.waits += 1
+            sleep(min(self.max_wait, 0.00002 * (1 << min(attempt - self.spin, 16))))
+            return
+        if not ring.head[flag]:
+            ring.head[flag] = 1
+            return
+        self.waits += 1
+        select.select([bell], [], [], self.max_wait)
+        try:
+            os.read(bell, 4096)
+        except BlockingIOError:
+            pass
+
+    def recv_into(self, view: Union[memoryview, bytearray]) -> int:
+        """Read available bytes, waiting until there are any.
+
+        Args:
+            view: Writable buffer
+
+        Returns:
+            int: Number of bytes read, 0 once the peer closed and the ring is drained
+                or this side was closed
+        """
+        ring = self._in
+        view = memoryview(view).cast('B')
+        attempt = 0
+        try:
+            while not self._closed.is_set():
+                n = ring.read_into(view)
+                if n:
+                    if attempt:
+                        ring.head[_READER_WAITING] = 0
+                    return n
+                if ring.head[_WRITER_CLOSED]:
+                    # 对端关闭前写入的数据可能刚刚到达
+                    return ring.read_into(view)
+                self._wait(ring, _READER_WAITING, ring.data_bell, attempt)
+                attempt += 1
+        except ValueError:
+            # close 在其他线程中释放了映射
+            if not self._closed.is_set():
+                raise
+        return 0
+
+    def recv(self, size: int) -> bytearray:
+        """Read up to `size` bytes, waiting until there are any.
+
+        Returns:
+            bytearray: The data, empty at EOF
+        """
+        data = bytearray(size)
+        del data[self.recv_into(data):]
+        return data
+
+    def sendall(self, data: Union[bytes, bytearray, memoryview]) -> None:
+        """Write all of `data`, waiting for room while the ring is full.
+
+        Raises:
+            ConnectionError: If either side closed the transport
+        """
+        ring = self._out
+        view = memoryview(data).cast('B')
+        attempt = 0
+        while view:
+            if self._closed.is_set():
+                raise ConnectionError("Shared memory transport is closed")
+            try:
+                if ring.head[_READER_CLOSED]:
+                    raise BrokenPipeError("Shared memory transport closed by peer")
+                n = ring.write(view)
+                if n:
+                    view = view[n:]
+                    if attempt:
+                        ring.head[_WRITER_WAITING] = 0
+                        attempt = 0
+                    continue
+                self._wait(ring, _WRITER_WAITING, ring.room_bell, attempt)
+            except ValueError:
+                # close 在其他线程中释放了映射
+                raise ConnectionError("Shared memory transport is closed")
+            attempt += 1
+
+    def pipe(self, **kwargs) -> Pipe:
+        """Create a Pipe over this transport.
+
+        The pipe closes the transport when its heartbeat declares the peer lost.
+
+        Args:
+            **kwargs: Extra Pipe arguments such as framing
+
+        Returns:
+            Pipe: Pipe over the transport (not started)
+        """
+        kwargs.setdefault('recv_buff', 65536)
+        pipe = Pipe(self.recv, self.sendall, recv_into_function=self.recv_into, **kwargs)
+        pipe.transport = self
+        return pipe
+
+    def close(self) -> None:
+        """Close this side; the peer reads EOF once it drained the ring.
+
+        Blocked reads and writes of this side return or fail at once. The
+        creator also unlinks the segment and its doorbells, which stay usable
+        until both sides closed them.
+        """
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        try:
+            self._out.head[_WRITER_CLOSED] = 1
+            self._in.head[_READER_CLOSED] = 1
+        except ValueError:
+            pass
+        # 唤醒两端所有阻塞中的收发
+        for bell in self._bells:
+            _ring_bell(bell)
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+            for bell in _bell_paths(self.shm.name):
+                try:
+                    os.unlink(bell)
+                except OSError:
+                    pass
+        # 其他线程仍在使用的视图会阻止解除映射，此时留给垃圾回收
+        try:
+            self._out.release()
+            self._in.release()
+            self.shm.close()
+        except BufferError:
+            logger.debug(f"Shared memory {self.shm.name} still in use, left for garbage collection")
+
+    def __enter__(self) -> 'ShmTransport':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,129 @@
+from typing    import Any, Callable, Optional
+from threading import Lock
+from random    import random
+from time      import perf_counter, time
+from .lso      import Utils
+
+import json
+import logging
+
+logger = logging.getLogger("netcore.trace")
+
+
+class JsonlExporter:
+    """Span exporter appending one JSON object per line to a file.
+
+    Lines are buffered by the file object; `flush` or `close` writes them out.
+    """
+
+    def __init__(self, path: str, buffering: int = 65536):
+        """Open the file for appending.
+
+        Args:
+            path: Path of the JSONL file
+            buffering: Size of the write buffer in bytes
+        """
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8', buffering=buffering)
+        self._lock = Lock()
+
+    def __call__(self, span: dict) -> None:
+        """Write one span."""
+        line = json.dumps(span, separators=(',', ':'))
+        with self._lock:
+            self._file.write(line + '\n')
+
+    def flush(self) -> None:
+        """Write buffered spans to the file."""
+        with self._lock:
+            self._file.flush()
+
+    def close(self) -> None:
+        """Flush and close the file."""
+        with self._lock:
+            self._file.close()
+
+
+class Tracer:
+    """Sampled latency tracing of missions and requests.
+
+    A sampled mission carries a `trace` header in its info with the trace id,
+    so every hop that has a tracer records its stages under the same id:
+
+    - send.queue: from create_mission until the mission head is written
+    - send.transfer: from the head until the last chunk is written
+    - recv.reassembly: from the mission head until the last chunk arrived
+    - dispatch: from reassembly until the Endpoint queued the request
+    - request.queue: waiting in the Endpoint's request queue
+    - handler: running the route handler, including sending its response
+    - roundtrip: from Endpoint.send until its response is handled
+
+    Responses inherit the trace of their request. Spans are passed to the
+    exporter as dicts with 'trace', 'name', 'start' (Unix time), 'duration'
+    (seconds), 'service' and stage specific fields.
+    """
+
+    def __init__(self, exporter: Callable[[dict], Any], sample_rate: float = 0.01, service: Optional[str] = None):
+        """Create a tracer.
+
+        Args:
+            exporter: Callable receiving each finished span, e.g. a JsonlExporter
+            sample_rate: Share of new requests that are traced, 0 to 1
+            service: Name added to every span to tell the hops apart
+        """
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.service = service
+        # 单调时钟到 Unix 时间的偏移，各阶段用单调时钟计时
+        self._epoch = time() - perf_counter()
+
+    def sample(self) -> Optional[str]:
+        """Decide whether to trace a new request.
+
+        Returns:
+            str: A new trace id, None if the request is not sampled
+        """
+        if self.sample_rate <= 0 or random() >= self.sample_rate:
+            return None
+        return Utils.safe_code(16)
+
+    def inject(self, info: dict) -> dict:
+        """Add a trace header to a mission info if the mission is sampled.
+
+        Args:
+            info: Mission info, not modified
+
+        Returns:
+            dict: The info, copied with a 'trace' header when sampled
+        """
+        if 'trace' in info:
+            return info
+        trace_id = self.sample()
+        if trace_id is None:
+            return info
+        return dict(info, trace={'id': trace_id})
+
+    def span(self, trace_id: str, name: str, start: float, end: Optional[float] = None, **fields) -> None:
+        """Export a finished span.
+
+        Args:
+            trace_id: Trace id from the mission's trace header
+            name: Stage name
+            start: perf_counter() at the start of the stage
+            end: perf_counter() at its end, defaults to now
+            **fields: Extra fields such as the mission extension
+        """
+        if end is None:
+            end = perf_counter()
+        span = {
+            'trace': trace_id,
+            'name': name,
+            'start': self._epoch + start,
+            'duration': end - start,
+            'service': self.service,
+        }
+        span.update(fields)
+        try:
+            self.exporter(span)
+        except Exception as e:
+            logger.error(f'Trace exporter error: {e}')
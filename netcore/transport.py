@@ -0,0 +1,214 @@
+from typing import Optional, Sequence, Union
+from struct import Struct
+
+import logging
+import socket
+
+logger = logging.getLogger("netcore.transport")
+
+# 单次 sendmsg 的缓冲区数量上限，低于常见的 IOV_MAX (1024)
+MAX_IOV = 512
+# Linux struct tcp_info 开头部分：8 个 uint8 后接 uint32 字段，至 tcpi_total_retrans 止
+TCP_INFO = Struct('=8B24I')
+# 字段在解包结果中的下标
+TCP_INFO_FIELDS = {
+    'unacked': 12,
+    'lost': 14,
+    'retrans': 15,
+    'rtt_us': 23,
+    'rttvar_us': 24,
+    'snd_cwnd': 26,
+    'total_retrans': 31,
+}
+
+
+class SocketTransport:
+    """Stream socket wrapper giving pipes complete writes, zero-copy reads and tuning.
+
+    Writes always go through `sendall` (or a `sendmsg` loop for several
+    buffers), so a frame is never cut short by a partial `send`. Reads use
+    `recv_into` so the pipe's frame reader fills its buffers in place. TCP
+    sockets get TCP_NODELAY by default, since the pipe already coalesces small
+    frames; Unix domain sockets only take the buffer size options.
+
+    Counters of the system calls made and bytes moved are kept per transport,
+    see `stats`.
+    """
+
+    def __init__(
+            self,
+            sock: socket.socket,
+            nodelay: bool = True,
+            sndbuf: Optional[int] = None,
+            rcvbuf: Optional[int] = None,
+            keepalive: Optional[float] = None
+        ):
+        """Wrap and configure a connected stream socket.
+
+        Args:
+            sock: Connected TCP or Unix domain stream socket
+            nodelay: Disable Nagle's algorithm on TCP sockets
+            sndbuf: SO_SNDBUF in bytes, None keeps the system default
+            rcvbuf: SO_RCVBUF in bytes, None keeps the system default
+            keepalive: Idle seconds before TCP keepalive probes start, None leaves
+                keepalive off. Probes follow every keepalive / 3 seconds (at least
+                1) and the connection is dropped after 3 unanswered probes.
+        """
+        self.socket = sock
+        self.is_tcp = sock.family in (socket.AF_INET, socket.AF_INET6)
+        if sndbuf is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+        if rcvbuf is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        if self.is_tcp and nodelay:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.is_tcp and keepalive is not None:
+            self._set_keepalive(keepalive)
+        # 系统调用次数与字节数，发送方向只由发送驱动写入，接收方向只由接收驱动写入
+        self._counters = {'recv_calls': 0, 'bytes_received': 0, 'send_calls': 0, 'bytes_sent': 0, 'partial_sends': 0, 'sendfile_calls': 0}
+
+    def _set_keepalive(self, idle: float) -> None:
+        """Enable TCP keepalive with the platform's available knobs."""
+        sock = self.socket
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        interval = max(1, int(idle / 3))
+        # Linux 为 TCP_KEEPIDLE，macOS 为 TCP_KEEPALIVE
+        idle_option = getattr(socket, 'TCP_KEEPIDLE', None) or getattr(socket, 'TCP_KEEPALIVE', None)
+        options = ((idle_option, max(1, int(idle))),
+                   (getattr(socket, 'TCP_KEEPINTVL', None), interval),
+                   (getattr(socket, 'TCP_KEEPCNT', None), 3))
+        for option, value in options:
+            if option is None:
+                continue
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, option, value)
+            except OSError as e:
+                logger.debug(f"Keepalive option {option} not supported: {e}")
+
+    def recv(self, size: int) -> bytes:
+        """Receive up to `size` bytes; empty at EOF."""
+        data = self.socket.recv(size)
+        counters = self._counters
+        counters['recv_calls'] += 1
+        counters['bytes_received'] += len(data)
+        return data
+
+    def recv_into(self, view: Union[memoryview, bytearray]) -> int:
+        """Receive directly into a writable buffer.
+
+        Returns:
+            int: Number of bytes received, 0 at EOF
+        """
+        n = self.socket.recv_into(view)
+        counters = self._counters
+        counters['recv_calls'] += 1
+        counters['bytes_received'] += n
+        return n
+
+    def sendall(self, data: Union[bytes, bytearray, memoryview]) -> None:
+        """Send all of `data`."""
+        self.socket.sendall(data)
+        counters = self._counters
+        counters['send_calls'] += 1
+        counters['bytes_sent'] += len(data)
+
+    def sendmsg_all(self, parts: Sequence[Union[bytes, bytearray, memoryview]]) -> None:
+        """Send several buffers as one gathered write, resuming after partial writes.
+
+        Falls back to joining the buffers where sendmsg is unavailable.
+        """
+        if not hasattr(self.socket, 'sendmsg'):
+            self.sendall(b''.join(parts))
+            return
+        views = [memoryview(part).cast('B') for part in parts if len(part)]
+        counters = self._counters
+        first = 0
+        while first < len(views):
+            sent = self.socket.sendmsg(views[first:first + MAX_IOV])
+            counters['send_calls'] += 1
+            counters['bytes_sent'] += sent
+            # 跳过已完整发出的缓冲区，剩余部分从断点继续
+            while first < len(views) and sent >= len(views[first]):
+                sent -= len(views[first])
+                first += 1
+            if sent:
+                views[first] = views[first][sent:]
+                counters['partial_sends'] += 1
+
+    def sendfile_all(self, file, offset: int, count: int, head: bytes = b'') -> None:
+        """Send `count` bytes of a file straight from the kernel, preceded by `head`.
+
+        Uses socket.sendfile (os.sendfile where available, read and send
+        otherwise). On TCP the header is sent with MSG_MORE where supported so
+        it shares a segment with the file data.
+
+        Args:
+            file: Regular file opened in binary mode
+            offset: Position of the first byte in the file
+            count: Number of bytes to send
+            head: Bytes to send before the file data, e.g. a frame header
+
+        Raises:
+            ConnectionError: If the file ended before `count` bytes were sent
+        """
+        counters = self._counters
+        if head:
+            more = getattr(socket, 'MSG_MORE', 0) if self.is_tcp else 0
+            if more:
+                self.socket.sendall(head, more)
+            else:
+                self.socket.sendall(head)
+            counters['send_calls'] += 1
+            counters['bytes_sent'] += len(head)
+        sent = self.socket.sendfile(file, offset, count)
+        counters['sendfile_calls'] += 1
+        counters['bytes_sent'] += sent
+        if sent != count:
+            # 帧头已声明长度，数据不足时连接上的帧已无法恢复
+            raise ConnectionError(f"File ended after {sent} of {count} bytes")
+
+    def tcp_info(self) -> Optional[dict]:
+        """Read kernel TCP statistics (Linux only).
+
+        Returns:
+            dict: 'rtt_us', 'rttvar_us', 'snd_cwnd', 'unacked', 'lost', 'retrans'
+            and 'total_retrans', None where TCP_INFO is unavailable
+        """
+        if not self.is_tcp or not hasattr(socket, 'TCP_INFO'):
+            return None
+        try:
+            raw = self.socket.getsockopt(socket.IPPROTO_TCP, socket.TCP_INFO, TCP_INFO.size)
+        except OSError:
+            return None
+        if len(raw) < TCP_INFO.size:
+            return None
+        values = TCP_INFO.unpack(raw)
+        return {name: values[index] for name, index in TCP_INFO_FIELDS.items()}
+
+    def stats(self) -> dict:
+        """Return transport counters and socket state.
+
+        Returns:
+            dict: 'recv_calls', 'bytes_received', 'send_calls', 'bytes_sent',
+            'partial_sends' (gathered writes resumed mid-buffer), 'sendfile_calls', the effective
+            'sndbuf' and 'rcvbuf', and 'tcp' with kernel TCP statistics where
+            available
+        """
+        result = dict(self._counters)
+        try:
+            result['sndbuf'] = self.socket.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF)
+            result['rcvbuf'] = self.socket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+        except OSError:
+            pass
+        tcp = self.tcp_info()
+        if tcp is not None:
+            result['tcp'] = tcp
+        return result
+
+    def close(self) -> None:
+        """Shut the socket down so blocked reads return EOF, then close it."""
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.socket.close()
@@ -0,0 +1,27 @@
+import os
+import socket
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def sockets():
+    """Factory of connected socket pairs, shut down after the test."""
+    pairs = []
+
+    def make():
+        pair = socket.socketpair()
+        pairs.append(pair)
+        return pair
+
+    yield make
+    for pair in pairs:
+        for sock in pair:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
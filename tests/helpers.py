@@ -0,0 +1,25 @@
+"""Helpers shared by the regression tests."""
+import time
+
+
+def wait_for(predicate, timeout=5.0):
+    """Poll `predicate` until it holds or `timeout` seconds passed."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def daemon(pipe):
+    """Make a threaded pipe's threads daemons so they do not keep the test run alive."""
+    pipe.recv_thread.daemon = True
+    pipe.send_thread.daemon = True
+    return pipe
+
+
+def start(pipe):
+    """Start a threaded pipe with daemon threads."""
+    daemon(pipe).start()
+    return pipe
@@ -0,0 +1,147 @@
+"""Regression tests for AsyncEndpoint."""
+import asyncio
+import os
+import socket
+import time
+
+from netcore import AsyncEndpoint, AsyncMultiPipe, AsyncPipe, Endpoint, Pipe, Response, request
+
+from helpers import daemon
+
+
+async def serve(endpoint):
+    """Start `endpoint` over an AsyncMultiPipe and return the listening server."""
+    endpoint.start()
+
+    async def on_connection(reader, writer):
+        endpoint.pipe.add_pipe(AsyncPipe(reader, writer))
+
+    return await asyncio.start_server(on_connection, '127.0.0.1', 0)
+
+
+def test_sync_handlers_do_not_block_the_loop():
+    async def main():
+        server_endpoint = AsyncEndpoint(AsyncMultiPipe())
+        seen = []
+
+        @server_endpoint.before_request
+        def before():
+            time.sleep(0.3)
+
+        @server_endpoint.request('slow')
+        def slow():
+            time.sleep(1.0)
+            seen.append(request.route)
+            return Response('slow', 'done')
+
+        @server_endpoint.request('fast')
+        async def fast():
+            return Response('fast', 'done')
+
+        server = await serve(server_endpoint)
+        port = server.sockets[0].getsockname()[1]
+        client = AsyncEndpoint(await AsyncPipe.open_connection('127.0.0.1', port))
+        client.start()
+        try:
+            # 客户端与服务端共用事件循环，循环被阻塞时计时同样会推迟
+            started = time.monotonic()
+            slow_reply = asyncio.ensure_future(client.send('slow', b'', blocking_recv=True))
+            await asyncio.sleep(0.1)
+            reply = await asyncio.wait_for(client.send('fast', b'', blocking_recv=True), 5)
+            # 钩子与慢处理函数在线程中执行，快请求只等待自身的钩子
+            assert reply.string == 'done'
+            assert time.monotonic() - started < 0.9
+            assert (await asyncio.wait_for(slow_reply, 5)).string == 'done'
+            assert seen == ['slow']
+        finally:
+            client.stop()
+            server_endpoint.stop()
+            server.close()
+
+    asyncio.run(main())
+
+
+def test_async_multipipe_applies_pipe_settings():
+    async def main():
+        multi_pipe = AsyncMultiPipe(spill_threshold=1024, send_budget=4096, compression='zlib', heartbeat_interval=30.0)
+        endpoint = AsyncEndpoint(multi_pipe)
+
+        @endpoint.request('size')
+        async def size():
+            return Response('size', {'local': request.local is not None, 'n': len(request.meta)})
+
+        server = await serve(endpoint)
+        port = server.sockets[0].getsockname()[1]
+        client = AsyncEndpoint(await AsyncPipe.open_connection('127.0.0.1', port))
+        client.start()
+        try:
+            reply = await asyncio.wait_for(client.send('size', os.urandom(8192), blocking_recv=True), 5)
+            assert reply.json == {'local': True, 'n': 8192}
+            pipe = next(iter(multi_pipe.pipe_pool.values()))
+            assert (pipe.spill_threshold, pipe.send_budget, pipe.compression, pipe.heartbeat_interval) == (1024, 4096, 'zlib', 30.0)
+        finally:
+            client.stop()
+            endpoint.stop()
+            server.close()
+
+    asyncio.run(main())
+
+
+def test_async_and_threaded_endpoints_interoperate():
+    async def main():
+        server_endpoint = AsyncEndpoint(AsyncMultiPipe())
+
+        @server_endpoint.request('echo')
+        async def echo():
+            return Response('echo', bytes(request.meta))
+
+        server = await serve(server_endpoint)
+        port = server.sockets[0].getsockname()[1]
+
+        def threaded_client(framing):
+            sock = socket.create_connection(('127.0.0.1', port))
+            client = Endpoint(daemon(Pipe(sock.recv, sock.sendall, framing=framing)))
+            client.start(block=False)
+            try:
+                data = os.urandom(300000)
+                return bytes(client.send('echo', data, blocking_recv=True).meta) == data
+            finally:
+                client.stop()
+                sock.close()
+
+        try:
+            for framing in ('lso', 'binary'):
+                assert await asyncio.to_thread(threaded_client, framing)
+        finally:
+            server_endpoint.stop()
+            server.close()
+
+    asyncio.run(main())
+
+
+def test_async_client_talks_to_threaded_server(sockets):
+    a, b = sockets()
+    server = Endpoint(daemon(Pipe(a.recv, a.sendall, framing='binary')))
+
+    @server.request('echo')
+    def echo():
+        return Response('echo', bytes(request.meta))
+
+    server.start(block=False)
+
+    async def main():
+        reader, writer = await asyncio.open_connection(sock=b)
+        client = AsyncEndpoint(AsyncPipe(reader, writer, framing='binary'))
+        client.start()
+        try:
+            data = os.urandom(123456)
+            reply = await asyncio.wait_for(client.send('echo', data, blocking_recv=True), 5)
+            assert bytes(reply.meta) == data
+            assert client.pipe.send_framing == 'binary'
+        finally:
+            client.stop()
+
+    try:
+        asyncio.run(main())
+    finally:
+        server.stop()
@@ -0,0 +1,180 @@
+"""Regression tests for the hello/credit handshake and receive limits.
+
+A peer that predates the handshake only knows mission, data and cancel frames.
+`BaselinePeer` speaks that protocol over a socket exactly as such a Pipe does:
+any other frame is taken as data and looked up by its 'extension', which fails
+with KeyError when the key is missing.
+"""
+import json
+import os
+import threading
+import time
+from struct import pack, unpack
+
+from netcore import Pipe
+
+from helpers import start, wait_for
+
+
+def read_exact(sock, length):
+    data = bytearray()
+    while len(data) < length:
+        chunk = sock.recv(length - len(data))
+        if not chunk:
+            raise ConnectionError('peer closed')
+        data += chunk
+    return bytes(data)
+
+
+class BaselinePeer:
+    """Peer without handshake support, speaking plain LSO frames."""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.frames = []
+        self.received = []
+        self.error = None
+        self._missions = {}
+        self._thread = threading.Thread(target=self._recv_loop, daemon=True)
+        self._thread.start()
+
+    def _recv_loop(self):
+        try:
+            while True:
+                extension = read_exact(self.sock, unpack('i', read_exact(self.sock, 4))[0])
+                meta = read_exact(self.sock, unpack('i', read_exact(self.sock, 4))[0])
+                info = json.loads(extension)
+                self.frames.append(info)
+                if info['type'] == 'mission':
+                    head = json.loads(meta)
+                    self._missions[head['extension']] = (head, bytearray())
+                    continue
+                if info['type'] == 'cancel':
+                    self._missions.pop(info.get('extension'), None)
+                    continue
+                # 与旧版本相同：其余帧一律按任务数据处理
+                if info['extension'] not in self._missions:
+                    continue
+                head, data = self._missions[info['extension']]
+                data += meta
+                if len(data) == head['length']:
+                    del self._missions[info['extension']]
+                    self.received.append((bytes(data), head['info']))
+        except (ConnectionError, OSError):
+            pass
+        except Exception as e:
+            self.error = e
+
+    def _frame(self, data, info):
+        extension = json.dumps(info).encode('utf-8')
+        self.sock.sendall(pack('i', len(extension)) + extension + pack('i', len(data)) + data)
+
+    def send(self, data, info, extension='base01'):
+        self._frame(json.dumps({'extension': extension, 'length': len(data), 'info': info}).encode('utf-8'), {'type': 'mission'})
+        for i in range(0, len(data), 2048):
+            self._frame(data[i:i + 2048], {'type': 'data', 'extension': extension})
+
+
+def test_default_pipe_talks_to_baseline_peer(sockets):
+    a, b = sockets()
+    pipe = start(Pipe(a.recv, a.sendall))
+    peer = BaselinePeer(b)
+
+    pipe.send(b'x' * 10000, {'n': 1})
+    assert wait_for(lambda: peer.received)
+    assert peer.received[0] == (b'x' * 10000, {'n': 1})
+
+    peer.send(b'y' * 5000, {'n': 2})
+    assert wait_for(lambda: pipe.is_data)
+    data, info = pipe.recv()
+    assert bytes(data) == b'y' * 5000 and info['n'] == 2
+
+    assert peer.error is None
+    types = {frame['type'] for frame in peer.frames}
+    assert 'credit' not in types
+    # 旧版本按数据处理的帧必须带 extension，才能被当作未知任务忽略
+    assert all('extension' in frame for frame in peer.frames if frame['type'] not in ('mission', 'cancel'))
+
+
+def test_binary_pipe_falls_back_when_peer_never_answers(sockets):
+    a, b = sockets()
+    pipe = Pipe(a.recv, a.sendall, framing='binary')
+    pipe.handshake_timeout = 0.2
+    start(pipe)
+    peer = BaselinePeer(b)
+
+    pipe.send(b'z' * 3000, {'n': 3})
+    assert wait_for(lambda: peer.received)
+    assert peer.received[0] == (b'z' * 3000, {'n': 3})
+    assert pipe.send_framing == 'lso'
+    assert peer.error is None
+
+
+def test_new_pipes_agree_on_credit(sockets):
+    a, b = sockets()
+    left = start(Pipe(a.recv, a.sendall))
+    right = start(Pipe(b.recv, b.sendall))
+    assert wait_for(lambda: left._peer_limit is not None and right._peer_limit is not None)
+    assert left._peer_credit and right._peer_credit
+
+
+def test_sender_stays_within_granted_credit(sockets):
+    a, b = sockets()
+    receiver = Pipe(a.recv, a.sendall)
+    receiver.recv_window = 64 * 1024
+    sender = Pipe(b.recv, b.sendall)
+    start(receiver)
+    start(sender)
+    assert wait_for(lambda: sender._peer_limit is not None)
+
+    # 接收方不取数据，窗口填满后发送方停下
+    count = 32
+    for i in range(count):
+        sender.send(os.urandom(32 * 1024), {'i': i})
+    time.sleep(1.0)
+    with receiver._flow_lock:
+        granted = receiver._flow['granted']
+        delivered = receiver._flow['held_total']
+    assert sender._sent_bytes <= granted
+    assert delivered < count * 32 * 1024
+
+    got = set()
+
+    def drain():
+        while receiver.is_data:
+            got.add(receiver.recv()[1]['i'])
+        return len(got) == count
+
+    assert wait_for(drain, timeout=10)
+
+
+def test_recv_budget_spills_missions_that_do_not_fit(sockets):
+    a, b = sockets()
+    receiver = Pipe(a.recv, a.sendall)
+    receiver.recv_budget = 100 * 1024
+    sender = start(Pipe(b.recv, b.sendall))
+    start(receiver)
+
+    for i in range(4):
+        sender.send(b'%d' % i * (60 * 1024), {'i': i})
+    missions = []
+    assert wait_for(lambda: receiver.is_data and missions.append(receiver.recv()) or len(missions) == 4)
+    assert sorted(bytes(data[:1]) for data, _ in missions) == [b'0', b'1', b'2', b'3']
+    assert any('local' in info for _, info in missions)
+    assert all(len(data) == 60 * 1024 for data, _ in missions)
+    with receiver._flow_lock:
+        assert receiver._flow['reserved'] == 0
+
+
+def test_recv_budget_rejects_oversized_unknown_length(sockets):
+    a, b = sockets()
+    receiver = Pipe(a.recv, a.sendall)
+    receiver.recv_budget = 64 * 1024
+    closed = threading.Event()
+    receiver.final_error_handler = closed.set
+    sender = start(Pipe(b.recv, b.sendall))
+    start(receiver)
+
+    sender.send(iter([b'u' * 40000, b'u' * 40000]), {'unknown': True})
+    assert closed.wait(5)
+    assert not receiver.is_data
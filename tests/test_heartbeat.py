@@ -0,0 +1,51 @@
+"""Regression tests for heartbeats and the teardown of silent peers."""
+import os
+import threading
+
+from netcore import Pipe
+
+from helpers import start, wait_for
+
+
+def test_heartbeats_measure_rtt(sockets):
+    a, b = sockets()
+    pipe = Pipe(a.recv, a.sendall)
+    pipe.heartbeat_interval = 0.05
+    start(pipe)
+    start(Pipe(b.recv, b.sendall))
+
+    assert wait_for(lambda: pipe.heartbeat_stats()['pongs'] >= 3)
+    stats = pipe.heartbeat_stats()
+    assert stats['rtt'] is not None and stats['min_rtt'] <= stats['rtt']
+
+
+def test_silent_peer_is_disconnected(sockets):
+    a, b = sockets()
+    pipe = Pipe(a.recv, a.sendall)
+    pipe.heartbeat_interval = 0.05
+    closed = threading.Event()
+    pipe.final_error_handler = closed.set
+    peer = Pipe(b.recv, b.sendall)
+    start(pipe)
+    start(peer)
+    assert wait_for(lambda: pipe.heartbeat_stats()['pongs'] >= 1)
+
+    # 对端冻结：发送阻塞，不再应答心跳
+    gate = threading.Event()
+    peer.send_function = lambda data: gate.wait()
+    try:
+        for i in range(3):
+            pipe.send(os.urandom(1 << 20), {'i': i})
+        assert closed.wait(3)
+        with pipe.send_lock:
+            assert not pipe.send_pool and pipe._queued_bytes == 0
+    finally:
+        gate.set()
+
+
+def test_pipe_without_heartbeat_stays_quiet(sockets):
+    a, b = sockets()
+    pipe = start(Pipe(a.recv, a.sendall))
+    start(Pipe(b.recv, b.sendall))
+    assert wait_for(lambda: pipe._peer_limit is not None)
+    assert pipe.heartbeat_stats()['pings'] == 0
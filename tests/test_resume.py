@@ -0,0 +1,52 @@
+"""Regression tests for continuing large missions after a reconnect."""
+import os
+import socket
+import threading
+import time
+
+from netcore import Pipe
+
+from helpers import start, wait_for
+
+
+def test_mission_resumes_after_reconnect(sockets, tmp_path):
+    sender_dir, receiver_dir = str(tmp_path / 'sender'), str(tmp_path / 'receiver')
+    received = []
+    done = threading.Event()
+
+    def connect():
+        a, b = sockets()
+
+        def sendall(data):
+            # 放慢发送，保证断开时任务仍在传输中
+            time.sleep(0.001)
+            return a.sendall(data)
+
+        sender, receiver = Pipe(a.recv, sendall), Pipe(b.recv, b.sendall)
+        sender.resume_dir, receiver.resume_dir = sender_dir, receiver_dir
+        receiver.recv_handler = lambda data, info: (received.append((bytes(data), info)), done.set())
+        start(sender)
+        start(receiver)
+        return sender, receiver, a, b
+
+    payload = os.urandom(4 << 20)
+    sender, receiver, a, b = connect()
+    # 收到对端的节点标识后发出的任务才可续传
+    assert wait_for(lambda: sender._peer_node is not None)
+    extension = sender.send(payload, {'name': 'big'})
+    assert wait_for(lambda: (receiver.temp_pool.get(extension) or {}).get('recv', 0) > len(payload) // 4, 10)
+    # 传输中途断开连接
+    a.shutdown(socket.SHUT_RDWR)
+    b.shutdown(socket.SHUT_RDWR)
+    assert wait_for(lambda: any(name.startswith('in-') for name in os.listdir(receiver_dir)))
+    assert not done.is_set()
+
+    sender, receiver, _, _ = connect()
+    assert done.wait(20)
+    data, info = received[0]
+    assert data == payload
+    assert info['extension'] == extension and info['name'] == 'big'
+    # 完成后双方只保留节点标识
+    assert wait_for(lambda: os.listdir(sender_dir) == ['node'])
+    received.clear()
+    assert wait_for(lambda: os.listdir(receiver_dir) == ['node'])
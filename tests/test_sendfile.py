@@ -0,0 +1,79 @@
+"""Regression tests for sending file-backed missions with os.sendfile."""
+import os
+import socket
+import threading
+
+import pytest
+
+from netcore import LsoProtocol, Pipe
+
+from helpers import start
+
+
+@pytest.fixture
+def tcp_pipes():
+    """A sending and a receiving Pipe over a loopback TCP connection."""
+    listener = socket.create_server(('127.0.0.1', 0))
+    a = socket.create_connection(listener.getsockname())
+    b, _ = listener.accept()
+    listener.close()
+    sender, receiver = Pipe.from_socket(a, framing='binary'), Pipe.from_socket(b)
+    received = []
+    arrived = threading.Semaphore(0)
+    receiver.recv_handler = lambda data, info: (received.append((bytes(data), info)), arrived.release())
+    start(sender)
+    start(receiver)
+
+    def recv():
+        assert arrived.acquire(timeout=10)
+        return received.pop(0)
+
+    yield sender, recv
+    for sock in (a, b):
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        sock.close()
+
+
+def test_file_mission_is_sent_with_sendfile(tcp_pipes, tmp_path):
+    sender, recv = tcp_pipes
+    payload = os.urandom(3_000_123)
+    local = tmp_path / 'data.bin'
+    local.write_bytes(b'PREFIX' + payload)
+
+    with open(local, 'rb') as f:
+        # 从文件当前位置开始发送
+        f.read(6)
+        sender.create_stream_mission(f, {'k': 1})
+        data, info = recv()
+    assert data == payload and info['k'] == 1
+    assert sender.transport.stats()['sendfile_calls'] > 0
+
+
+def test_lso_file_is_sent_with_unflushed_appends(tcp_pipes, tmp_path):
+    sender, recv = tcp_pipes
+    lso = LsoProtocol(str(tmp_path / 'data.lso'))
+    lso.extension = 'ext'
+    lso.set_meta(b'head')
+    for i in range(10):
+        lso._add_meta(b'ab%d' % i)
+
+    sender.send(lso, {'k': 2})
+    data, info = recv()
+    assert data == b'head' + b''.join(b'ab%d' % i for i in range(10))
+    assert info['k'] == 2
+
+
+def test_small_mission_interleaves_with_a_file(tcp_pipes, tmp_path):
+    sender, recv = tcp_pipes
+    local = tmp_path / 'data.bin'
+    local.write_bytes(os.urandom(4_000_000))
+
+    with open(local, 'rb') as f:
+        sender.create_stream_mission(f, {'k': 3})
+        sender.send(b'small', {'k': 4})
+        first, second = recv(), recv()
+    assert [first[1]['k'], second[1]['k']] == [4, 3]
+    assert second[0] == local.read_bytes()
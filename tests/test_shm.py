@@ -0,0 +1,53 @@
+"""Regression tests for the shared memory transport."""
+import os
+
+import pytest
+
+from netcore import Endpoint, Response, request
+from netcore.shm import ShmTransport
+
+from helpers import daemon, start, wait_for
+
+
+@pytest.fixture
+def transports():
+    # 同一进程内连接两端，与跨进程时的环形缓冲区相同
+    server = ShmTransport.create(capacity=65536)
+    client = ShmTransport.attach(server.name)
+    yield server, client
+    client.close()
+    server.close()
+
+
+@pytest.mark.parametrize('framing', ['lso', 'binary'])
+def test_endpoints_roundtrip_over_shared_memory(transports, framing):
+    server_transport, client_transport = transports
+    server = Endpoint(daemon(server_transport.pipe(framing=framing)))
+    client = Endpoint(daemon(client_transport.pipe(framing=framing)))
+
+    @server.request('echo')
+    def echo():
+        return Response('echo', bytes(request.meta))
+
+    server.start(block=False)
+    client.start(block=False)
+    try:
+        # 超过环容量的消息分多次写入
+        for size in (10, 5000, 300000, 2000000):
+            data = os.urandom(size)
+            assert bytes(client.send('echo', data, blocking_recv=True).meta) == data
+    finally:
+        client.stop()
+        server.stop()
+
+
+def test_close_ends_the_peer_pipe(transports):
+    server_transport, client_transport = transports
+    closed = []
+    pipe = server_transport.pipe()
+    pipe.final_error_handler = lambda: closed.append(True)
+    start(pipe)
+    start(client_transport.pipe())
+
+    client_transport.close()
+    assert wait_for(lambda: closed)
@@ -0,0 +1,64 @@
+"""Regression tests for receiving large missions into temporary LSO files."""
+import json
+import os
+
+from netcore import Endpoint, LsoProtocol, Pipe, Response, request
+
+from helpers import daemon, start, wait_for
+
+
+def recv_all(pipe, count):
+    """Collect `count` missions from `pipe` keyed by their info's 'n'."""
+    received = {}
+
+    def poll():
+        while pipe.is_data:
+            data, info = pipe.recv()
+            received[info['n']] = (data, info)
+        return len(received) == count
+
+    assert wait_for(poll)
+    return received
+
+
+def test_missions_above_spill_threshold_land_in_a_file(sockets):
+    a, b = sockets()
+    receiver = Pipe(a.recv, a.sendall)
+    receiver.spill_threshold = 64 * 1024
+    sender = start(Pipe(b.recv, b.sendall))
+    start(receiver)
+    large, small = os.urandom(300 * 1024), os.urandom(1000)
+
+    sender.send(large, {'n': 'large'})
+    sender.send(small, {'n': 'small'})
+    received = recv_all(receiver, 2)
+
+    data, info = received['large']
+    assert bytes(data) == large
+    # 落盘文件是完整的 LSO 文件，扩展信息即任务信息
+    lso = LsoProtocol(info['local'])
+    assert lso.length == len(large)
+    assert json.loads(lso.extension)['n'] == 'large'
+    lso.close()
+    data, info = received['small']
+    assert isinstance(data, bytearray) and bytes(data) == small
+    assert 'local' not in info
+
+
+def test_endpoint_spill_threshold_hands_handlers_the_file(sockets):
+    a, b = sockets()
+    server = Endpoint(daemon(Pipe(a.recv, a.sendall)), spill_threshold=32 * 1024)
+    client = Endpoint(daemon(Pipe(b.recv, b.sendall)))
+
+    @server.request('size')
+    def size():
+        return Response('size', {'local': request.local is not None and os.path.exists(request.local), 'n': len(request.meta)})
+
+    server.start(block=False)
+    client.start(block=False)
+    try:
+        assert client.send('size', os.urandom(200 * 1024), blocking_recv=True).json == {'local': True, 'n': 200 * 1024}
+        assert client.send('size', b'small', blocking_recv=True).json == {'local': False, 'n': 5}
+    finally:
+        client.stop()
+        server.stop()
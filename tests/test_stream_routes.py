@@ -0,0 +1,115 @@
+"""Regression tests for streaming routes."""
+import asyncio
+import hashlib
+import os
+import threading
+import time
+
+from netcore import AsyncEndpoint, AsyncPipe, Endpoint, Pipe, Response, request
+
+from helpers import daemon
+
+
+def endpoints(sockets, **server_options):
+    a, b = sockets()
+    server = Endpoint(daemon(Pipe(a.recv, a.sendall)), **server_options)
+    client = Endpoint(daemon(Pipe(b.recv, b.sendall)))
+    return server, client
+
+
+def test_stream_route_starts_before_the_mission_completes(sockets):
+    server, client = endpoints(sockets)
+
+    @server.stream('hash', buffer=256 * 1024)
+    def hash_stream():
+        digest, started = hashlib.sha256(), None
+        for chunk in request.stream:
+            started = started or time.monotonic()
+            digest.update(chunk)
+        return Response('hash', {'sha': digest.hexdigest(), 'length': request.stream.length, 'started': started})
+
+    server.start(block=False)
+    client.start(block=False)
+    try:
+        data = os.urandom(2_000_000)
+        sent = time.monotonic()
+        reply = client.send('hash', data, blocking_recv=True).json
+        assert reply['sha'] == hashlib.sha256(data).hexdigest() and reply['length'] == len(data)
+        # 处理函数在任务头到达时即开始，而不是等数据收齐
+        assert reply['started'] - sent < 0.5
+        # 长度未知的流式数据
+        reply = client.send('hash', iter([data[:100000], data[100000:300000]]), blocking_recv=True).json
+        assert reply['sha'] == hashlib.sha256(data[:300000]).hexdigest() and reply['length'] is None
+    finally:
+        client.stop()
+        server.stop()
+
+
+def test_streams_beyond_max_streams_are_handled_once_received(sockets):
+    server, client = endpoints(sockets, max_workers=4, max_streams=1)
+    gate = threading.Event()
+    calls = []
+    results = {}
+
+    @server.stream('count')
+    def count():
+        calls.append(request.message_id)
+        n = sum(len(chunk) for chunk in request.stream)
+        if len(calls) == 1:
+            # 第一个处理函数一直占用流式处理名额
+            gate.wait(5)
+        return Response('count', {'n': n})
+
+    server.start(block=False)
+    client.start(block=False)
+    try:
+        def send(name, size):
+            results[name] = client.send('count', os.urandom(size), blocking_recv=True).json['n']
+
+        first = threading.Thread(target=send, args=('first', 500000))
+        first.start()
+        time.sleep(0.2)
+        # 唯一的流式处理名额被占用，第二个任务完整接收后交给工作线程
+        send('second', 200000)
+        gate.set()
+        first.join(5)
+        assert results == {'first': 500000, 'second': 200000}
+    finally:
+        client.stop()
+        server.stop()
+
+
+def test_async_endpoint_streams_to_coroutines_and_threads(sockets):
+    a, b = sockets()
+    client = Endpoint(daemon(Pipe(b.recv, b.sendall)))
+
+    async def main():
+        reader, writer = await asyncio.open_connection(sock=a)
+        server = AsyncEndpoint(AsyncPipe(reader, writer))
+
+        @server.stream('async')
+        async def async_count():
+            n = 0
+            async for chunk in request.stream:
+                n += len(chunk)
+            return Response('async', {'n': n})
+
+        @server.stream('sync')
+        def sync_count():
+            return Response('sync', {'n': sum(len(chunk) for chunk in request.stream), 'thread': threading.current_thread().name})
+
+        server.start()
+        client.start(block=False)
+        try:
+            replies = await asyncio.gather(
+                asyncio.to_thread(client.send, 'async', os.urandom(3_000_000), blocking_recv=True),
+                asyncio.to_thread(client.send, 'sync', os.urandom(3_000_000), blocking_recv=True),
+            )
+            assert replies[0].json == {'n': 3_000_000}
+            assert replies[1].json['n'] == 3_000_000
+            assert replies[1].json['thread'] != threading.main_thread().name
+        finally:
+            client.stop()
+            server.stop()
+
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+"""Regression tests for striped missions across the pipes of a MultiPipe."""
+import os
+import socket
+import threading
+
+import pytest
+
+from netcore import MultiPipe, Pipe
+from netcore.endpoint import STRIPE_KEY
+
+from helpers import wait_for
+
+
+@pytest.fixture
+def multipipes():
+    """Two MultiPipes joined by `count` socket pairs, pipe i to pipe i."""
+    created = []
+
+    def make(count=2, **settings):
+        sender, receiver = MultiPipe(), MultiPipe(**settings)
+        closed = threading.Event()
+        receiver.final_error_handler = closed.set
+        codes = []
+        for _ in range(count):
+            a, b = socket.socketpair()
+            created.append((a, b))
+            codes.append(sender.add_pipe(Pipe(a.recv, a.sendall)))
+            receiver.add_pipe(Pipe(b.recv, b.sendall))
+        for multi_pipe in (sender, receiver):
+            multi_pipe.start()
+            created.append(multi_pipe)
+        return sender, receiver, codes, closed
+
+    yield make
+    for item in created:
+        if isinstance(item, MultiPipe):
+            item.stop()
+            continue
+        for sock in item:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+
+def recv_one(multi_pipe, timeout=5.0):
+    received = []
+    assert wait_for(lambda: received.append(multi_pipe.recv()) or received[-1][1] is not None, timeout)
+    return received[-1]
+
+
+def held(multi_pipe):
+    return sum(pipe._flow['held_total'] + pipe._flow['reserved'] for pipe in multi_pipe.pipe_pool.values())
+
+
+def test_striped_mission_is_reassembled(multipipes):
+    sender, receiver, _, _ = multipipes()
+    payload = os.urandom(300 * 1024)
+
+    extension = sender.send_striped(payload, {'name': 'dataset'}, stripes=5)
+    data, info = recv_one(receiver)
+    assert bytes(data) == payload
+    assert info['extension'] == extension and info['name'] == 'dataset'
+    assert STRIPE_KEY not in info and 'local' not in info
+    assert not receiver._stripes and not receiver._joined
+    assert wait_for(lambda: held(receiver) == 0)
+
+
+def test_duplicate_stripe_is_dropped(multipipes):
+    sender, receiver, codes, _ = multipipes()
+    payload = os.urandom(20000)
+    first, second = sender(codes[0]), sender(codes[1])
+
+    def stripe(index, offset):
+        return {'name': 'dup', STRIPE_KEY: {'id': 'dup001', 'index': index, 'count': 2, 'offset': offset, 'length': len(payload)}}
+
+    first.create_mission(payload[:10000], stripe(0, 0), 'dup001-0')
+    # 续传后同一条带可能再次到达
+    second.create_mission(payload[:10000], stripe(0, 0), 'dup001-0r')
+    assert wait_for(lambda: first._sent_bytes >= 10000 and second._sent_bytes >= 10000)
+    assert receiver.recv() == (None, None)
+    first.create_mission(payload[10000:], stripe(1, 10000), 'dup001-1')
+
+    data, info = recv_one(receiver)
+    assert bytes(data) == payload and info['extension'] == 'dup001'
+    assert receiver.recv() == (None, None)
+    assert not receiver._stripes
+    assert wait_for(lambda: held(receiver) == 0)
+
+
+def test_striped_mission_spills_above_threshold(multipipes):
+    sender, receiver, _, _ = multipipes(spill_threshold=64 * 1024)
+    payload = os.urandom(256 * 1024)
+
+    sender.send_striped(payload, {'name': 'spilled'})
+    data, info = recv_one(receiver)
+    assert bytes(data) == payload
+    assert os.path.exists(info['local'])
+    assert wait_for(lambda: held(receiver) == 0)
+
+
+def test_disagreeing_stripe_head_is_rejected(multipipes):
+    sender, receiver, codes, closed = multipipes()
+
+    def stripe(index, length):
+        return {STRIPE_KEY: {'id': 'bad001', 'index': index, 'count': 2, 'offset': 0, 'length': length}}
+
+    sender(codes[0]).create_mission(b'a' * 1000, stripe(0, 2000), 'bad001-0')
+    assert wait_for(lambda: 'bad001' in receiver._stripes)
+    # 声明的长度与首个条带不一致，不能按它分配缓冲区
+    sender(codes[0]).create_mission(b'b' * 1000, stripe(1, 10 ** 12), 'bad001-1')
+    assert closed.wait(5)
+    assert receiver._stripes['bad001']['length'] == 2000